@@ -1,64 +1,503 @@
 import re
 import os
-from dotenv import load_dotenv
-from openai import OpenAI
+import json
 import time
+import asyncio
+import logging
+import threading
+from textwrap import dedent
+from dotenv import load_dotenv
+from openai import OpenAI, AsyncOpenAI
+from openai.types.completion_usage import CompletionUsage
+from rate_limiter import RateLimiter, estimate_tokens, parse_retry_after, DEFAULT_COMPLETION_TOKENS
+from cache import ResponseCache, make_cache_key
+from retry import RetryPolicy, CircuitBreaker, classify_error
+from pydantic import ValidationError
+from models.evaluation import CVEvaluation
+from metrics import registry as metrics, record_llm_usage
 
 # Carregar as variáveis de ambiente do arquivo .env
 load_dotenv()
 
+# Cotas da conta na OpenAI (requisições e tokens por minuto)
+OPENAI_RPM = int(os.getenv("OPENAI_RPM", 3500))
+OPENAI_TPM = int(os.getenv("OPENAI_TPM", 200000))
+
+# Versão dos templates de prompt; altere sempre que um prompt mudar para invalidar o cache
+PROMPT_VERSION = "2"
+# Novas tentativas quando a resposta chega mas não pode ser interpretada (ex.: sem a nota).
+# Falhas do provedor são tratadas pela RetryPolicy; quando ela desiste, não há nova tentativa.
+INVALID_RESPONSE_ATTEMPTS = int(os.getenv("LLM_INVALID_RESPONSE_ATTEMPTS", 3))
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+
+# Batch API: limite de requisições por lote e estados finais de um lote
+BATCH_MAX_REQUESTS = 50000
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_FINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+# Instruções fixas de cada prompt. Ficam na mensagem de sistema, seguidas da vaga e só
+# então do currículo: o início das mensagens é idêntico entre os candidatos de uma vaga
+# e aproveita o cache de prompt da OpenAI (prefixos a partir de 1024 tokens).
+RESUME_CV_INSTRUCTIONS = dedent('''
+    **Solicitação de Resumo de Currículo em Markdown:**
+
+    Por favor, gere um resumo do currículo fornecido, formatado em Markdown, seguindo rigorosamente o modelo abaixo. **Não adicione seções extras, tabelas ou qualquer outro tipo de formatação diferente da especificada.** Preencha cada seção com as informações relevantes, garantindo que o resumo seja preciso e focado.
+
+    **Formato de Output Esperado:**
+
+    ```markdown
+    ## Nome Completo
+    nome_completo aqui
+
+    ## Experiência
+    experiencia aqui
+
+    ## Habilidades
+    habilidades aqui
+
+    ## Educação
+    educacao aqui
+
+    ## Idiomas
+    idiomas aqui
+    ```
+''').strip()
+
+SCORE_INSTRUCTIONS = dedent('''
+    **Objetivo:** Avaliar um currículo com base em uma vaga específica e calcular a pontuação final. A nota máxima é 10.0.
+
+    **Instruções:**
+
+    1. **Experiência (Peso: 30%)**: Avalie a relevância da experiência em relação à vaga.
+    2. **Habilidades Técnicas (Peso: 25%)**: Verifique o alinhamento das habilidades técnicas com os requisitos da vaga.
+    3. **Educação (Peso: 10%)**: Avalie a relevância da formação acadêmica para a vaga.
+    4. **Idiomas (Peso: 10%)**: Avalie os idiomas e sua proficiência em relação à vaga.
+    5. **Pontos Fortes (Peso: 15%)**: Avalie a relevância dos pontos fortes para a vaga.
+    6. **Pontos Fracos (Desconto de até 10%)**: Avalie a gravidade dos pontos fracos em relação à vaga.
+
+    A vaga e o currículo do candidato são enviados nas mensagens seguintes.
+
+    **Output Esperado:**
+    ```
+    Pontuação Final: x.x
+    ```
+
+    **Atenção:** Seja rigoroso ao atribuir as notas. A nota máxima é 10.0, e o output deve conter apenas "Pontuação Final: x.x".
+''').strip()
+
+OPNION_INSTRUCTIONS = dedent('''
+    Por favor, analise o currículo fornecido em relação à descrição da vaga aplicada e crie uma opinião ultra crítica e detalhada. A sua análise deve incluir os seguintes pontos:
+    Você deve pensar como o recrutador chefe que está analisando e gerando uma opnião descritiva sobre o curriculo do canditato que se candidatou para a vaga
+
+    Formate a resposta de forma profissional, coloque titulos grandes nas sessões.
+
+    1. **Pontos de Alinhamento**: Identifique e discuta os aspectos do currículo que estão diretamente alinhados com os requisitos da vaga. Inclua exemplos específicos de experiências, habilidades ou qualificações que correspondem ao que a vaga está procurando.
+
+    2. **Pontos de Desalinhamento**: Destaque e discuta as áreas onde o candidato não atende aos requisitos da vaga. Isso pode incluir falta de experiência em áreas chave, ausência de habilidades técnicas específicas, ou qualificações que não correspondem às expectativas da vaga.
+
+    3. **Pontos de Atenção**: Identifique e discuta características do currículo que merecem atenção especial. Isso pode incluir aspectos como a frequência com que o candidato troca de emprego, lacunas no histórico de trabalho, ou características pessoais que podem influenciar o desempenho no cargo, tanto de maneira positiva quanto negativa.
+
+    Sua análise deve ser objetiva, baseada em evidências apresentadas no currículo e na descrição da vaga. Seja detalhado e forneça uma avaliação honesta dos pontos fortes e fracos do candidato em relação à vaga.
+
+    A descrição da vaga e o currículo original são enviados nas mensagens seguintes.
+
+    Você deve devolver essa analise critica formatada como se fosse um relatorio analitico do curriculum com a vaga, deve estar formatado com titulos grandes em destaques
+''').strip()
+
+EVALUATE_CV_INSTRUCTIONS = dedent('''
+    Você é o recrutador chefe avaliando um currículo para uma vaga específica. Em uma única resposta, extraia o resumo do currículo, escreva uma opinião crítica e atribua as notas de cada critério.
+
+    **Resumo:** preencha `name` com o nome completo do candidato e `experience`, `skills`, `education` e `languages` com itens curtos e objetivos extraídos do currículo. Não invente informações; use listas vazias quando não houver dados.
+
+    **Opinião (`opnion`):** relatório ultra crítico e detalhado, formatado em Markdown com títulos grandes, contendo:
+    1. **Pontos de Alinhamento** com os requisitos da vaga, com exemplos específicos.
+    2. **Pontos de Desalinhamento**, como falta de experiência ou habilidades exigidas.
+    3. **Pontos de Atenção**, como trocas frequentes de emprego ou lacunas no histórico.
+
+    **Notas (`scores`, de 0.0 a 10.0):** seja rigoroso.
+    - `experience`: relevância da experiência para a vaga.
+    - `technical_skills`: alinhamento das habilidades técnicas com os requisitos.
+    - `education`: relevância da formação acadêmica.
+    - `languages`: idiomas e proficiência em relação à vaga.
+    - `strengths`: relevância dos pontos fortes.
+    - `weaknesses`: gravidade dos pontos fracos (10.0 = muito graves).
+
+    A vaga e o currículo do candidato são enviados nas mensagens seguintes.
+''').strip()
+
+# Um limitador por modelo, compartilhado por todas as instâncias do OpenAIClient
+_rate_limiters = {}
+
+
+def get_rate_limiter(model_id):
+    """Retorna o limitador compartilhado do modelo, criando-o no primeiro uso."""
+    if model_id not in _rate_limiters:
+        _rate_limiters[model_id] = RateLimiter(rpm=OPENAI_RPM, tpm=OPENAI_TPM)
+    return _rate_limiters[model_id]
+
+
+# Um circuit breaker por modelo: uma queda do provedor pausa todas as chamadas de uma vez
+_circuit_breakers = {}
+
+
+def get_circuit_breaker(model_id):
+    """Retorna o circuit breaker compartilhado do modelo, criando-o no primeiro uso."""
+    if model_id not in _circuit_breakers:
+        _circuit_breakers[model_id] = CircuitBreaker(name=model_id)
+    return _circuit_breakers[model_id]
+
+
+_response_cache = None
+
+
+def get_response_cache():
+    """Retorna o cache de respostas compartilhado, abrindo-o no primeiro uso."""
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = ResponseCache()
+    return _response_cache
+
+
 class OpenAIClient:
-    def __init__(self, model_id="gpt-3.5-turbo"): # Alterando o modelo padrão
+    def __init__(self, model_id="gpt-3.5-turbo", rate_limiter=None, retry_policy=None, circuit_breaker=None,
+                 cache=None): # Alterando o modelo padrão
         # Inicializar o modelo de linguagem com o ID especificado
         self.model_id = model_id
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        # Cache de respostas em disco (None desativa quando LLM_CACHE_ENABLED=0)
+        self.cache = cache if cache is not None else (get_response_cache() if LLM_CACHE_ENABLED else None)
+        self.rate_limiter = rate_limiter or get_rate_limiter(model_id)
+        # Novas tentativas ficam a cargo da RetryPolicy (o SDK não repete sozinho: max_retries=0)
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = circuit_breaker or get_circuit_breaker(model_id)
+        # Tokens consumidos pelas chamadas deste cliente (ver usage_summary)
+        self.usage = {"requests": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0}
+        self.usage_lock = threading.Lock()
+        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+        # Cliente assíncrono usado pelo pipeline concorrente do analise.py
+        self.async_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+        # Arquivos e lotes da Batch API ficam fora da RetryPolicy e mantêm as novas tentativas do SDK
+        self.batch_client = self.client.with_options(max_retries=2)
 
-    def generate_response(self, prompt):
-        # Enviar o prompt ao modelo e obter a resposta
+    def generate_response(self, prompt=None, use_cache=True, response_format=None, messages=None, label="chat"):
+        # Enviar as mensagens (ou um prompt simples) ao modelo e obter a resposta
+        messages = messages or [{"role": "user", "content": prompt}]
+        cache_key = self.cache_key(messages, response_format)
+        if use_cache and self.cache is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                metrics.inc("llm_cache_hits_total", model=self.model_id, prompt=label)
+                return cached
+        reserved = self.estimate_request_tokens(messages)
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            # Com o provedor fora do ar, todas as chamadas aguardam o mesmo circuito
+            wait = self.circuit_wait(started, label)
+            if wait is None:
+                return None
+            if wait > 0:
+                time.sleep(wait)
+                continue
+            try:
+                # Aguardar cota no limitador compartilhado antes de chamar a API
+                with metrics.timer("rate_limit_wait_seconds", model=self.model_id):
+                    self.rate_limiter.acquire(reserved)
+                with metrics.timer("llm_request_seconds", model=self.model_id, prompt=label):
+                    raw = self.client.chat.completions.with_raw_response.create(
+                        model=self.model_id,
+                        messages=messages,
+                        timeout=self.retry_policy.timeout(started),
+                        **self.request_options(response_format)
+                    )
+                self.circuit_breaker.record_success()
+                return self.handle_raw_response(raw, reserved, cache_key, label)
+            except Exception as e:
+                delay = self.retry_delay(e, attempt, started, reserved, label)
+                if delay is None:
+                    return None
+            attempt += 1
+            time.sleep(delay)
+
+    async def generate_response_async(self, prompt=None, use_cache=True, response_format=None, messages=None,
+                                      label="chat"):
+        # Versão assíncrona do generate_response, usando o cliente AsyncOpenAI
+        messages = messages or [{"role": "user", "content": prompt}]
+        cache_key = self.cache_key(messages, response_format)
+        if use_cache and self.cache is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                metrics.inc("llm_cache_hits_total", model=self.model_id, prompt=label)
+                return cached
+        reserved = self.estimate_request_tokens(messages)
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            wait = self.circuit_wait(started, label)
+            if wait is None:
+                return None
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            try:
+                with metrics.timer("rate_limit_wait_seconds", model=self.model_id):
+                    await self.rate_limiter.acquire_async(reserved)
+                with metrics.timer("llm_request_seconds", model=self.model_id, prompt=label):
+                    raw = await self.async_client.chat.completions.with_raw_response.create(
+                        model=self.model_id,
+                        messages=messages,
+                        timeout=self.retry_policy.timeout(started),
+                        **self.request_options(response_format)
+                    )
+                self.circuit_breaker.record_success()
+                return self.handle_raw_response(raw, reserved, cache_key, label)
+            except Exception as e:
+                delay = self.retry_delay(e, attempt, started, reserved, label)
+                if delay is None:
+                    return None
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def parse_attempts(self, parse, max_attempts, label):
+        """
+        Novas tentativas quando a resposta chega mas `parse` não consegue
+        interpretá-la, compartilhadas pelas versões síncrona e assíncrona: o
+        gerador produz o `use_cache` de cada tentativa, recebe a resposta bruta
+        e termina com o valor interpretado (ou None).
+        """
+        for attempt in range(max_attempts):
+            # A partir da segunda tentativa ignora o cache, que guardaria a resposta inválida
+            result_raw = yield attempt == 0
+            if result_raw is None:
+                # A chamada já esgotou as tentativas da RetryPolicy
+                return None
+            value = parse(result_raw)
+            if value is not None:
+                return value
+            metrics.inc("llm_retries_total", model=self.model_id, prompt=label, reason="invalid_response")
+            logging.warning(f"Resposta inválida ({label}) na tentativa {attempt + 1}/{max_attempts}.")
+        return None
+
+    def generate_parsed(self, parse, max_attempts, label="chat", **request):
+        """generate_response + `parse`, repetindo a chamada enquanto a resposta for inválida."""
+        attempts = self.parse_attempts(parse, max_attempts, label)
+        try:
+            use_cache = next(attempts)
+            while True:
+                use_cache = attempts.send(self.generate_response(use_cache=use_cache, label=label, **request))
+        except StopIteration as stop:
+            return stop.value
+
+    async def generate_parsed_async(self, parse, max_attempts, label="chat", **request):
+        # Versão assíncrona do generate_parsed
+        attempts = self.parse_attempts(parse, max_attempts, label)
         try:
-            response = self.client.chat.completions.create(
-                model=self.model_id,
-                messages=[{"role": "user", "content": prompt}]
+            use_cache = next(attempts)
+            while True:
+                use_cache = attempts.send(
+                    await self.generate_response_async(use_cache=use_cache, label=label, **request)
+                )
+        except StopIteration as stop:
+            return stop.value
+
+    def circuit_wait(self, started, label):
+        """Espera pedida pelo circuit breaker, ou None se ela passaria do prazo da chamada."""
+        wait = self.circuit_breaker.wait_time()
+        if wait > 0 and wait >= self.retry_policy.remaining(started):
+            metrics.inc("llm_errors_total", model=self.model_id, prompt=label, reason="circuit_open")
+            logging.error(f"Provedor indisponível: chamada {label} abandonada após {time.monotonic() - started:.0f}s.")
+            return None
+        return wait
+
+    def retry_delay(self, error, attempt, started, reserved, label):
+        """
+        Aplica a política de novas tentativas a um erro da chamada: retorna a
+        espera até a próxima tentativa ou None se a chamada deve ser abandonada.
+        """
+        kind = classify_error(error)
+        if kind == "rate_limit":
+            # A requisição recusada não consumiu tokens da cota, e o provedor está respondendo
+            self.rate_limiter.record_usage(reserved, 0)
+            self.circuit_breaker.record_success()
+        elif kind is not None:
+            self.circuit_breaker.record_failure()
+        else:
+            # Erro da própria requisição (ex.: 400): repetir não adianta
+            self.circuit_breaker.record_success()
+            metrics.inc("llm_errors_total", model=self.model_id, prompt=label, reason="invalid_request")
+            logging.error(f"Erro ao gerar resposta ({label}): {error}")
+            return None
+
+        headers = error.response.headers if getattr(error, "response", None) is not None else None
+        retry_after = parse_retry_after(headers, str(error)) if kind == "rate_limit" else None
+        delay = self.retry_policy.delay(kind, attempt, retry_after)
+        if not self.retry_policy.allows(attempt, started, delay):
+            metrics.inc("llm_errors_total", model=self.model_id, prompt=label, reason=kind)
+            logging.error(
+                f"Erro ao gerar resposta ({label}) após {attempt + 1} tentativas "
+                f"em {time.monotonic() - started:.0f}s: {error}"
             )
-            return response.choices[0].message.content
-        except Exception as e:
-            print(f"Erro ao gerar resposta: {e}")
             return None
+        metrics.inc("llm_retries_total", model=self.model_id, prompt=label, reason=kind)
+        if kind == "rate_limit":
+            # Pausa compartilhada: os demais currículos também esperam, em vez de receber outro 429
+            self.rate_limiter.penalize(delay)
+            logging.warning(f"Rate limit atingido; pausando as chamadas por {delay:.2f} segundos...")
+            return 0.0
+        logging.warning(
+            f"Falha do provedor ({kind}) na tentativa {attempt + 1}/{self.retry_policy.max_attempts}; "
+            f"nova tentativa em {delay:.2f} segundos..."
+        )
+        return delay
 
-    def resume_cv(self, cv):
-        # Criar o prompt para gerar um resumo do currículo em Markdown
-        prompt = f'''
-            **Solicitação de Resumo de Currículo em Markdown:**
-            
-            # Curriculo do candidato para resumir:
-            
-            {cv}
+    def estimate_request_tokens(self, messages):
+        """Estima os tokens de prompt + resposta que serão reservados no limitador."""
+        prompt_tokens = sum(
+            estimate_tokens(message["content"], self.model_id) + 4 for message in messages
+        )
+        return prompt_tokens + DEFAULT_COMPLETION_TOKENS
+
+    def cache_key(self, messages, response_format=None):
+        """Chave do cache: hash do modelo, da versão dos prompts e das mensagens."""
+        if response_format is not None:
+            return make_cache_key(self.model_id, PROMPT_VERSION, {"messages": messages, "response_format": response_format})
+        return make_cache_key(self.model_id, PROMPT_VERSION, messages)
+
+    def request_options(self, response_format=None):
+        """Parâmetros opcionais da chamada (ex.: resposta estruturada em JSON schema)."""
+        return {"response_format": response_format} if response_format is not None else {}
+
+    def handle_raw_response(self, raw, reserved, cache_key, label="chat"):
+        """Atualiza o limitador com os cabeçalhos/uso da resposta, grava no cache e retorna o conteúdo."""
+        self.rate_limiter.update_from_headers(raw.headers)
+        response = raw.parse()
+        if response.usage:
+            self.rate_limiter.record_usage(reserved, response.usage.total_tokens)
+            self.record_usage(response.usage, label)
+        content = response.choices[0].message.content
+        if self.cache is not None:
+            self.cache.set(cache_key, content)
+        return content
+
+    def record_usage(self, usage, label="chat", batch=False):
+        """Acumula o uso de tokens da chamada, incluindo os tokens do prompt servidos do cache da OpenAI."""
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = getattr(details, "cached_tokens", None) or 0
+        with self.usage_lock:
+            self.usage["requests"] += 1
+            self.usage["prompt_tokens"] += usage.prompt_tokens
+            self.usage["cached_tokens"] += cached_tokens
+            self.usage["completion_tokens"] += usage.completion_tokens
+        record_llm_usage(self.model_id, label, usage.prompt_tokens, usage.completion_tokens, cached_tokens, batch)
+        logging.debug(
+            f"Chamada {self.model_id}: {usage.prompt_tokens} tokens de prompt "
+            f"({cached_tokens} em cache), {usage.completion_tokens} de resposta."
+        )
+        return cached_tokens
 
-            Por favor, gere um resumo do currículo fornecido, formatado em Markdown, seguindo rigorosamente o modelo abaixo. **Não adicione seções extras, tabelas ou qualquer outro tipo de formatação diferente da especificada.** Preencha cada seção com as informações relevantes, garantindo que o resumo seja preciso e focado.
+    def usage_summary(self):
+        """Totais de tokens do cliente e a fração do prompt servida do cache."""
+        with self.usage_lock:
+            summary = dict(self.usage)
+        prompt_tokens = summary["prompt_tokens"]
+        summary["cached_ratio"] = summary["cached_tokens"] / prompt_tokens if prompt_tokens else 0.0
+        return summary
 
-            **Formato de Output Esperado:**
+    def batch_request(self, custom_id, messages, response_format=None):
+        """Linha do arquivo JSONL da Batch API para uma chamada de chat."""
+        return {
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": BATCH_ENDPOINT,
+            "body": {"model": self.model_id, "messages": messages, **self.request_options(response_format)},
+        }
 
-            ```markdown
-            ## Nome Completo
-            nome_completo aqui
+    def submit_batch(self, requests, file_path, metadata=None):
+        """Grava as requisições em JSONL, envia o arquivo e cria o lote. Retorna o ID do lote."""
+        if len(requests) > BATCH_MAX_REQUESTS:
+            raise ValueError(f"Um lote aceita no máximo {BATCH_MAX_REQUESTS} requisições ({len(requests)} recebidas).")
+        with open(file_path, "w", encoding="utf-8") as f:
+            for request in requests:
+                f.write(json.dumps(request, ensure_ascii=False) + "\n")
+        with open(file_path, "rb") as f:
+            input_file = self.batch_client.files.create(file=f, purpose="batch")
+        batch = self.batch_client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window="24h",
+            metadata=metadata,
+        )
+        logging.info(f"Lote {batch.id} criado com {len(requests)} requisições ({file_path}).")
+        return batch.id
 
-            ## Experiência
-            experiencia aqui
+    def wait_batch(self, batch_id, poll_interval=60, timeout=None):
+        """Consulta o lote até ele terminar (ou até `timeout` segundos) e retorna o objeto do lote."""
+        started = time.monotonic()
+        while True:
+            batch = self.batch_client.batches.retrieve(batch_id)
+            if batch.status in BATCH_FINAL_STATUSES:
+                return batch
+            if timeout is not None and time.monotonic() - started >= timeout:
+                raise TimeoutError(f"Lote {batch_id} ainda em '{batch.status}' após {timeout} segundos.")
+            counts = batch.request_counts
+            if counts:
+                logging.info(f"Lote {batch_id}: {batch.status}, {counts.completed}/{counts.total} concluídas.")
+            time.sleep(poll_interval)
 
-            ## Habilidades 
-            habilidades aqui
+    def batch_results(self, batch):
+        """Baixa a saída do lote e retorna {custom_id: conteúdo da resposta ou None em caso de erro}."""
+        results = {}
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for line in self.batch_client.files.content(file_id).text.splitlines():
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                response = item.get("response") or {}
+                if item.get("error") or response.get("status_code") != 200:
+                    results[item["custom_id"]] = None
+                    continue
+                body = response["body"]
+                if body.get("usage"):
+                    # O tipo do prompt vem do custom_id (índice:tipo)
+                    label = item["custom_id"].rsplit(":", 1)[-1].replace("resum", "resume")
+                    self.record_usage(CompletionUsage.model_validate(body["usage"]), label, batch=True)
+                results[item["custom_id"]] = body["choices"][0]["message"]["content"]
+        return results
 
-            ## Educação 
-            educacao aqui
+    def job_block(self, job):
+        """Descrição da vaga em texto estável: mesmos campos, ordem e formato para todos os currículos."""
+        return "\n\n".join([
+            f"# Vaga que o candidato está se candidatando: {job.get('name')}",
+            f"## Atividades principais\n{(job.get('main_activities') or '').strip()}",
+            f"## Pré-requisitos\n{(job.get('prerequisites') or '').strip()}",
+            f"## Diferenciais\n{(job.get('differentials') or '').strip()}",
+        ])
 
-            ## Idiomas 
-            idiomas aqui
+    def build_messages(self, instructions, cv, job=None):
+        """Mensagens na ordem do cache de prompt: instruções fixas, vaga e, por último, o currículo."""
+        messages = [{"role": "system", "content": instructions}]
+        if job is not None:
+            messages.append({"role": "user", "content": self.job_block(job)})
+        messages.append({"role": "user", "content": f"# Curriculo do candidato\n\n{cv}"})
+        return messages
 
-            '''
+    def resume_cv_prompt(self, cv):
+        # Criar as mensagens para gerar um resumo do currículo em Markdown
+        return self.build_messages(RESUME_CV_INSTRUCTIONS, cv)
 
+    def resume_cv(self, cv):
         # Gerar a resposta usando o modelo de linguagem
-        result_raw = self.generate_response(prompt=prompt)
-        
+        result_raw = self.generate_response(messages=self.resume_cv_prompt(cv), label="resume")
+        return self.extract_resume_from_result(result_raw)
+
+    async def resume_cv_async(self, cv):
+        # Versão assíncrona do resume_cv
+        result_raw = await self.generate_response_async(messages=self.resume_cv_prompt(cv), label="resume")
+        return self.extract_resume_from_result(result_raw)
+
+    def extract_resume_from_result(self, result_raw):
+        """Extrair o resumo em Markdown da resposta gerada."""
          # Tentar extrair o conteúdo após o marcador ```markdown
         if result_raw:
             try:
@@ -69,55 +508,28 @@ class OpenAIClient:
             return result
         return None
     
-    def generate_score(self, cv, job, max_attempts=10, base_wait_time=5):
-        # Criar o prompt para calcular a pontuação do currículo com base na vaga
-        prompt = f'''
-            **Objetivo:** Avaliar um currículo com base em uma vaga específica e calcular a pontuação final. A nota máxima é 10.0.
-
-            **Instruções:**
-
-            1. **Experiência (Peso: 30%)**: Avalie a relevância da experiência em relação à vaga.
-            2. **Habilidades Técnicas (Peso: 25%)**: Verifique o alinhamento das habilidades técnicas com os requisitos da vaga.
-            3. **Educação (Peso: 10%)**: Avalie a relevância da formação acadêmica para a vaga.
-            4. **Idiomas (Peso: 10%)**: Avalie os idiomas e sua proficiência em relação à vaga.
-            5. **Pontos Fortes (Peso: 15%)**: Avalie a relevância dos pontos fortes para a vaga.
-            6. **Pontos Fracos (Desconto de até 10%)**: Avalie a gravidade dos pontos fracos em relação à vaga.
-            
-            Curriculo do candidato
-            
-            {cv}
-            
-            Vaga que o candidato está se candidatando
-            
-            {job}
+    def generate_score_prompt(self, cv, job):
+        # Criar as mensagens para calcular a pontuação do currículo com base na vaga
+        return self.build_messages(SCORE_INSTRUCTIONS, cv, job)
 
-            **Output Esperado:**
-            ```
-            Pontuação Final: x.x
-            ```
-            
-            **Atenção:** Seja rigoroso ao atribuir as notas. A nota máxima é 10.0, e o output deve conter apenas "Pontuação Final: x.x".
-        
-        '''
-        
-        # Tentar gerar a pontuação em múltiplas tentativas, caso necessário
-        for attempt in range(max_attempts):
-            # Gerar a resposta usando o modelo de linguagem
-            result_raw = self.generate_response(prompt=prompt)
-            
-            # Extrair a pontuação da resposta gerada
-            score = self.extract_score_from_result(result_raw)
-        
-            # Se a pontuação foi extraída com sucesso, retornar a pontuação
-            if score is not None:
-                return score
-            
-            # Se falhar, exibir mensagem de erro e tentar novamente
-            print(f"Tentativa {attempt + 1} falhou. Tentando novamente...")
-            time.sleep(base_wait_time)
-        
-        # Lançar um erro se não conseguir gerar a pontuação após várias tentativas
-        raise ValueError("Não foi possível gerar a pontuação após várias tentativas.")
+    def generate_score(self, cv, job, max_attempts=INVALID_RESPONSE_ATTEMPTS):
+        # Tentar gerar a pontuação em múltiplas tentativas, caso a resposta venha sem a nota
+        score = self.generate_parsed(
+            self.extract_score_from_result, max_attempts, messages=self.generate_score_prompt(cv, job), label="score"
+        )
+        if score is None:
+            # Lançar um erro se não conseguir gerar a pontuação após várias tentativas
+            raise ValueError("Não foi possível gerar a pontuação após várias tentativas.")
+        return score
+
+    async def generate_score_async(self, cv, job, max_attempts=INVALID_RESPONSE_ATTEMPTS):
+        # Versão assíncrona do generate_score
+        score = await self.generate_parsed_async(
+            self.extract_score_from_result, max_attempts, messages=self.generate_score_prompt(cv, job), label="score"
+        )
+        if score is None:
+            raise ValueError("Não foi possível gerar a pontuação após várias tentativas.")
+        return score
     
     def extract_score_from_result(self, result_raw):
         """Extrair a pontuação final da resposta gerada."""
@@ -143,31 +555,55 @@ class OpenAIClient:
         # Retornar None se não encontrar a pontuação ou se for inválida
         return None
 
+    def generate_opnion_prompt(self, cv, job):
+        # Criar as mensagens para gerar uma opinião crítica sobre o currículo
+        return self.build_messages(OPNION_INSTRUCTIONS, cv, job)
+
     def generate_opnion(self, cv, job):
-        # Criar o prompt para gerar uma opinião crítica sobre o currículo
-        prompt = f'''
-            Por favor, analise o currículo fornecido em relação à descrição da vaga aplicada e crie uma opinião ultra crítica e detalhada. A sua análise deve incluir os seguintes pontos:
-            Você deve pensar como o recrutador chefe que está analisando e gerando uma opnião descritiva sobre o curriculo do canditato que se candidatou para a vaga
-            
-            Formate a resposta de forma profissional, coloque titulos grandes nas sessões.
+        # Gerar a resposta usando o modelo de linguagem
+        result_raw = self.generate_response(messages=self.generate_opnion_prompt(cv, job), label="opnion")
+        result = result_raw
+        return result
 
-            1. **Pontos de Alinhamento**: Identifique e discuta os aspectos do currículo que estão diretamente alinhados com os requisitos da vaga. Inclua exemplos específicos de experiências, habilidades ou qualificações que correspondem ao que a vaga está procurando.
+    async def generate_opnion_async(self, cv, job):
+        # Versão assíncrona do generate_opnion
+        return await self.generate_response_async(messages=self.generate_opnion_prompt(cv, job), label="opnion")
 
-            2. **Pontos de Desalinhamento**: Destaque e discuta as áreas onde o candidato não atende aos requisitos da vaga. Isso pode incluir falta de experiência em áreas chave, ausência de habilidades técnicas específicas, ou qualificações que não correspondem às expectativas da vaga.
+    def evaluate_cv_prompt(self, cv, job):
+        # Criar as mensagens de uma única chamada que gera resumo, opinião e notas
+        return self.build_messages(EVALUATE_CV_INSTRUCTIONS, cv, job)
 
-            3. **Pontos de Atenção**: Identifique e discuta características do currículo que merecem atenção especial. Isso pode incluir aspectos como a frequência com que o candidato troca de emprego, lacunas no histórico de trabalho, ou características pessoais que podem influenciar o desempenho no cargo, tanto de maneira positiva quanto negativa.
+    def evaluation_response_format(self):
+        """JSON schema (structured outputs) usado pelo evaluate_cv."""
+        return {
+            "type": "json_schema",
+            "json_schema": {
+                "name": "cv_evaluation",
+                "strict": True,
+                "schema": CVEvaluation.model_json_schema(),
+            },
+        }
 
-            Sua análise deve ser objetiva, baseada em evidências apresentadas no currículo e na descrição da vaga. Seja detalhado e forneça uma avaliação honesta dos pontos fortes e fracos do candidato em relação à vaga.
+    def evaluate_cv(self, cv, job, max_attempts=2):
+        """Gera resumo, opinião e notas em uma única chamada estruturada."""
+        return self.generate_parsed(
+            self.extract_evaluation_from_result, max_attempts, messages=self.evaluate_cv_prompt(cv, job),
+            response_format=self.evaluation_response_format(), label="evaluation",
+        )
 
-            **Currículo Original:**
-            {cv}
+    async def evaluate_cv_async(self, cv, job, max_attempts=2):
+        # Versão assíncrona do evaluate_cv
+        return await self.generate_parsed_async(
+            self.extract_evaluation_from_result, max_attempts, messages=self.evaluate_cv_prompt(cv, job),
+            response_format=self.evaluation_response_format(), label="evaluation",
+        )
 
-            **Descrição da Vaga:**
-            {job}
-            
-            Você deve devolver essa analise critica formatada como se fosse um relatorio analitico do curriculum com a vaga, deve estar formatado com titulos grandes em destaques
-        '''
-        # Gerar a resposta usando o modelo de linguagem
-        result_raw = self.generate_response(prompt=prompt)
-        result = result_raw
-        return result
\ No newline at end of file
+    def extract_evaluation_from_result(self, result_raw):
+        """Validar a resposta JSON diretamente no modelo CVEvaluation."""
+        if not result_raw:
+            return None
+        try:
+            return CVEvaluation.model_validate_json(result_raw)
+        except ValidationError as e:
+            logging.warning(f"Resposta estruturada inválida: {e}")
+            return None
@@ -1,144 +1,752 @@
 import os
-import uuid
 import time
-import re
+import uuid
+import asyncio
 import logging
+import threading
+import json
+import concurrent.futures
 from helper import read_uploaded_file, format_cv
-from database import AnalyzeDatabase
-from ai import OpenAIClient
+from preprocess import Preprocessor, preprocess_chunk, PREPROCESS_WORKERS, PREPROCESS_CHUNK_SIZE
+from prescreen import prescreen, PRESCREEN_TOP_K, PRESCREEN_THRESHOLD
+from ai import PROMPT_VERSION, BATCH_MAX_REQUESTS
+from metrics import registry as metrics, track_cv_cost
+from resources import get_database, get_ai, STRUCTURED_MODEL
 from models.resum import Resum
 from models.file import File
-from openai import RateLimitError
 from models.analysis import Analysis
-from helper import extract_data_analysis, get_pdf_paths
+from models.cv_artifact import CVArtifact
+from helper import extract_data_analysis, analysis_from_evaluation, get_pdf_paths, file_sha256
 
 # Configuração do logging
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
 )
 
-# Instanciar a base de dados
-database = AnalyzeDatabase()
+# Vaga padrão quando nenhuma é informada
+DEFAULT_JOB_NAME = "Vaga de Assessor Legislativo"
+# Pasta local dos currículos sincronizados do Drive
+CV_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "drive", "curriculos")
 
-# Instanciar o cliente AI
-ai = OpenAIClient()
+# Configurações
+concurrency = int(os.getenv("ANALISE_CONCURRENCY", 8))  # Currículos processados simultaneamente
+# "separate": três prompts por currículo; "combined": uma única resposta estruturada
+analysis_mode = os.getenv("ANALISE_MODE", "separate")
+flush_size = int(os.getenv("DB_FLUSH_SIZE", 50))  # Currículos por transação no banco
+flush_interval = float(os.getenv("DB_FLUSH_INTERVAL", 5))  # Segundos máximos entre gravações
+# Versão dos prompts que compõe o fingerprint (conteúdo do PDF, vaga, versão)
+prompt_version = f"{PROMPT_VERSION}-{analysis_mode}"
+# Batch API: pasta dos arquivos JSONL/estado dos lotes e intervalo entre as consultas
+BATCH_DIR = os.getenv("BATCH_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "batches"))
+BATCH_POLL_INTERVAL = float(os.getenv("BATCH_POLL_INTERVAL", 60))
 
-# Obter job pelo nome
-job = database.get_job_by_name("Vaga de Assessor Legislativo")
-if not job:
-    logging.error("Job 'Vaga de Assessor Legislativo' não encontrado.")
-    exit()
 
-# Configurações
-batch_size = 5  # Processar 5 currículos por vez
-max_attempts = 5  # Máximo de tentativas por arquivo
-base_wait_time = 5  # tempo de espera minimo
-
-def extract_wait_time(error_message):
-    """Extrai o tempo de espera da mensagem de erro da API."""
-    match = re.search(r"Please try again in ([\d.]+)(s|m)", error_message)
-    if match:
-        wait_time = float(match.group(1))
-        unit = match.group(2)
-        if unit == "m":
-            wait_time *= 60
-        return wait_time
-    return base_wait_time  # tempo de espera padrão se não encontrar tempo na mensagem
+def load_fingerprints():
+    """Carrega os fingerprints já processados, registrando os currículos antigos sem hash."""
+    database = get_database()
+    legacy_rows = []
+    for resum in database.get_resums_without_fingerprint():
+        if os.path.isfile(resum.get("file", "")):
+            legacy_rows.append({
+                "sha256": file_sha256(resum["file"]),
+                "job_id": resum["job_id"],
+                "prompt_version": prompt_version,
+                "resum_id": resum["id"],
+            })
+    if legacy_rows:
+        database.fingerprints.insert_multiple(legacy_rows)
+        logging.info(f"{len(legacy_rows)} currículos antigos registrados por fingerprint.")
+    return database.load_fingerprints()
 
 
-def process_cv(path, job):
-    """Processa um único currículo."""
-    for attempt in range(max_attempts):
-        try:
-            # Verificar se o arquivo já foi processado
-            existing_resum = database.get_resum_by_file(path)
-            if existing_resum:
-                logging.info(f"Currículo {path} já foi processado. Pulando.")
-                return None  # Indica que o currículo foi pulado
+def previous_analysis(path, job):
+    """Remoções das análises anteriores do mesmo arquivo para a vaga (PDF editado ou prompt novo)."""
+    database = get_database()
+    replaces = []
+    for resum in database.resums.find(file=str(path), job_id=job.get("id")):
+        replaces += [
+            (database.analysis, {"resum_id": resum["id"]}),
+            (database.fingerprints, {"resum_id": resum["id"]}),
+            (database.resums, {"id": resum["id"]}),
+        ]
+    return replaces
+
+
+def log_token_usage(ai, before):
+    """Registra os tokens gastos desde `before` e quanto do prompt veio do cache da OpenAI."""
+    after = ai.usage_summary()
+    prompt_tokens = after["prompt_tokens"] - before["prompt_tokens"]
+    cached_tokens = after["cached_tokens"] - before["cached_tokens"]
+    ratio = cached_tokens / prompt_tokens if prompt_tokens else 0.0
+    logging.info(
+        f"Tokens ({ai.model_id}): {after['requests'] - before['requests']} chamadas, "
+        f"{prompt_tokens} de prompt ({cached_tokens} em cache, {ratio:.0%}), "
+        f"{after['completion_tokens'] - before['completion_tokens']} de resposta."
+    )
+
+
+def prepare_cv(path):
+    """Lê o PDF e normaliza o texto (etapa de CPU, executada fora do event loop)."""
+    content = read_uploaded_file(path)
+    formatted_content = format_cv(content)
+    return content, formatted_content
+
+
+def load_cv_text(path, sha256):
+    """Texto e texto formatado do currículo: do cv_artifacts, se o PDF já foi lido, ou do prepare_cv."""
+    artifact = get_database().get_cv_artifact(sha256) if sha256 else None
+    if artifact is not None:
+        metrics.inc("cv_artifact_hits_total", kind="text")
+        return artifact["text"], artifact["formatted_text"]
+    return prepare_cv(path)
+
+
+def summary_version(ai):
+    """Versão de um resumo em cache: muda com os prompts ou com o modelo que o gerou."""
+    return f"{PROMPT_VERSION}:{ai.model_id}"
+
+
+def cached_summary(artifact, ai):
+    """Resumo do cv_artifact, se ele foi gerado pelos prompts e modelo atuais."""
+    if artifact and artifact.get("summary") and artifact.get("summary_version") == summary_version(ai):
+        return artifact["summary"]
+    return None
+
+
+def new_artifact(sha256, content, formatted_content, existing, summary=None, ai=None):
+    """
+    cv_artifact a gravar junto com a análise: o currículo ainda sem artefato ou
+    um resumo recém-gerado. None quando o existente já serve.
+    """
+    if not sha256 or (existing is not None and summary is None):
+        return None
+    return CVArtifact(
+        sha256=sha256,
+        text=content,
+        formatted_text=formatted_content,
+        summary=summary if summary is not None else (existing or {}).get("summary"),
+        summary_version=summary_version(ai) if summary is not None else (existing or {}).get("summary_version"),
+    )
+
+
+async def gather_or_cancel(*calls):
+    """
+    asyncio.gather que, quando uma das chamadas falha, cancela as demais antes
+    de propagar o erro: as chamadas irmãs não continuam gastando tokens de um
+    currículo que já falhou.
+    """
+    tasks = [asyncio.ensure_future(call) for call in calls]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+def save_analysis(path, job, content, resum, opnion, score, unit_of_work, sha256=None, evaluation=None,
+                  artifact=None):
+    """
+    Monta o resumo, a análise, o arquivo e o fingerprint de um currículo já
+    avaliado e os entrega ao unit_of_work. Com `evaluation` (modo combinado) a
+    análise vem da resposta estruturada; sem ela, do resumo em Markdown.
+    `artifact` (CVArtifact) é gravado no mesmo lote, para as próximas vagas.
+    """
+    database = get_database()
+    resum_schema = Resum(
+        id=str(uuid.uuid4()),
+        job_id=job.get("id"),
+        content=resum,
+        file=str(path),
+        opnion=opnion,
+        file_hash=sha256,
+    )
+
+    file_schema = File(
+        file_id=str(uuid.uuid4()),
+        job_id=job.get("id"),
+    )
+
+    if evaluation is not None:
+        analysis_schema = analysis_from_evaluation(evaluation, job.get("id"), resum_schema.id)
+    else:
+        analysis_schema = extract_data_analysis(
+            resum, content, job.get("id"), resum_schema.id, score
+        )
+
+    rows = [
+        (database.resums, resum_schema.model_dump()),
+        (database.analysis, analysis_schema.model_dump()),
+        (database.files, file_schema.model_dump()),
+    ]
+    if sha256:
+        rows.append((database.fingerprints, {
+            "sha256": sha256,
+            "job_id": job.get("id"),
+            "prompt_version": prompt_version,
+            "resum_id": resum_schema.id,
+        }))
+    if artifact is not None:
+        rows.append((database.cv_artifacts, artifact.model_dump()))
 
-            content = read_uploaded_file(path)
+    # Inserir no banco de dados: os registros do currículo vão juntos no lote,
+    # substituindo a análise anterior do mesmo arquivo para a vaga
+    unit_of_work.add(*rows, replaces=previous_analysis(path, job))
 
-            # Formatar o currículo
-            formatted_content = format_cv(content)
+    logging.info(f"Currículo {path} processado com sucesso.")
+    return {
+        "status": "success",
+        "path": path,
+        "resum": resum,
+        "opnion": opnion,
+        "score": score,
+    }  # Indica que o processamento foi bem-sucedido
 
-            resum = ai.resume_cv(formatted_content)
+
+async def analyze_cv_async(path, job, content, formatted_content, unit_of_work, sha256=None):
+    """Executa as chamadas ao LLM de um currículo já lido e grava o resultado."""
+    ai = get_ai()
+    # Rate limit e esperas são tratados pelo OpenAIClient, compartilhados entre os currículos
+    try:
+        existing = await asyncio.to_thread(get_database().get_cv_artifact, sha256) if sha256 else None
+        generated_summary = None
+        if analysis_mode == "combined":
+            # Uma única chamada estruturada com resumo, opinião e notas
+            evaluation = await get_ai(STRUCTURED_MODEL).evaluate_cv_async(formatted_content, job)
+            if evaluation is None:
+                logging.error(f"Erro ao gerar avaliação estruturada para {path}. Pulando arquivo")
+                return {"status": "failed", "path": path, "error": "Erro ao gerar avaliação."}
+            resum = evaluation.to_markdown()
+            opnion = evaluation.opnion
+            score = evaluation.scores.final_score()
+        else:
+            # O resumo não depende da vaga: se o mesmo PDF já foi resumido, só as
+            # chamadas da vaga (opinião e nota) vão ao LLM
+            resum = cached_summary(existing, ai)
+            if resum is not None:
+                metrics.inc("cv_artifact_hits_total", kind="summary")
+            calls = [
+                ai.generate_opnion_async(formatted_content, job),
+                ai.generate_score_async(formatted_content, job),
+            ]
+            if resum is None:
+                calls.append(ai.resume_cv_async(formatted_content))
+            # As chamadas são independentes entre si e rodam em paralelo; se uma falhar, as outras são canceladas
+            opnion, score, *generated = await gather_or_cancel(*calls)
+            if generated:
+                resum = generated_summary = generated[0]
             if resum is None:
                 logging.error(f"Erro ao gerar resumo para {path}. Pulando arquivo")
-                return None
+                return {"status": "failed", "path": path, "error": "Erro ao gerar resumo."}
 
-            opnion = ai.generate_opnion(formatted_content, job)
             if opnion is None:
                 logging.error(f"Erro ao gerar opiniao para {path}. Pulando arquivo")
-                return None
+                return {"status": "failed", "path": path, "error": "Erro ao gerar opiniao."}
 
-            score = ai.generate_score(formatted_content, job)
             if score is None:
                 logging.error(f"Erro ao gerar score para {path}. Pulando arquivo")
-                return None
-
-            resum_schema = Resum(
-                id=str(uuid.uuid4()),
-                job_id=job.get("id"),
-                content=resum,
-                file=str(path),
-                opnion=opnion,
-            )
-
-            file_schema = File(
-                file_id=str(uuid.uuid4()),
-                job_id=job.get("id"),
-            )
-
-            analysis_schema = extract_data_analysis(
-                resum, content, job.get("id"), resum_schema.id, score
-            )
+                return {"status": "failed", "path": path, "error": "Erro ao gerar score."}
 
-            # Inserir no banco de dados
-            database.resums.insert(resum_schema.model_dump())
-            database.analysis.insert(analysis_schema.model_dump())
-            database.files.insert(file_schema.model_dump())
-
-            logging.info(f"Currículo {path} processado com sucesso.")
-            return {
-                "status": "success",
-                "path": path,
-                "resum": resum,
-                "opnion": opnion,
-                "score": score,
-            }  # Indica que o processamento foi bem-sucedido
-        except RateLimitError as e:
-            wait_time = extract_wait_time(str(e))
-            logging.warning(
-                f"Rate limit atingido ao processar {path}. Tentativa {attempt + 1}/{max_attempts}. Aguardando {wait_time:.2f} segundos..."
-            )
-            time.sleep(wait_time)
-        except Exception as e:
-            logging.error(f"Erro inesperado ao processar {path} (tentativa {attempt + 1}/{max_attempts}): {e}")
-            break  # se ocorrer algum outro erro, sair do loop
-    else:
-        logging.error(f"Falha ao processar {path} após {max_attempts} tentativas.")
+        artifact = new_artifact(sha256, content, formatted_content, existing, generated_summary, ai)
+        # Em uma thread: a normalização dos termos (spaCy) e um eventual flush não travam o event loop
+        return await asyncio.to_thread(
+            save_analysis, path, job, content, resum, opnion, score, unit_of_work, sha256,
+            evaluation if analysis_mode == "combined" else None, artifact,
+        )
+    except Exception as e:
+        logging.error(f"Erro inesperado ao processar {path}: {e}")
         return {
             "status": "failed",
             "path": path,
-            "error": f"Falha ao processar após {max_attempts} tentativas.",
+            "error": str(e),
         }
 
-# Processar currículos em lotes
-def main(batch_size=batch_size):
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    cv_paths = get_pdf_paths(os.path.join(current_dir, "drive", "curriculos"))
-    if not cv_paths:
-      logging.warning("Nenhum currículo encontrado no diretório 'drive/curriculos'.")
-      return [] # retornar lista vazia
+
+async def process_cv_async(path, job):
+    """Processa um único currículo."""
+    database = get_database()
+    # Verificar se o conteúdo já foi processado para esta vaga e versão dos prompts
+    sha256 = await asyncio.to_thread(file_sha256, path)
+    if database.get_fingerprint(sha256, job.get("id"), prompt_version):
+        logging.info(f"Currículo {path} já foi processado. Pulando.")
+        return {"status": "skipped", "path": path}  # Indica que o currículo foi pulado
+
+    content, formatted_content = await asyncio.to_thread(load_cv_text, path, sha256)
+    with database.unit_of_work(flush_size=1) as unit_of_work:
+        return await analyze_cv_async(path, job, content, formatted_content, unit_of_work, sha256)
+
+
+def process_cv(path, job):
+    """Processa um único currículo (versão síncrona)."""
+    return asyncio.run(process_cv_async(path, job))
+
+
+async def folder_source(cv_paths):
+    """Fonte de currículos a partir dos PDFs já presentes no disco."""
+    for path in cv_paths:
+        yield path, None
+
+
+async def drive_source(token_path, credentials_path, folder_id, download_path=None, buffer_size=16,
+                       service_factory=None):
+    """
+    Fonte de currículos a partir do Google Drive: cada arquivo é entregue ao
+    pipeline, já em memória, assim que o seu download termina. A fila limitada
+    segura os downloads quando a análise fica para trás. Ao final, os PDFs que
+    já estavam no disco também são entregues (os já analisados são pulados
+    pelos fingerprints). `service_factory` substitui a autenticação com
+    token/credenciais (ex.: o FakeDrive nos testes).
+    """
+    from drive.download_cv import download_files
+
+    download_path = download_path or CV_DIR
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=buffer_size)
+
+    stopped = threading.Event()
+
+    def put(item):
+        # Chamado nas threads de download; bloqueia enquanto a fila estiver cheia
+        future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+        while not stopped.is_set():
+            try:
+                return future.result(timeout=1)
+            except concurrent.futures.TimeoutError:
+                continue
+        future.cancel()
+
+    def run_download():
+        try:
+            return download_files(
+                token_path, credentials_path, folder_id, download_path,
+                database=get_database(), on_file=lambda file_path, data: put((file_path, data)),
+                service_factory=service_factory,
+            )
+        finally:
+            put(None)
+
+    download_task = loop.run_in_executor(None, run_download)
+    streamed = set()
+    try:
+        while (item := await queue.get()) is not None:
+            streamed.add(item[0])
+            yield item
+        await download_task
+    finally:
+        # Se o pipeline parar antes do fim, liberar as threads de download
+        stopped.set()
+    for path in get_pdf_paths(download_path):
+        if path not in streamed:
+            yield path, None
+
+
+async def main_async(job, concurrency=concurrency, preprocess_workers=PREPROCESS_WORKERS,
+                     source=None, preprocess_chunk_size=PREPROCESS_CHUNK_SIZE, on_result=None,
+                     prescreen_top_k=PRESCREEN_TOP_K, prescreen_threshold=PRESCREEN_THRESHOLD):
+    """
+    Pipeline assíncrono: um produtor lê e formata os PDFs em um pool de processos
+    enquanto `concurrency` consumidores fazem as chamadas ao LLM, de modo que a
+    etapa de CPU dos próximos currículos acontece em paralelo com a rede.
+    `source` é um iterável assíncrono de (path, bytes ou None); por padrão, os
+    PDFs da pasta drive/curriculos. `on_result` é chamado com o resultado de
+    cada currículo (inclusive os pulados), para acompanhar o progresso.
+
+    Com `prescreen_top_k` ou `prescreen_threshold`, todos os currículos são
+    lidos primeiro e só os melhores da triagem local (ver prescreen.py) vão
+    para o LLM; os demais retornam com status "filtered".
+    """
+    database = get_database()
+    if source is None:
+        cv_paths = get_pdf_paths(CV_DIR)
+        if not cv_paths:
+          logging.warning("Nenhum currículo encontrado no diretório 'drive/curriculos'.")
+          return [] # retornar lista vazia
+        source = folder_source(cv_paths)
+
+    concurrency = max(1, concurrency)
+    queue = asyncio.Queue(maxsize=concurrency * 2)
     results = []
-    for i in range(0, len(cv_paths), batch_size):
-        batch = cv_paths[i:i + batch_size]
-        batch_results = []
-        for path in batch:
-            batch_results.append(process_cv(path, job))
-            time.sleep(1) # espera 1 segundo entre os processamentos
-        results.extend(batch_results)
+    # Conjunto em memória de (sha256, job_id, prompt_version) carregado uma vez
+    fingerprints = await asyncio.to_thread(load_fingerprints)
+
+    def add_result(result):
+        results.append(result)
+        metrics.inc("cvs_total", status=result.get("status"))
+        if on_result is not None:
+            on_result(result)
+
+    async def pending_cvs(target):
+        async for path, data in source:
+            sha256 = await asyncio.to_thread(file_sha256, path, data=data)
+            fingerprint = (sha256, job.get("id"), prompt_version)
+            if fingerprint in fingerprints:
+                logging.info(f"Currículo {path} já foi processado. Pulando.")
+                add_result({"status": "skipped", "path": path})
+                continue
+            # Marcar já na fila evita processar duas vezes cópias do mesmo PDF
+            fingerprints.add(fingerprint)
+            artifact = await asyncio.to_thread(database.get_cv_artifact, sha256)
+            if artifact is not None:
+                # PDF já lido e formatado para outra vaga: pula a leitura e o spaCy
+                metrics.inc("cv_artifact_hits_total", kind="text")
+                await target.put((path, artifact["text"], artifact["formatted_text"], sha256))
+                continue
+            yield path, sha256, data
+
+    def preprocess_failed(path, sha256, error):
+        # Lote perdido no pool: o currículo recebe um resultado e pode ser tentado de novo nesta execução
+        fingerprints.discard((sha256, job.get("id"), prompt_version))
+        add_result({"status": "failed", "path": path, "error": f"Erro ao ler o currículo: {error}"})
+
+    async def producer():
+        try:
+            # Leitura dos PDFs e spaCy rodam no pool de processos, à frente das chamadas ao LLM
+            preprocessor = Preprocessor(workers=preprocess_workers, chunk_size=preprocess_chunk_size)
+            if prescreen_top_k > 0 or prescreen_threshold > 0:
+                # O ranking precisa do lote inteiro: a fila intermediária não tem limite
+                screening = asyncio.Queue()
+                await preprocessor.feed(pending_cvs(screening), screening, preprocess_failed)
+                items = [screening.get_nowait() for _ in range(screening.qsize())]
+                approved, filtered = await asyncio.to_thread(
+                    prescreen, job, items, prescreen_top_k, prescreen_threshold
+                )
+                for (path, *_), score in filtered:
+                    # Sem fingerprint: uma nova rodada com outro corte reavalia o currículo
+                    add_result({"status": "filtered", "path": path, "prescreen_score": round(score, 4)})
+                for item in approved:
+                    await queue.put(item)
+            else:
+                await preprocessor.feed(pending_cvs(queue), queue, preprocess_failed)
+        finally:
+            # Sinalizar o fim da fila para cada consumidor
+            for _ in range(concurrency):
+                await queue.put(None)
+
+    async def worker():
+        while (item := await queue.get()) is not None:
+            path, content, formatted_content, sha256 = item
+            started = time.perf_counter()
+            with track_cv_cost() as cost:
+                result = await analyze_cv_async(path, job, content, formatted_content, unit_of_work, sha256)
+            # Tempo das chamadas ao LLM do currículo (a leitura do PDF roda antes, no pool)
+            result["elapsed"] = round(time.perf_counter() - started, 3)
+            metrics.observe("stage_seconds", result["elapsed"], stage="llm_cv")
+            # Custo estimado das chamadas do currículo, em dólares (zero quando vieram do cache)
+            result["cost"] = round(cost[0], 6)
+            add_result(result)
+
+    async def flusher():
+        # Gravar o lote pendente periodicamente, mesmo que nenhum currículo novo termine
+        while True:
+            await asyncio.sleep(flush_interval)
+            if unit_of_work.is_due():
+                await asyncio.to_thread(unit_of_work.flush)
+
+    ai = get_ai(STRUCTURED_MODEL) if analysis_mode == "combined" else get_ai()
+    usage_before = ai.usage_summary()
+    with database.unit_of_work(flush_size=flush_size, flush_interval=flush_interval) as unit_of_work:
+        flush_task = asyncio.create_task(flusher())
+        try:
+            await asyncio.gather(producer(), *(worker() for _ in range(concurrency)))
+        finally:
+            flush_task.cancel()
     logging.info("Processamento de currículos concluído.")
+    log_token_usage(ai, usage_before)
+    return results
+
+
+def main(job_name=DEFAULT_JOB_NAME, concurrency=concurrency, preprocess_workers=PREPROCESS_WORKERS):
+    # Obter job pelo nome
+    job = get_database().get_job_by_name(job_name)
+    if not job:
+        logging.error(f"Job '{job_name}' não encontrado.")
+        return []
+    return asyncio.run(main_async(job, concurrency=concurrency, preprocess_workers=preprocess_workers))
+
+
+async def stream_async(job, token_path, credentials_path, folder_id, download_path=None,
+                       concurrency=concurrency, preprocess_workers=PREPROCESS_WORKERS, on_result=None,
+                       service_factory=None):
+    """Baixa do Drive e analisa ao mesmo tempo: cada PDF entra no pipeline ao terminar o download."""
+    source = drive_source(token_path, credentials_path, folder_id, download_path, service_factory=service_factory)
+    # Lotes de um currículo e sem triagem (que esperaria todos os downloads): a primeira
+    # nota não espera outros downloads terminarem
+    return await main_async(
+        job, concurrency=concurrency, preprocess_workers=preprocess_workers, source=source,
+        preprocess_chunk_size=1, on_result=on_result, prescreen_top_k=0, prescreen_threshold=0,
+    )
+
+
+def main_streaming(token_path, credentials_path, folder_id, job_name=DEFAULT_JOB_NAME,
+                   concurrency=concurrency, preprocess_workers=PREPROCESS_WORKERS, download_path=None, on_result=None):
+    """Versão síncrona de stream_async para uma vaga buscada pelo nome."""
+    job = get_database().get_job_by_name(job_name)
+    if not job:
+        logging.error(f"Job '{job_name}' não encontrado.")
+        return []
+    return asyncio.run(stream_async(
+        job, token_path, credentials_path, folder_id, download_path,
+        concurrency=concurrency, preprocess_workers=preprocess_workers, on_result=on_result,
+    ))
+
+
+# Modo Batch API: todas as requisições vão em um arquivo JSONL, processado pela
+# OpenAI em até 24h com desconto e sem consumir a cota de requisições por minuto.
+
+def batch_ai():
+    return get_ai(STRUCTURED_MODEL) if analysis_mode == "combined" else get_ai()
+
+
+def preprocess_all(cv_items, workers=PREPROCESS_WORKERS, chunk_size=PREPROCESS_CHUNK_SIZE):
+    """Lê e formata os currículos [(path, sha256)] no pool de processos e retorna os itens pré-processados."""
+    chunks = [
+        [(path, sha256, None) for path, sha256 in cv_items[start:start + chunk_size]]
+        for start in range(0, len(cv_items), chunk_size)
+    ]
+    if workers > 0 and chunks:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            processed = list(executor.map(preprocess_chunk, chunks))
+    else:
+        processed = [preprocess_chunk(chunk) for chunk in chunks]
+    items = []
+    for results, worker_metrics in processed:
+        if worker_metrics:
+            metrics.merge(worker_metrics)
+        items.extend(results)
+    return items
+
+
+def batch_requests(ai, job, items, summarized=frozenset()):
+    """
+    Requisições do lote: três por currículo (ou uma, no modo combinado), identificadas por índice:tipo.
+    Os currículos em `summarized` (sha256) já têm resumo em cache e não pedem outro.
+    """
+    requests = []
+    for index, (path, content, formatted_content, sha256) in enumerate(items):
+        if analysis_mode == "combined":
+            requests.append(ai.batch_request(
+                f"{index}:evaluation", ai.evaluate_cv_prompt(formatted_content, job), ai.evaluation_response_format()
+            ))
+        else:
+            if sha256 not in summarized:
+                requests.append(ai.batch_request(f"{index}:resum", ai.resume_cv_prompt(formatted_content)))
+            requests += [
+                ai.batch_request(f"{index}:opnion", ai.generate_opnion_prompt(formatted_content, job)),
+                ai.batch_request(f"{index}:score", ai.generate_score_prompt(formatted_content, job)),
+            ]
+    return requests
+
+
+def batch_state_path(batch_id, batch_dir=BATCH_DIR):
+    return os.path.join(batch_dir, f"{batch_id}.json")
+
+
+def load_batch_state(batch_id, batch_dir=BATCH_DIR):
+    with open(batch_state_path(batch_id, batch_dir), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_batch_state(state, batch_dir=BATCH_DIR):
+    with open(batch_state_path(state["batch_id"], batch_dir), "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+
+
+def pending_batches(batch_dir=BATCH_DIR):
+    """Estados dos lotes enviados que ainda não foram ingeridos (sem `ingested_at`)."""
+    if not os.path.isdir(batch_dir):
+        return []
+    states = []
+    for name in sorted(os.listdir(batch_dir)):
+        if name.endswith(".json"):
+            state = load_batch_state(name[:-len(".json")], batch_dir)
+            if not state.get("ingested_at"):
+                states.append(state)
+    return states
+
+
+def submit_batch(job, cv_paths, preprocess_workers=PREPROCESS_WORKERS, batch_dir=BATCH_DIR, on_result=None,
+                 prescreen_top_k=PRESCREEN_TOP_K, prescreen_threshold=PRESCREEN_THRESHOLD):
+    """
+    Envia os currículos ainda não processados para a vaga como lotes da Batch
+    API e retorna os IDs dos lotes. O estado de cada lote (currículos e vaga) é
+    salvo em `batch_dir`, para que a ingestão possa ser feita em outra execução.
+    Currículos que já estão em um lote ainda não ingerido e cópias do mesmo PDF
+    são pulados, para não pagar duas vezes pela mesma análise.
+    Com `prescreen_top_k` ou `prescreen_threshold`, só os aprovados na triagem
+    local entram no lote, como no main_async.
+    """
+    def report(result):
+        metrics.inc("cvs_total", status=result["status"])
+        if on_result is not None:
+            on_result(result)
+
+    fingerprints = load_fingerprints()
+    # (sha256, job_id, prompt_version) dos currículos em lotes enviados e ainda não ingeridos
+    in_flight = {
+        (item["sha256"], state["job_id"], state["prompt_version"])
+        for state in pending_batches(batch_dir) for item in state["items"]
+    }
+    pending = []
+    for path in cv_paths:
+        sha256 = file_sha256(path)
+        fingerprint = (sha256, job.get("id"), prompt_version)
+        if fingerprint in fingerprints:
+            logging.info(f"Currículo {path} já foi processado. Pulando.")
+            report({"status": "skipped", "path": path})
+            continue
+        if fingerprint in in_flight:
+            logging.info(f"Currículo {path} já está em um lote aguardando ingestão (ou é cópia de outro). Pulando.")
+            report({"status": "skipped", "path": path})
+            continue
+        # Cópias do mesmo PDF nesta chamada entram uma única vez
+        in_flight.add(fingerprint)
+        pending.append((path, sha256))
+    if not pending:
+        logging.info("Nenhum currículo pendente para enviar em lote.")
+        return []
+
+    ai = batch_ai()
+    database = get_database()
+    # Currículos já lidos para outra vaga vêm do cv_artifacts; só os novos passam pelo pool
+    artifacts = {sha256: database.get_cv_artifact(sha256) for _, sha256 in pending}
+    items = [
+        (path, artifacts[sha256]["text"], artifacts[sha256]["formatted_text"], sha256)
+        for path, sha256 in pending if artifacts[sha256] is not None
+    ]
+    metrics.inc("cv_artifact_hits_total", len(items), kind="text")
+    new_items = preprocess_all([item for item in pending if artifacts[item[1]] is None], preprocess_workers)
+    if new_items:
+        # Gravar já o texto dos novos: a ingestão, talvez em outra execução, não precisa ler o PDF de novo
+        database.cv_artifacts.insert_multiple([
+            new_artifact(sha256, content, formatted_content, None).model_dump()
+            for _, content, formatted_content, sha256 in new_items
+        ])
+    items += new_items
+    if prescreen_top_k > 0 or prescreen_threshold > 0:
+        items, filtered = prescreen(job, items, prescreen_top_k, prescreen_threshold)
+        for (path, *_), score in filtered:
+            # Como no main_async: sem fingerprint, um corte diferente reavalia o currículo
+            report({"status": "filtered", "path": path, "prescreen_score": round(score, 4)})
+    summarized = {sha256 for sha256, artifact in artifacts.items() if cached_summary(artifact, ai)}
+    metrics.inc("cv_artifact_hits_total", len(summarized), kind="summary")
+    os.makedirs(batch_dir, exist_ok=True)
+    per_cv = 1 if analysis_mode == "combined" else 3
+    step = BATCH_MAX_REQUESTS // per_cv
+    batch_ids = []
+    for start in range(0, len(items), step):
+        chunk = items[start:start + step]
+        file_path = os.path.join(batch_dir, f"{job.get('id')}-{int(time.time())}-{start}.jsonl")
+        batch_id = ai.submit_batch(
+            batch_requests(ai, job, chunk, summarized), file_path, metadata={"job_id": job.get("id")}
+        )
+        state = {
+            "batch_id": batch_id,
+            "job_id": job.get("id"),
+            "model_id": ai.model_id,
+            "analysis_mode": analysis_mode,
+            "prompt_version": prompt_version,
+            "items": [{"path": str(path), "sha256": sha256} for path, _, _, sha256 in chunk],
+        }
+        save_batch_state(state, batch_dir)
+        batch_ids.append(batch_id)
+    return batch_ids
+
+
+def ingest_cv(ai, job, path, sha256, responses, index, unit_of_work):
+    """Interpreta as respostas do lote para um currículo e grava a análise."""
+    try:
+        existing = get_database().get_cv_artifact(sha256)
+        content = existing["text"] if existing else read_uploaded_file(path)
+        if analysis_mode == "combined":
+            evaluation = ai.extract_evaluation_from_result(responses.get(f"{index}:evaluation"))
+            if evaluation is None:
+                return {"status": "failed", "path": path, "error": "Erro ao gerar avaliação."}
+            return save_analysis(
+                path, job, content, evaluation.to_markdown(), evaluation.opnion,
+                evaluation.scores.final_score(), unit_of_work, sha256, evaluation,
+            )
+        generated_summary = None
+        if f"{index}:resum" in responses:
+            resum = generated_summary = ai.extract_resume_from_result(responses[f"{index}:resum"])
+        else:
+            # Resumo em cache no envio do lote (ver batch_requests)
+            resum = cached_summary(existing, ai)
+        opnion = responses.get(f"{index}:opnion")
+        score = ai.extract_score_from_result(responses.get(f"{index}:score"))
+        if resum is None:
+            return {"status": "failed", "path": path, "error": "Erro ao gerar resumo."}
+        if opnion is None:
+            return {"status": "failed", "path": path, "error": "Erro ao gerar opiniao."}
+        if score is None:
+            # Sem novas tentativas no lote: o currículo fica sem fingerprint e volta na próxima análise
+            return {"status": "failed", "path": path, "error": "Erro ao gerar score."}
+        artifact = None
+        if existing is not None and generated_summary is not None:
+            artifact = new_artifact(sha256, content, existing["formatted_text"], existing, generated_summary, ai)
+        return save_analysis(path, job, content, resum, opnion, score, unit_of_work, sha256, artifact=artifact)
+    except Exception as e:
+        logging.error(f"Erro inesperado ao ingerir {path}: {e}")
+        return {"status": "failed", "path": path, "error": str(e)}
+
+
+def ingest_batch(batch_id, batch_dir=BATCH_DIR, poll_interval=BATCH_POLL_INTERVAL, timeout=None, on_result=None):
+    """
+    Aguarda o lote terminar e grava todas as respostas no banco em transações em
+    lote. O estado salvo recebe `ingested_at`: os currículos que falharam deixam
+    de contar como em andamento e podem ir em um novo lote.
+    """
+    state = load_batch_state(batch_id, batch_dir)
+    if state["prompt_version"] != prompt_version:
+        raise ValueError(
+            f"Lote {batch_id} foi gerado com os prompts '{state['prompt_version']}', "
+            f"mas a versão atual é '{prompt_version}' (verifique ANALISE_MODE)."
+        )
+    database = get_database()
+    job = database.get_job_by_id(state["job_id"])
+    ai = get_ai(state["model_id"])
+    batch = ai.wait_batch(batch_id, poll_interval=poll_interval, timeout=timeout)
+    if batch.status != "completed":
+        logging.error(f"Lote {batch_id} terminou com status '{batch.status}'; ingerindo as respostas disponíveis.")
+    responses = ai.batch_results(batch)
+
+    results = []
+    with database.unit_of_work(flush_size=flush_size, flush_interval=flush_interval) as unit_of_work:
+        for index, item in enumerate(state["items"]):
+            result = ingest_cv(ai, job, item["path"], item["sha256"], responses, index, unit_of_work)
+            results.append(result)
+            metrics.inc("cvs_total", status=result["status"])
+            if on_result is not None:
+                on_result(result)
+    state["ingested_at"] = time.time()
+    save_batch_state(state, batch_dir)
+    succeeded = sum(1 for result in results if result["status"] == "success")
+    logging.info(f"Lote {batch_id} ingerido: {succeeded} de {len(results)} currículos gravados.")
+    return results
+
+
+def main_batch(job_name=DEFAULT_JOB_NAME, preprocess_workers=PREPROCESS_WORKERS,
+               poll_interval=BATCH_POLL_INTERVAL, cv_paths=None, on_result=None,
+               prescreen_top_k=PRESCREEN_TOP_K, prescreen_threshold=PRESCREEN_THRESHOLD):
+    """Análise completa pela Batch API: envia os lotes, aguarda e grava os resultados."""
+    job = get_database().get_job_by_name(job_name) or get_database().get_job_by_id(job_name)
+    if not job:
+        logging.error(f"Job '{job_name}' não encontrado.")
+        return []
+    cv_paths = get_pdf_paths(CV_DIR) if cv_paths is None else cv_paths
+    results = []
+
+    def collect(result):
+        results.append(result)
+        if on_result is not None:
+            on_result(result)
+
+    batch_ids = submit_batch(
+        job, cv_paths, preprocess_workers, on_result=collect,
+        prescreen_top_k=prescreen_top_k, prescreen_threshold=prescreen_threshold,
+    )
+    for batch_id in batch_ids:
+        ingest_batch(batch_id, poll_interval=poll_interval, on_result=collect)
     return results
 
 if __name__ == "__main__":
@@ -3,16 +3,45 @@ import json
 import time
 import streamlit as st
 import pandas as pd
-from database import AnalyzeDatabase
-from drive.download_cv import download_files
-from analise import main as analise_main
+import resources
+from metrics import registry as metrics
+
+# st.cache_resource só existe a partir do Streamlit 1.18; antes o equivalente era experimental_singleton
+cache_resource = getattr(st, "cache_resource", None) or st.experimental_singleton
+cache_data = getattr(st, "cache_data", None) or st.experimental_memo
+
+# Paginação do ranking: só a página atual é lida do banco e enviada ao navegador
+PAGE_SIZES = [25, 50, 100, 250]
+CHART_TOP_N = int(os.getenv("CHART_TOP_N", 30))
+# Intervalo (segundos) entre as atualizações do progresso das análises
+RUNNER_POLL_INTERVAL = float(os.getenv("RUNNER_POLL_INTERVAL", 1))
+# st.rerun substituiu st.experimental_rerun no Streamlit 1.27
+rerun = getattr(st, "rerun", None) or st.experimental_rerun
+
+COLUMN_LABELS = {
+    "name": "Nome",
+    "education": "Educação",
+    "skills": "Habilidades",
+    "languages": "Idiomas",
+    "score": "Score",
+    "resum_id": "Resum ID",
+    "id": "ID",
+}
+
+
+@cache_resource
+def get_database():
+    """Base de dados compartilhada entre as sessões, criada no primeiro uso."""
+    return resources.get_database()
 
-# Inicializa a base de dados
-database = AnalyzeDatabase()
 
 # Configura a página do Streamlit com layout largo e título "Recrutador"
+# (precisa ser o primeiro comando do Streamlit, antes do spinner do cache_resource)
 st.set_page_config(layout="wide", page_title="Recrutador", page_icon=":brain:")
 
+# Inicializa a base de dados
+database = get_database()
+
 # Carregar configurações sensíveis de variáveis de ambiente ou arquivos locais
 def load_config():
     """Carrega configurações sensíveis de variáveis de ambiente ou arquivos."""
@@ -46,28 +75,31 @@ def load_config():
 CONFIG = load_config()
 
 
-def load_data(option):
-    """Carrega os dados da base de dados e retorna o DataFrame."""
+@cache_data(max_entries=256)
+def load_page(job_id, offset, limit, version):
+    """
+    Lê uma página do ranking da vaga, já ordenada por score no banco.
+    `version` só entra na chave do cache: qualquer escrita no banco gera uma
+    nova versão e as páginas antigas deixam de ser usadas.
+    """
+    df = pd.DataFrame(
+        database.get_analysis_page(job_id, offset=offset, limit=limit),
+        columns=list(COLUMN_LABELS),
+    )
+    return df.rename(columns=COLUMN_LABELS)
+
+
+@cache_data(max_entries=64)
+def count_candidates(job_id, version):
+    """Total de candidatos analisados da vaga (cacheado pela versão do banco)."""
+    return database.count_analysis_by_job_id(job_id)
+
+
+def load_data(option, page=1, page_size=PAGE_SIZES[0]):
+    """Carrega uma página de candidatos da vaga e retorna o DataFrame."""
     if option:
         job = database.get_job_by_name(option)
-        data = database.get_analysis_by_job_id(job.get("id"))
-        df = pd.DataFrame(
-            data if data else {},
-            columns=["name", "education", "skills", "languages", "score", "resum_id", "id"],
-        )
-        df.rename(
-            columns={
-                "name": "Nome",
-                "education": "Educação",
-                "skills": "Habilidades",
-                "languages": "Idiomas",
-                "score": "Score",
-                "resum_id": "Resum ID",
-                "id": "ID",
-            },
-            inplace=True,
-        )
-        return df
+        return load_page(job.get("id"), (page - 1) * page_size, page_size, database.get_version())
     return pd.DataFrame()
 
 
@@ -94,6 +126,16 @@ def delete_files_resum(resums):
             os.remove(path)
 
 
+def drive_settings():
+    """Pasta do Drive sincronizada pelas ações "Atualizar Arquivos" e "Atualizar e Analisar"."""
+    return {
+        "token_path": CONFIG.get("token"),
+        "credentials_path": "credentials.json",
+        "folder_id": "folder_id",
+        "download_path": "curriculos",
+    }
+
+
 def run_download(progress_bar, status_text):
     """Executa o download dos arquivos e atualiza o progresso."""
     try:
@@ -102,7 +144,10 @@ def run_download(progress_bar, status_text):
             status_text.text(f"Progresso do download: {progress}%")
             time.sleep(0.5)
 
-        downloaded_files = download_files(CONFIG["token"], "credentials.json", "folder_id", "curriculos")
+        # Import sob demanda: as bibliotecas do Google só são carregadas ao sincronizar
+        from drive.download_cv import download_files
+
+        downloaded_files = download_files(**drive_settings(), database=database)
         progress_bar.progress(100)
         status_text.text("Progresso do download: 100% - Concluído")
 
@@ -114,24 +159,75 @@ def run_download(progress_bar, status_text):
         st.error(f"Erro ao atualizar arquivos: {str(e)}")
 
 
-def run_analysis(progress_bar, status_text):
-    """Executa a análise dos currículos e atualiza o progresso."""
-    try:
-        for progress in range(0, 101, 20):
-            progress_bar.progress(progress)
-            status_text.text(f"Progresso da análise: {progress}%")
-            time.sleep(0.5)
-
-        results = analise_main()
-        progress_bar.progress(100)
-        status_text.text("Progresso da análise: 100% - Concluído")
-
-        if any(result and result.get("status") == "success" for result in results):
-            st.success("Análise concluída com sucesso! Escolha a vaga no menu suspenso ao lado.")
+@cache_resource
+def get_runner():
+    """Runner de análises em segundo plano, compartilhado entre as sessões."""
+    return resources.get_runner()
+
+
+def run_analysis(job_name, drive=None):
+    """Agenda a análise da vaga em segundo plano e guarda o ID da execução na sessão."""
+    run_id = get_runner().submit(job_name, drive=drive)
+    run_ids = st.session_state.setdefault("run_ids", [])
+    if run_id not in run_ids:
+        run_ids.append(run_id)
+    return run_id
+
+
+def format_seconds(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes}min {seconds:02d}s" if minutes else f"{seconds}s"
+
+
+def display_runs():
+    """Exibe o progresso real das análises da sessão; retorna True se alguma está em andamento."""
+    runner = get_runner()
+    active = False
+    for run_id in st.session_state.get("run_ids", []):
+        run = runner.status(run_id)
+        if not run:
+            continue
+        st.caption(f"Análise: {run['job_name']}")
+        st.progress(run["progress"])
+        if run["status"] in ("queued", "running"):
+            active = True
+            eta = f" · restante: {format_seconds(run['eta'])}" if run["eta"] is not None else ""
+            st.text(
+                f"{run['processed']}/{run['total']} currículos · "
+                f"{run['throughput']:.1f} CVs/min{eta}"
+            )
+            if st.button("Cancelar", key=f"cancel_{run_id}", use_container_width=True):
+                runner.cancel(run_id)
+        elif run["status"] == "done":
+            st.success(
+                f"Concluída: {run['succeeded']} analisados, {run['skipped']} já processados, "
+                f"{run['filtered']} descartados na triagem, "
+                f"{run['failed']} com falha ({format_seconds(run['elapsed'])})."
+            )
+        elif run["status"] == "cancelled":
+            st.warning(f"Cancelada após {run['processed']} currículos.")
         else:
-            st.warning("Nenhuma análise foi realizada ou houve falhas.")
-    except Exception as e:
-        st.error(f"Erro ao realizar análise: {str(e)}")
+            st.error(f"Erro ao realizar análise: {run['error']}")
+    return active
+
+
+def display_metrics():
+    """Resumo das métricas do pipeline neste processo: latência por etapa, tokens e custo."""
+    summary = metrics.summary()
+    if not summary["stages"]:
+        return
+    with st.expander("Métricas do pipeline"):
+        st.text(
+            f"{summary['cvs']} currículos analisados · "
+            f"custo estimado US$ {summary['cost_usd']:.4f} "
+            f"(US$ {summary['cost_per_cv_usd']:.5f} por currículo)"
+        )
+        st.text(
+            f"Tokens: {summary['prompt_tokens']} de prompt "
+            f"({summary['cached_tokens']} em cache), {summary['completion_tokens']} de resposta · "
+            f"{summary['retries']} novas tentativas"
+        )
+        st.dataframe(pd.DataFrame(summary["stages"]), use_container_width=True)
 
 
 def create_sidebar_actions():
@@ -145,14 +241,22 @@ def create_sidebar_actions():
             run_download(progress_bar, status_text)
 
         if st.button("Nova Análise", use_container_width=True):
-            progress_bar = st.progress(0)
-            status_text = st.empty()
-            run_analysis(progress_bar, status_text)
+            # Import sob demanda: o módulo de análise carrega PyMuPDF e OpenAI
+            from analise import DEFAULT_JOB_NAME
+            run_analysis(option or DEFAULT_JOB_NAME)
+
+        if option and st.button("Atualizar e Analisar", use_container_width=True):
+            # Baixa do Drive em segundo plano e analisa cada currículo assim que o download termina
+            run_analysis(option, drive=drive_settings())
 
         if option and st.button("Limpar Análise", use_container_width=True):
             database.clear_all_data()
             st.warning("Análises e arquivos foram limpos!")
 
+        active = display_runs()
+        display_metrics()
+        return active
+
 
 # Interface principal
 st.title("Sistema de Análise de Currículos")
@@ -163,12 +267,23 @@ option = st.selectbox(
     index=None,
 )
 
-create_sidebar_actions()
+analysis_running = create_sidebar_actions()
 
 if option:
     with st.container():
-        display_chart(df := load_data(option))
-        st.subheader("Lista de Candidatos")
-        selected_candidates = display_table(df)
+        job = database.get_job_by_name(option)
+        total = count_candidates(job.get("id"), database.get_version())
+        display_chart(load_data(option, page_size=CHART_TOP_N))
+        st.subheader(f"Lista de Candidatos ({total})")
+        page_col, size_col = st.columns([3, 1])
+        page_size = size_col.selectbox("Por página:", PAGE_SIZES)
+        pages = max(1, -(-total // page_size))
+        page = page_col.number_input(f"Página (de {pages}):", min_value=1, max_value=pages, value=1, step=1)
+        selected_candidates = display_table(load_data(option, int(page), page_size))
 else:
     st.info("Selecione uma vaga para visualizar os candidatos.")
+
+# Enquanto houver análise em andamento, atualizar a página periodicamente
+if analysis_running:
+    time.sleep(RUNNER_POLL_INTERVAL)
+    rerun()
@@ -0,0 +1,262 @@
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import resource
+import tempfile
+import statistics
+import subprocess
+from fake_openai import FakeOpenAIServer
+
+# Benchmark offline do pipeline de análise, sem custo de API:
+#
+#   python benchmark.py --sizes 10,1000,10000 --latency 0.8 --rate-limit-rate 0.02 \
+#       --malformed-rate 0.05 --output benchmark.json
+#
+# Gera currículos sintéticos em PDF, sobe a API falsa da OpenAI (fake_openai.py)
+# e roda o main_async de ponta a ponta contra ela. Cada tamanho roda em um
+# processo próprio, com banco e métricas novos, para que o pico de memória e os
+# tempos de um não contaminem o outro. Relata CVs/min, latência por currículo
+# (p50/p95), tempo de gravação no banco e pico de RSS.
+
+BENCHMARK_SIZES = (10, 1000, 10000)
+BENCHMARK_JOB = {
+    "id": "benchmark",
+    "name": "Vaga de Benchmark",
+    "main_activities": "Elaboração de pareceres, acompanhamento do processo legislativo e atendimento ao público.",
+    "prerequisites": "Graduação em Direito ou Administração Pública. Experiência com redação oficial.",
+    "differentials": "Inglês avançado, pós-graduação e conhecimento de Excel.",
+}
+
+FIRST_NAMES = ["Ana", "Bruno", "Carla", "Diego", "Eduarda", "Felipe", "Gabriela", "Henrique", "Isabela", "João",
+               "Larissa", "Marcos", "Natália", "Otávio", "Paula", "Rafael", "Sofia", "Thiago", "Vanessa", "William"]
+LAST_NAMES = ["Silva", "Souza", "Oliveira", "Santos", "Pereira", "Costa", "Rodrigues", "Almeida", "Nascimento",
+              "Lima", "Araújo", "Fernandes", "Carvalho", "Gomes", "Martins", "Rocha", "Ribeiro", "Barbosa"]
+CITIES = ["São Paulo", "Rio de Janeiro", "Belo Horizonte", "Brasília", "Salvador", "Curitiba", "Recife", "Porto Alegre"]
+ROLES = ["Assessor Parlamentar", "Analista Administrativo", "Advogado", "Assistente Jurídico", "Gestor Público",
+         "Secretário Executivo", "Analista de Políticas Públicas", "Coordenador de Gabinete", "Estagiário de Direito"]
+EMPLOYERS = ["Câmara Municipal", "Assembleia Legislativa", "Prefeitura", "Escritório de Advocacia",
+             "Secretaria de Planejamento", "Tribunal de Contas", "Consultoria Pública", "Ministério Público"]
+ACTIVITIES = [
+    "elaboração de pareceres técnicos", "acompanhamento de projetos de lei", "redação de ofícios e relatórios",
+    "atendimento ao cidadão", "organização da agenda do gabinete", "análise de contratos administrativos",
+    "apoio às comissões temáticas", "gestão de equipes", "controle orçamentário", "pesquisa legislativa",
+]
+SKILLS = ["Redação oficial", "Processo legislativo", "Direito constitucional", "Excel", "Power BI", "Negociação",
+          "Oratória", "Gestão de projetos", "Licitações", "Comunicação", "Análise de dados", "Word"]
+COURSES = ["Direito", "Administração Pública", "Ciência Política", "Gestão Pública", "Relações Internacionais",
+           "Economia", "Jornalismo"]
+SCHOOLS = ["Universidade de São Paulo", "Universidade Federal de Minas Gerais", "Universidade de Brasília",
+           "Pontifícia Universidade Católica", "Universidade Federal do Rio de Janeiro"]
+LANGUAGES = ["Inglês avançado", "Inglês intermediário", "Espanhol intermediário", "Espanhol básico", "Francês básico"]
+
+
+def synthetic_cv(rng):
+    """Texto de um currículo fictício em português, com seções e tamanho variáveis."""
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {rng.choice(LAST_NAMES)}"
+    lines = [
+        name,
+        f"{rng.choice(CITIES)} · {name.split()[0].lower()}@exemplo.com.br · (11) 9{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}",
+        "",
+        "EXPERIÊNCIA PROFISSIONAL",
+    ]
+    year = 2024
+    for _ in range(rng.randint(1, 5)):
+        start = year - rng.randint(1, 4)
+        lines.append(f"{rng.choice(ROLES)} — {rng.choice(EMPLOYERS)} ({start}–{year})")
+        for activity in rng.sample(ACTIVITIES, rng.randint(2, 4)):
+            lines.append(f"  • Responsável por {activity}.")
+        year = start
+    lines += ["", "FORMAÇÃO ACADÊMICA"]
+    for _ in range(rng.randint(1, 2)):
+        lines.append(f"Graduação em {rng.choice(COURSES)} — {rng.choice(SCHOOLS)} ({rng.randint(1995, 2022)})")
+    lines += ["", "HABILIDADES", ", ".join(rng.sample(SKILLS, rng.randint(3, 7)))]
+    lines += ["", "IDIOMAS", ", ".join(rng.sample(LANGUAGES, rng.randint(1, 3)))]
+    return "\n".join(lines)
+
+
+def generate_corpus(folder, count, seed=42):
+    """Gera `count` currículos sintéticos em PDF na pasta; reaproveita os que já existem."""
+    import fitz
+
+    os.makedirs(folder, exist_ok=True)
+    rng = random.Random(seed)
+    paths = []
+    for index in range(count):
+        text = synthetic_cv(rng)
+        path = os.path.join(folder, f"cv_{index:06d}.pdf")
+        paths.append(path)
+        if os.path.exists(path):
+            continue
+        document = fitz.open()
+        page = document.new_page()
+        page.insert_textbox(fitz.Rect(50, 50, 545, 800), text, fontsize=10)
+        document.save(path)
+        document.close()
+    return paths
+
+
+def peak_rss_mb():
+    """Pico de memória residente deste processo e dos workers do pool, em MB (ru_maxrss vem em KB no Linux)."""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(own / divisor, 1), round(children / divisor, 1)
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+
+
+def run_benchmark(size, corpus_dir, concurrency, preprocess_workers):
+    """
+    Analisa `size` currículos sintéticos com as configurações atuais de
+    ambiente (OPENAI_BASE_URL apontando para a API falsa, DATABASE_PATH
+    para um banco descartável) e retorna o relatório da rodada.
+    """
+    import asyncio
+    import analise
+    from resources import get_database
+    from metrics import registry as metrics
+
+    # O analise.py configura o log em INFO; uma linha por currículo atrapalharia a leitura
+    logging.getLogger().setLevel(logging.WARNING)
+    database = get_database()
+    if not database.get_job_by_id(BENCHMARK_JOB["id"]):
+        database.jobs.insert(dict(BENCHMARK_JOB))
+    cv_paths = generate_corpus(corpus_dir, size)
+
+    metrics.reset()
+    started = time.perf_counter()
+    results = asyncio.run(analise.main_async(
+        database.get_job_by_id(BENCHMARK_JOB["id"]),
+        concurrency=concurrency,
+        preprocess_workers=preprocess_workers,
+        source=analise.folder_source(cv_paths),
+        prescreen_top_k=0,
+        prescreen_threshold=0,
+    ))
+    wall = time.perf_counter() - started
+
+    statuses = {}
+    for result in results:
+        statuses[result["status"]] = statuses.get(result["status"], 0) + 1
+    latencies = sorted(result["elapsed"] for result in results if result.get("elapsed") is not None)
+    flushes = metrics.to_json()["histograms"]
+    db_flush = [h for h in flushes if h["name"] == "stage_seconds" and h["labels"].get("stage") == "db_flush"]
+    summary = metrics.summary()
+    own_rss, workers_rss = peak_rss_mb()
+    return {
+        "size": size,
+        "concurrency": concurrency,
+        "preprocess_workers": preprocess_workers,
+        "statuses": statuses,
+        "wall_seconds": round(wall, 2),
+        "cvs_per_minute": round(statuses.get("success", 0) / wall * 60, 1) if wall > 0 else 0.0,
+        "latency_p50": round(percentile(latencies, 50), 3),
+        "latency_p95": round(percentile(latencies, 95), 3),
+        "db_write_seconds": round(sum(h["sum"] for h in db_flush), 3),
+        "db_flushes": sum(h["count"] for h in db_flush),
+        "llm_retries": summary["retries"],
+        "prompt_tokens": summary["prompt_tokens"],
+        "completion_tokens": summary["completion_tokens"],
+        "estimated_cost_usd": round(summary["cost_usd"], 4),
+        "peak_rss_mb": own_rss,
+        "peak_worker_rss_mb": workers_rss,
+    }
+
+
+def run_isolated(size, args, base_url, workdir):
+    """Roda um tamanho em um processo novo, com banco, cache e métricas próprios."""
+    run_dir = os.path.join(workdir, f"run-{size}-{int(time.time())}")
+    os.makedirs(run_dir)
+    env = dict(
+        os.environ,
+        OPENAI_BASE_URL=base_url,
+        OPENAI_API_KEY="benchmark",
+        DATABASE_PATH=os.path.join(run_dir, "db.sqlite3"),
+        LLM_CACHE_ENABLED="0",
+        # A cota real não se aplica à API falsa: o limitador não deve ser o gargalo medido
+        OPENAI_RPM=os.getenv("BENCHMARK_RPM", "1000000"),
+        OPENAI_TPM=os.getenv("BENCHMARK_TPM", "1000000000"),
+    )
+    command = [
+        sys.executable, os.path.abspath(__file__), "--single", str(size),
+        "--corpus-dir", os.path.join(workdir, "corpus"),
+        "--concurrency", str(args.concurrency),
+        "--preprocess-workers", str(args.preprocess_workers),
+    ]
+    # cwd no diretório da rodada: nenhum db.json ou cache de produção é lido por engano
+    completed = subprocess.run(command, env=env, cwd=run_dir, stdout=subprocess.PIPE, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Benchmark com {size} currículos falhou (código {completed.returncode}).")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def print_report(reports):
+    header = f"{'CVs':>7} {'CVs/min':>9} {'p50 (s)':>8} {'p95 (s)':>8} {'banco (s)':>10} {'RSS (MB)':>9} {'workers (MB)':>13} status"
+    print(header)
+    for report in reports:
+        print(
+            f"{report['size']:>7} {report['cvs_per_minute']:>9} {report['latency_p50']:>8} "
+            f"{report['latency_p95']:>8} {report['db_write_seconds']:>10} {report['peak_rss_mb']:>9} "
+            f"{report['peak_worker_rss_mb']:>13} {report['statuses']}"
+        )
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark offline da análise de currículos.")
+    parser.add_argument(
+        "--sizes", default=",".join(map(str, BENCHMARK_SIZES)),
+        help="Quantidades de currículos, separadas por vírgula (padrão: 10,1000,10000).",
+    )
+    parser.add_argument("--workdir", help="Pasta para os PDFs e bancos gerados (padrão: pasta temporária).")
+    parser.add_argument("--concurrency", type=int, default=8, help="Currículos simultâneos no LLM.")
+    parser.add_argument("--preprocess-workers", type=int, default=os.cpu_count() or 1,
+                        help="Processos para leitura dos PDFs (0 = mesma thread).")
+    parser.add_argument("--latency", type=float, default=0.5, help="Latência média de cada chamada, em segundos.")
+    parser.add_argument("--latency-jitter", type=float, default=0.2, help="Variação (±) da latência, em segundos.")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fração das chamadas que recebem 429.")
+    parser.add_argument("--malformed-rate", type=float, default=0.0,
+                        help="Fração das respostas que não podem ser interpretadas (ex.: sem a nota).")
+    parser.add_argument("--output", help="Grava os relatórios em JSON neste arquivo.")
+    # Uso interno: roda um único tamanho no processo atual e imprime o relatório em JSON
+    parser.add_argument("--single", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--corpus-dir", help=argparse.SUPPRESS)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.single is not None:
+        report = run_benchmark(args.single, args.corpus_dir, args.concurrency, args.preprocess_workers)
+        print(json.dumps(report, ensure_ascii=False))
+        return 0
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="benchmark-cvs-")
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    reports = []
+    with FakeOpenAIServer(
+        latency=args.latency, latency_jitter=args.latency_jitter,
+        rate_limit_rate=args.rate_limit_rate, malformed_rate=args.malformed_rate,
+    ) as server:
+        for size in sizes:
+            print(f"Rodando {size} currículos...", file=sys.stderr)
+            reports.append(run_isolated(size, args, server.base_url, workdir))
+        print(f"Chamadas à API falsa: {server.stats}", file=sys.stderr)
+    print_report(reports)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
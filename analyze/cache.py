@@ -0,0 +1,127 @@
+import os
+import time
+import json
+import hashlib
+import logging
+import sqlite3
+import threading
+
+# Configurações padrão do cache de respostas do LLM
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite3")
+CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", 256 * 1024 * 1024))  # 256 MB
+CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", 30 * 24 * 3600))  # 30 dias
+CACHE_LOW_WATER = float(os.getenv("LLM_CACHE_LOW_WATER", 0.9))  # fração de max_bytes mantida após a limpeza
+
+
+def make_cache_key(model_id, prompt_version, prompt):
+    """Gera a chave do cache a partir do modelo, da versão do prompt e do texto."""
+    if not isinstance(prompt, str):
+        prompt = json.dumps(prompt, ensure_ascii=False, sort_keys=True)
+    payload = "\x1f".join([model_id, str(prompt_version), prompt])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Cache persistente (SQLite) das respostas do LLM, endereçado pelo hash do
+    prompt. As entradas expiram após `ttl` segundos e, quando o tamanho total
+    passa de `max_bytes`, as menos usadas recentemente são removidas (LRU) até
+    sobrar `low_water * max_bytes`, para que a limpeza não rode a cada gravação.
+    """
+
+    def __init__(self, path=CACHE_PATH, max_bytes=CACHE_MAX_BYTES, ttl=CACHE_TTL, low_water=CACHE_LOW_WATER):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.low_water = low_water
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS idx_responses_accessed_at ON responses (accessed_at)"
+        )
+        self.total_bytes = self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+
+    def get(self, key):
+        """Retorna a resposta em cache ou None se não existir ou estiver expirada."""
+        now = time.time()
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT value, size, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, size, created_at = row
+            if self.ttl and now - created_at > self.ttl:
+                self.connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.total_bytes -= size
+                return None
+            self.connection.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            return value
+
+    def set(self, key, value):
+        """Grava uma resposta no cache e aplica a política de tamanho."""
+        if value is None:
+            return
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        with self.lock:
+            previous = self.connection.execute(
+                "SELECT size FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now),
+            )
+            self.total_bytes += size - (previous[0] if previous else 0)
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Remover entradas expiradas e depois as menos acessadas até a marca de baixa
+        if self.ttl:
+            self.connection.execute(
+                "DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl,)
+            )
+        self.total_bytes = self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+        excess = self.total_bytes - int(self.max_bytes * self.low_water)
+        if excess <= 0:
+            return
+        # Soma acumulada a partir da mais antiga: apaga até liberar `excess` bytes
+        evicted = self.connection.execute(
+            """
+            DELETE FROM responses WHERE key IN (
+                SELECT key FROM (
+                    SELECT key, size, SUM(size) OVER (ORDER BY accessed_at, key) AS freed
+                    FROM responses
+                ) WHERE freed - size < ?
+            )
+            """,
+            (excess,),
+        ).rowcount
+        self.total_bytes = self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+        logging.info(f"Cache do LLM: {evicted} entradas removidas por tamanho/TTL.")
+
+    def clear(self):
+        with self.lock:
+            self.connection.execute("DELETE FROM responses")
+            self.total_bytes = 0
@@ -0,0 +1,275 @@
+import os
+import sys
+import json
+import time
+import zlib
+import asyncio
+import logging
+import argparse
+from helper import get_pdf_paths, file_sha256
+from preprocess import PREPROCESS_WORKERS
+from prescreen import PRESCREEN_TOP_K, PRESCREEN_THRESHOLD
+from resources import get_database
+import analise
+from metrics import registry as metrics
+
+# Execução em lote sem interface, para as rodadas noturnas:
+#
+#   python cli.py --job "Vaga de Assessor Legislativo" --job <id> \
+#       --source ./drive/curriculos --shard 0/4 --output resultados.jsonl
+#
+# Cada currículo gera uma linha JSON com a vaga, o status e os tempos. Com
+# --queue fila.sqlite3 os currículos passam pela fila persistente (work_queue.py):
+# uma rodada interrompida retoma de onde parou e as falhas são tentadas de novo.
+# Com --drive-folder <id> a pasta do Drive é sincronizada para --source e cada
+# currículo é analisado assim que o seu download termina. --ingest-batch grava
+# os resultados de lotes da Batch API enviados por uma execução interrompida.
+
+
+def parse_shard(value):
+    """Converte 'i/N' em (i, N), com 0 <= i < N."""
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Shard inválido '{value}': use o formato i/N, ex.: 0/4")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"Shard inválido '{value}': é preciso 0 <= i < N")
+    return index, count
+
+
+def shard_of(path, source, count):
+    """
+    Shard de um currículo. Usa o caminho relativo à pasta de origem (e não o
+    absoluto), para que máquinas com a pasta montada em lugares diferentes
+    dividam os arquivos da mesma forma.
+    """
+    relative = os.path.relpath(path, source).replace(os.sep, "/")
+    return zlib.crc32(relative.encode("utf-8")) % count
+
+
+def select_cvs(source, shard=(0, 1)):
+    """PDFs da pasta que pertencem ao shard, em ordem estável."""
+    index, count = shard
+    return [path for path in sorted(get_pdf_paths(source)) if shard_of(path, source, count) == index]
+
+
+def resolve_jobs(database, identifiers):
+    """Busca cada vaga pelo ID ou, se não houver, pelo nome."""
+    jobs = []
+    for identifier in identifiers:
+        job = database.get_job_by_id(identifier) or database.get_job_by_name(identifier)
+        if not job:
+            raise SystemExit(f"Vaga '{identifier}' não encontrada.")
+        jobs.append(job)
+    return jobs
+
+
+def dry_run(database, job, cv_paths, emit):
+    """Lista o que seria processado para a vaga, sem chamar o LLM nem gravar no banco."""
+    fingerprints = database.load_fingerprints()
+    for path in cv_paths:
+        fingerprint = (file_sha256(path), job.get("id"), analise.prompt_version)
+        emit(job, {"status": "skipped" if fingerprint in fingerprints else "pending", "path": path})
+
+
+def run_job(job, cv_paths, emit, concurrency, preprocess_workers,
+            prescreen_top_k=PRESCREEN_TOP_K, prescreen_threshold=PRESCREEN_THRESHOLD):
+    """Analisa os currículos do shard para uma vaga, emitindo cada resultado assim que termina."""
+    return asyncio.run(analise.main_async(
+        job,
+        concurrency=concurrency,
+        preprocess_workers=preprocess_workers,
+        source=analise.folder_source(cv_paths),
+        on_result=lambda result: emit(job, result),
+        prescreen_top_k=prescreen_top_k,
+        prescreen_threshold=prescreen_threshold,
+    ))
+
+
+def run_streaming(job, emit, folder_id, token_path, credentials_path, download_path, concurrency, preprocess_workers):
+    """Sincroniza a pasta do Drive e analisa cada currículo da vaga assim que o download termina."""
+    return asyncio.run(analise.stream_async(
+        job, token_path, credentials_path, folder_id, download_path,
+        concurrency=concurrency,
+        preprocess_workers=preprocess_workers,
+        on_result=lambda result: emit(job, result),
+    ))
+
+
+def ingest_batches(database, batch_ids, emit, poll_interval):
+    """
+    Aguarda e grava lotes da Batch API enviados em execuções anteriores (sem
+    IDs, todos os lotes de analise.BATCH_DIR ainda não ingeridos).
+    """
+    batch_ids = batch_ids or [state["batch_id"] for state in analise.pending_batches()]
+    logging.info(f"{len(batch_ids)} lotes para ingerir.")
+    for batch_id in batch_ids:
+        job = database.get_job_by_id(analise.load_batch_state(batch_id)["job_id"])
+        analise.ingest_batch(batch_id, poll_interval=poll_interval, on_result=lambda result, job=job: emit(job, result))
+
+
+def run_queue(job, cv_paths, emit, queue_path, concurrency, preprocess_workers):
+    """
+    Enfileira os currículos do shard na fila persistente e a consome neste
+    processo, emitindo o resultado final de cada tarefa. Tarefas da vaga que
+    ficaram de rodadas anteriores também são consumidas, e outros processos
+    podem ajudar com `python work_queue.py --queue <arquivo> work`.
+    """
+    from work_queue import WorkQueue, run_worker
+
+    queue = WorkQueue(queue_path)
+    try:
+        added = queue.enqueue([(path, file_sha256(path)) for path in cv_paths], job.get("id"), analise.prompt_version)
+    finally:
+        queue.close()
+    logging.info(f"{added} tarefas novas na fila {queue_path} para a vaga '{job.get('name')}'.")
+    return asyncio.run(run_worker(
+        job, queue_path, concurrency, on_result=lambda result: emit(job, result), preprocess_workers=preprocess_workers,
+    ))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Análise de currículos em lote.")
+    parser.add_argument(
+        "--job", dest="jobs", action="append",
+        help="Nome ou ID da vaga (pode ser repetido; obrigatório, exceto com --ingest-batch).",
+    )
+    parser.add_argument("--source", default=analise.CV_DIR, help="Pasta com os PDFs dos currículos.")
+    parser.add_argument(
+        "--shard", type=parse_shard, default=(0, 1),
+        help="Parte da pasta a processar, no formato i/N (padrão: 0/1, a pasta inteira).",
+    )
+    parser.add_argument("--concurrency", type=int, default=analise.concurrency, help="Currículos simultâneos no LLM.")
+    parser.add_argument(
+        "--preprocess-workers", type=int, default=PREPROCESS_WORKERS,
+        help="Processos para leitura dos PDFs (0 = mesma thread).",
+    )
+    parser.add_argument(
+        "--top-k", type=int, default=PRESCREEN_TOP_K,
+        help="Triagem local: só os K currículos mais aderentes à vaga vão para o LLM (0 = todos).",
+    )
+    parser.add_argument(
+        "--min-relevance", type=float, default=PRESCREEN_THRESHOLD,
+        help="Triagem local: nota mínima relativa ao melhor currículo, de 0 a 1 (0 = sem corte).",
+    )
+    parser.add_argument(
+        "--batch", action="store_true",
+        help="Envia as requisições pela Batch API (mais barata, concluída em até 24h) e aguarda os resultados.",
+    )
+    parser.add_argument(
+        "--batch-poll-interval", type=float, default=analise.BATCH_POLL_INTERVAL,
+        help="Segundos entre as consultas ao estado do lote.",
+    )
+    parser.add_argument(
+        "--ingest-batch", dest="ingest_batches", nargs="*", metavar="ID",
+        help="Só aguarda e grava lotes já enviados (sem IDs, todos os lotes pendentes em BATCH_DIR).",
+    )
+    parser.add_argument(
+        "--queue", metavar="ARQUIVO",
+        help="Processa pela fila persistente neste arquivo SQLite (ver work_queue.py), com novas tentativas "
+             "e retomada após uma interrupção.",
+    )
+    parser.add_argument(
+        "--drive-folder", metavar="ID",
+        help="Sincroniza esta pasta do Drive para --source e analisa cada currículo assim que o download termina.",
+    )
+    parser.add_argument("--drive-token", default="token.json", help="Token OAuth do Drive.")
+    parser.add_argument("--drive-credentials", default="credentials.json", help="Credenciais OAuth do Drive.")
+    parser.add_argument("--dry-run", action="store_true", help="Só lista os currículos que seriam analisados.")
+    parser.add_argument("--output", default="-", help="Arquivo JSON-lines de saída (padrão: stdout).")
+    parser.add_argument(
+        "--metrics-out",
+        help="Grava as métricas da execução (latência por etapa, tokens e custo): "
+             "texto do Prometheus se terminar em .prom, JSON nos demais casos.",
+    )
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.ingest_batches is not None and args.jobs:
+        parser.error("--ingest-batch não pode ser combinado com --job: a vaga vem do estado salvo de cada lote.")
+    if not args.jobs and args.ingest_batches is None:
+        parser.error("informe ao menos uma vaga com --job.")
+    if args.queue and (args.batch or args.top_k > 0 or args.min_relevance > 0):
+        parser.error("--queue não pode ser combinado com --batch nem com a triagem (--top-k/--min-relevance).")
+    if args.drive_folder and (args.batch or args.queue or args.dry_run or args.shard != (0, 1)
+                              or args.top_k > 0 or args.min_relevance > 0):
+        parser.error("--drive-folder não pode ser combinado com --batch, --queue, --dry-run, --shard nem com a triagem.")
+    database = get_database()
+    jobs = resolve_jobs(database, args.jobs or [])
+    cv_paths = select_cvs(args.source, args.shard)
+    index, count = args.shard
+    logging.info(f"Shard {index}/{count}: {len(cv_paths)} currículos em {args.source}.")
+
+    output = sys.stdout if args.output == "-" else open(args.output, "a", encoding="utf-8")
+    started = time.perf_counter()
+    counts = {}
+    synced = False
+
+    def emit(job, result):
+        counts[result.get("status")] = counts.get(result.get("status"), 0) + 1
+        line = {
+            "job_id": job.get("id"),
+            "job_name": job.get("name"),
+            "shard": f"{index}/{count}",
+            "path": str(result.get("path")),
+            "status": result.get("status"),
+            "score": result.get("score"),
+            "prescreen_score": result.get("prescreen_score"),
+            "error": result.get("error"),
+            "elapsed": result.get("elapsed"),
+            "cost": result.get("cost"),
+            "timestamp": time.time(),
+        }
+        output.write(json.dumps(line, ensure_ascii=False) + "\n")
+        output.flush()
+
+    try:
+        if args.ingest_batches is not None:
+            # Só a ingestão: as vagas vêm do estado salvo de cada lote
+            ingest_batches(database, args.ingest_batches, emit, args.batch_poll_interval)
+        for job in jobs:
+            job_started = time.perf_counter()
+            if args.dry_run:
+                dry_run(database, job, cv_paths, emit)
+            elif args.batch:
+                analise.main_batch(
+                    job.get("id"), args.preprocess_workers, poll_interval=args.batch_poll_interval,
+                    cv_paths=cv_paths, on_result=lambda result, job=job: emit(job, result),
+                    prescreen_top_k=args.top_k, prescreen_threshold=args.min_relevance,
+                )
+            elif args.queue:
+                run_queue(job, cv_paths, emit, args.queue, args.concurrency, args.preprocess_workers)
+            elif args.drive_folder and not synced:
+                # A pasta é sincronizada uma vez, durante a análise da primeira vaga; as demais leem a pasta atualizada
+                run_streaming(
+                    job, emit, args.drive_folder, args.drive_token, args.drive_credentials, args.source,
+                    args.concurrency, args.preprocess_workers,
+                )
+                synced = True
+                cv_paths = select_cvs(args.source)
+            else:
+                run_job(
+                    job, cv_paths, emit, args.concurrency, args.preprocess_workers,
+                    prescreen_top_k=args.top_k, prescreen_threshold=args.min_relevance,
+                )
+            logging.info(f"Vaga '{job.get('name')}' concluída em {time.perf_counter() - job_started:.1f}s.")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    logging.info(f"Resumo: {counts} em {time.perf_counter() - started:.1f}s.")
+    summary = metrics.summary()
+    logging.info(
+        f"Custo estimado: US$ {summary['cost_usd']:.4f} "
+        f"(US$ {summary['cost_per_cv_usd']:.5f} por currículo analisado)."
+    )
+    if args.metrics_out:
+        metrics.write(args.metrics_out)
+        logging.info(f"Métricas gravadas em {args.metrics_out}.")
+    return 0 if not counts.get("failed") else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
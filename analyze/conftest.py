@@ -0,0 +1,74 @@
+import pytest
+
+# Fixtures compartilhadas pelos testes: banco descartável, currículos em PDF gerados
+# na hora e a API falsa da OpenAI (fake_openai.py) com um OpenAIClient apontado para ela
+
+
+def lowercase(texts):
+    # Normalizador do índice sem spaCy: basta para os termos dos testes
+    return [text.lower() for text in texts]
+
+
+@pytest.fixture
+def database(tmp_path):
+    from database import AnalyzeDatabase
+    database = AnalyzeDatabase(
+        str(tmp_path / "db.sqlite3"), legacy_json_path=str(tmp_path / "db.json"), normalizer=lowercase
+    )
+    yield database
+    database.connection.close()
+
+
+@pytest.fixture
+def make_pdf(tmp_path):
+    fitz = pytest.importorskip("fitz")
+
+    def make_pdf(name, text):
+        path = tmp_path / name
+        document = fitz.open()
+        document.new_page().insert_textbox(fitz.Rect(50, 50, 545, 800), text, fontsize=10)
+        document.save(str(path))
+        document.close()
+        return str(path)
+
+    return make_pdf
+
+
+@pytest.fixture
+def server(monkeypatch):
+    from fake_openai import FakeOpenAIServer
+
+    class ScriptedServer(FakeOpenAIServer):
+        # Falhas em ordem fixa: cada chamada de chat consome um item de `script` ("429", "malformed" ou "ok")
+        script = []
+
+        def respond_chat(self, body):
+            with self.lock:
+                outcome = self.script.pop(0) if self.script else "ok"
+            self.rate_limit_rate = 1.0 if outcome == "429" else 0.0
+            self.malformed_rate = 1.0 if outcome == "malformed" else 0.0
+            return super().respond_chat(body)
+
+    with ScriptedServer(retry_after=0.01) as server:
+        server.script = []
+        monkeypatch.setenv("OPENAI_BASE_URL", server.base_url)
+        monkeypatch.setenv("OPENAI_API_KEY", "teste")
+        yield server
+
+
+@pytest.fixture
+def client(server, tmp_path):
+    pytest.importorskip("openai")
+    from ai import OpenAIClient
+    from cache import ResponseCache
+    from rate_limiter import RateLimiter
+    from retry import RetryPolicy, CircuitBreaker
+
+    # Limitador, circuito e cache próprios: nada compartilhado com outros testes
+    return OpenAIClient(
+        model_id="gpt-teste",
+        rate_limiter=RateLimiter(rpm=100000, tpm=10000000),
+        retry_policy=RetryPolicy(max_attempts=4, base_delay=0.01, deadline=30),
+        circuit_breaker=CircuitBreaker(name="gpt-teste"),
+        cache=ResponseCache(path=str(tmp_path / "llm_cache.sqlite3")),
+    )
@@ -1,56 +1,663 @@
-from tinydb import TinyDB, Query
+import os
+import json
+import time
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+from metrics import registry as metrics
 
-class AnalyzeDatabase(TinyDB):
-    def __init__(self, file_path='db.json') -> None:
-        # Inicializar o banco de dados TinyDB com o arquivo especificado
+# Colunas indexadas de cada tabela; o documento completo fica em JSON na coluna `data`
+TABLES = {
+    "jobs": ("id", "name"),
+    "resums": ("id", "job_id", "file"),
+    "analysis": ("id", "job_id", "resum_id", "name", "score"),
+    "files": ("file_id", "job_id"),
+    "fingerprints": ("sha256", "job_id", "prompt_version", "resum_id"),
+    # Texto, texto formatado e resumo do currículo, reaproveitados entre as vagas
+    "cv_artifacts": ("sha256",),
+}
+
+# Colunas exibidas no ranking: as indexadas vêm direto da tabela, as demais do JSON
+ANALYSIS_PAGE_COLUMNS = ("name", "education", "skills", "languages", "score", "resum_id", "id")
+
+# Campos das análises cobertos pelo índice invertido (tabela analysis_terms)
+SEARCH_FIELDS = ("skills", "education", "languages")
+# Facetas aceitas pela busca: os campos indexados e a vaga
+SEARCH_FACETS = SEARCH_FIELDS + ("job_id",)
+# Máximo de textos normalizados mantidos em memória (habilidades e idiomas se repetem muito)
+TERM_CACHE_SIZE = 100_000
+
+# Chaves únicas de cada tabela
+UNIQUE_KEYS = {
+    "jobs": ("id",),
+    "resums": ("id",),
+    "analysis": ("id",),
+    "files": ("file_id",),
+    "fingerprints": ("sha256", "job_id", "prompt_version"),
+    "cv_artifacts": ("sha256",),
+}
+
+# Índices secundários; tuplas definem índices compostos
+INDEXES = {
+    "jobs": ("name",),
+    "resums": ("job_id", "file"),
+    # (job_id, score): ranking paginado de uma vaga sem ordenar a tabela inteira
+    # score: filtros por nota mínima na busca entre todas as vagas
+    "analysis": ("job_id", "resum_id", "name", "score", ("job_id", "score")),
+    "files": ("job_id",),
+    "fingerprints": ("resum_id",),
+    "cv_artifacts": (),
+}
+
+
+class Table:
+    """Tabela de documentos JSON com colunas indexadas (API próxima à do TinyDB)."""
+
+    def __init__(self, database, name, columns, upsert=False):
+        self.database = database
+        self.name = name
+        self.columns = columns
+        # upsert: inserir substitui o documento com a mesma chave única
+        self.upsert = upsert
+
+    def _row(self, document):
+        return tuple(document.get(column) for column in self.columns) + (
+            json.dumps(document, ensure_ascii=False),
+        )
+
+    def insert(self, document):
+        # Inserir um documento e retornar o ID da linha
+        return self.insert_multiple([document])[0]
+
+    def prepare(self, document):
+        # Trabalho de um documento que pode ser feito antes da transação (nenhum, por padrão)
+        return None
+
+    def insert_multiple(self, documents, replace=False, prepared=None):
+        # Inserir vários documentos em uma única transação
+        placeholders = ", ".join("?" for _ in range(len(self.columns) + 1))
+        verb = "INSERT OR REPLACE" if replace or self.upsert else "INSERT"
+        sql = f"{verb} INTO {self.name} ({', '.join(self.columns)}, data) VALUES ({placeholders})"
+        ids = []
+        with self.database.transaction() as cursor:
+            for document in documents:
+                cursor.execute(sql, self._row(document))
+                ids.append(cursor.lastrowid)
+        return ids
+
+    def all(self):
+        # Retornar todos os documentos da tabela
+        return self.find()
+
+    def find(self, order_by=None, **filters):
+        # Buscar documentos por igualdade nas colunas indexadas
+        sql = f"SELECT data FROM {self.name}"
+        params = []
+        if filters:
+            sql += " WHERE " + " AND ".join(f"{column} = ?" for column in filters)
+            params = list(filters.values())
+        sql += f" ORDER BY {order_by}" if order_by else " ORDER BY rowid"
+        rows = self.database.query(sql, params)
+        return [json.loads(row[0]) for row in rows]
+
+    def find_one(self, **filters):
+        sql = f"SELECT data FROM {self.name} WHERE " + " AND ".join(f"{column} = ?" for column in filters)
+        rows = self.database.query(sql + " LIMIT 1", list(filters.values()))
+        return json.loads(rows[0][0]) if rows else None
+
+    def remove(self, **filters):
+        # Remover documentos por igualdade nas colunas indexadas
+        sql = f"DELETE FROM {self.name} WHERE " + " AND ".join(f"{column} = ?" for column in filters)
+        with self.database.transaction() as cursor:
+            cursor.execute(sql, list(filters.values()))
+
+    def truncate(self):
+        with self.database.transaction() as cursor:
+            cursor.execute(f"DELETE FROM {self.name}")
+
+    def __len__(self):
+        return self.database.query(f"SELECT COUNT(*) FROM {self.name}")[0][0]
+
+
+class AnalysisTable(Table):
+    """
+    Tabela de análises que mantém o índice invertido (analysis_terms) a cada
+    escrita. O índice aponta para o rowid da análise, para que as interseções
+    e junções da busca sejam feitas sobre inteiros.
+    """
+
+    def prepare(self, document):
+        # Termos do índice de um documento, normalizados (spaCy) sem nenhuma trava do banco
+        return self.database.index_rows([document])
+
+    def insert_multiple(self, documents, replace=False, prepared=None):
+        # `prepared`: termos de cada documento já calculados por prepare (ex.: no UnitOfWork.add);
+        # sem eles, normalizar aqui, ainda antes da transação
+        if prepared is None:
+            terms = self.database.index_rows(documents)
+        else:
+            terms = [
+                (term, field, position)
+                for position, document_terms in enumerate(prepared)
+                for term, field, _ in document_terms
+            ]
+        with self.database.transaction() as cursor:
+            # Substituição: remover os termos da versão anterior (o rowid muda no REPLACE)
+            cursor.executemany(
+                "DELETE FROM analysis_terms WHERE doc IN (SELECT rowid FROM analysis WHERE id = ?)",
+                [(document.get("id"),) for document in documents],
+            )
+            rowids = super().insert_multiple(documents, replace=replace)
+            cursor.executemany(
+                "INSERT OR IGNORE INTO analysis_terms (term, field, doc) VALUES (?, ?, ?)",
+                [(term, field, rowids[position]) for term, field, position in terms],
+            )
+        return rowids
+
+    def remove(self, **filters):
+        where = " AND ".join(f"{column} = ?" for column in filters)
+        with self.database.transaction() as cursor:
+            cursor.execute(
+                f"DELETE FROM analysis_terms WHERE doc IN (SELECT rowid FROM analysis WHERE {where})",
+                list(filters.values()),
+            )
+            super().remove(**filters)
+
+    def truncate(self):
+        with self.database.transaction() as cursor:
+            cursor.execute("DELETE FROM analysis_terms")
+            super().truncate()
+
+
+class UnitOfWork:
+    """
+    Acumula as inserções de vários currículos e grava tudo em uma única
+    transação quando `flush_size` currículos estiverem pendentes ou após
+    `flush_interval` segundos. Os registros de um mesmo currículo são sempre
+    gravados juntos, de modo que uma falha nunca deixa linhas órfãs.
+    """
+
+    def __init__(self, database, flush_size=50, flush_interval=5.0):
+        self.database = database
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.pending = []
+        self.pending_removals = []
+        self.pending_units = 0
+        self.last_flush = time.monotonic()
+        self.lock = threading.Lock()
+
+    def add(self, *rows, replaces=()):
+        # Adicionar os registros (tabela, documento) de um currículo
+        # `replaces`: remoções (tabela, filtros) de versões anteriores, aplicadas no mesmo lote
+        # A normalização dos termos roda aqui, fora das travas: no flush só restam os INSERTs
+        rows = [(table, document, table.prepare(document)) for table, document in rows]
+        with self.lock:
+            self.pending.extend(rows)
+            self.pending_removals.extend(replaces)
+            self.pending_units += 1
+            should_flush = self.pending_units >= self.flush_size
+        if should_flush or self.is_due():
+            self.flush()
+
+    def is_due(self):
+        return bool(self.pending) and time.monotonic() - self.last_flush >= self.flush_interval
+
+    def flush(self):
+        # Gravar todos os registros pendentes em uma única transação
+        with self.lock:
+            rows, self.pending = self.pending, []
+            removals, self.pending_removals = self.pending_removals, []
+            units, self.pending_units = self.pending_units, 0
+            self.last_flush = time.monotonic()
+        if not rows and not removals:
+            return 0
+        started = time.perf_counter()
+        by_table = {}
+        for table, document, prepared in rows:
+            _, documents, prepared_documents = by_table.setdefault(table.name, (table, [], []))
+            documents.append(document)
+            prepared_documents.append(prepared)
+        try:
+            with self.database.transaction():
+                for table, filters in removals:
+                    table.remove(**filters)
+                for table, documents, prepared in by_table.values():
+                    table.insert_multiple(documents, prepared=prepared)
+        except Exception:
+            # Devolver os registros à fila para não perdê-los
+            with self.lock:
+                self.pending = rows + self.pending
+                self.pending_removals = removals + self.pending_removals
+                self.pending_units += units
+            raise
+        metrics.observe("stage_seconds", time.perf_counter() - started, stage="db_flush")
+        metrics.inc("db_rows_written_total", len(rows))
+        logging.info(f"{units} currículos gravados no banco em uma transação.")
+        return units
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        # Os currículos já adicionados estão completos e são gravados mesmo em caso de erro
+        self.flush()
+
+
+class AnalyzeDatabase:
+    def __init__(self, file_path='db.sqlite3', legacy_json_path='db.json', normalizer=None) -> None:
+        # Inicializar o banco SQLite (modo WAL) com o arquivo especificado
         # Criar tabelas para armazenar vagas, resumos de currículos, análises e arquivos
-        super().__init__(file_path)
-        self.jobs = self.table('jobs')
-        self.resums = self.table('resums')
-        self.analysis = self.table('analysis')
-        self.files = self.table('files')
+        is_new = not os.path.exists(file_path)
+        self.file_path = file_path
+        self.lock = threading.RLock()
+        # Normalização dos termos do índice: lista de textos -> lista de textos normalizados
+        # (por padrão helper.format_cvs, carregado só quando o índice é usado)
+        self.normalizer = normalizer
+        self.term_cache = {}
+        # O normalizador pode ser chamado de várias threads (UnitOfWork.add, busca)
+        self.normalize_lock = threading.Lock()
+        self.connection = sqlite3.connect(file_path, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.create_schema()
+
+        self.jobs = Table(self, 'jobs', TABLES['jobs'])
+        self.resums = Table(self, 'resums', TABLES['resums'])
+        self.analysis = AnalysisTable(self, 'analysis', TABLES['analysis'])
+        self.files = Table(self, 'files', TABLES['files'])
+        self.fingerprints = Table(self, 'fingerprints', TABLES['fingerprints'], upsert=True)
+        self.cv_artifacts = Table(self, 'cv_artifacts', TABLES['cv_artifacts'], upsert=True)
+
+        if is_new:
+            # Banco novo: toda análise será indexada ao ser gravada
+            self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('search_index', 1)")
+
+        # Migrar automaticamente o db.json do TinyDB enquanto a migração não estiver registrada no meta
+        # (uma migração que falhou é tentada de novo na próxima abertura do banco)
+        if legacy_json_path and os.path.exists(legacy_json_path) and not self.is_migrated():
+            try:
+                self.migrate_from_tinydb(legacy_json_path)
+            except Exception:
+                logging.error(
+                    f"Erro ao migrar {legacy_json_path} para {file_path}; "
+                    "a migração será tentada novamente na próxima execução.",
+                    exc_info=True,
+                )
+
+    def create_schema(self):
+        with self.lock:
+            for table, columns in TABLES.items():
+                self.connection.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(columns)}, data TEXT NOT NULL)"
+                )
+                unique_key = UNIQUE_KEYS[table]
+                self.connection.execute(
+                    f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{table}_{'_'.join(unique_key)} "
+                    f"ON {table} ({', '.join(unique_key)})"
+                )
+                for columns in INDEXES[table]:
+                    columns = (columns,) if isinstance(columns, str) else columns
+                    self.connection.execute(
+                        f"CREATE INDEX IF NOT EXISTS idx_{table}_{'_'.join(columns)} "
+                        f"ON {table} ({', '.join(columns)})"
+                    )
+            # Índice invertido das análises: termo normalizado -> análises, por campo
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS analysis_terms (term TEXT NOT NULL, field TEXT NOT NULL, "
+                "doc INTEGER NOT NULL, PRIMARY KEY (term, field, doc)) WITHOUT ROWID"
+            )
+            # Caminho inverso (análise -> termos): remoções e facetas
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS idx_analysis_terms_doc ON analysis_terms (doc, field, term)"
+            )
+            # Versão do banco: incrementada a cada escrita, usada para invalidar caches de leitura
+            self.connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            self.connection.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('version', 0)")
+
+    def query(self, sql, params=()):
+        # Executar uma consulta e retornar todas as linhas (a conexão é compartilhada entre threads)
+        with self.lock:
+            return self.connection.execute(sql, params).fetchall()
+
+    @contextmanager
+    def transaction(self):
+        # Executar um bloco de escrita atomicamente (commit no fim, rollback em caso de erro)
+        with self.lock:
+            cursor = self.connection.cursor()
+            if self.connection.in_transaction:
+                # Transação aninhada: participa da transação externa
+                yield cursor
+                return
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                yield cursor
+                cursor.execute("UPDATE meta SET value = value + 1 WHERE key = 'version'")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+            cursor.execute("COMMIT")
+
+    def get_version(self):
+        # Versão atual do banco (muda a cada transação de escrita, inclusive de outros processos)
+        return self.query("SELECT value FROM meta WHERE key = 'version'")[0][0]
+
+    def unit_of_work(self, flush_size=50, flush_interval=5.0):
+        # Criar um buffer de escrita em lote (ver UnitOfWork)
+        return UnitOfWork(self, flush_size=flush_size, flush_interval=flush_interval)
+
+    def is_migrated(self):
+        # Verificar se o db.json do TinyDB já foi importado
+        if self.query("SELECT 1 FROM meta WHERE key = 'tinydb_migration'"):
+            return True
+        # Bancos anteriores ao registro no meta: a migração é atômica, então dados gravados indicam que ela terminou
+        if any(len(table) for table in (self.jobs, self.resums, self.analysis, self.files)):
+            self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('tinydb_migration', 1)")
+            return True
+        return False
+
+    def migrate_from_tinydb(self, json_path):
+        # Importar os documentos de um db.json do TinyDB ({"tabela": {"doc_id": documento}})
+        with open(json_path, encoding='utf-8') as f:
+            data = json.load(f)
+        tables = {'jobs': self.jobs, 'resums': self.resums, 'analysis': self.analysis, 'files': self.files}
+        counts = {}
+        with self.transaction() as cursor:
+            for name, table in tables.items():
+                documents = list(data.get(name, {}).values())
+                # Análises gravadas sem termos: a migração não carrega o spaCy
+                prepared = [[] for _ in documents] if table is self.analysis else None
+                table.insert_multiple(documents, replace=True, prepared=prepared)
+                counts[name] = len(documents)
+            # O índice é recriado na primeira busca (ensure_index), fora desta transação
+            cursor.execute("DELETE FROM meta WHERE key = 'search_index'")
+            # Registrado na mesma transação: ou os dados e o registro são gravados, ou nenhum dos dois
+            cursor.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('tinydb_migration', 1)")
+        logging.info(f"Banco {json_path} migrado para {self.file_path}: {counts}")
+        return counts
 
     def get_job_by_name(self, name):
         # Buscar uma vaga pelo nome no banco de dados e retornar o primeiro resultado encontrado
-        job = Query()
-        result = self.jobs.search(job.name == name)
-        return result[0] if result else None
-    
+        return self.jobs.find_one(name=name)
+
+    def get_job_by_id(self, id):
+        # Buscar uma vaga pelo ID
+        return self.jobs.find_one(id=id)
+
     def get_resum_by_id(self, id):
         # Buscar um resumo de currículo específico pelo ID do resumo
-        resum = Query()
-        result = self.resums.search(resum.id == id)
-        return result[0] if result else None
+        return self.resums.find_one(id=id)
 
     def get_analysis_by_job_id(self, job_id):
         # Buscar todas as análises associadas a um ID de vaga específico
-        analysis = Query()
-        result = self.analysis.search(analysis.job_id == job_id)
-        return result
+        return self.analysis.find(job_id=job_id)
+
+    def count_analysis_by_job_id(self, job_id):
+        # Contar as análises de uma vaga sem carregar os documentos
+        return self.query("SELECT COUNT(*) FROM analysis WHERE job_id = ?", (job_id,))[0][0]
+
+    def get_analysis_page(self, job_id, offset=0, limit=50, columns=ANALYSIS_PAGE_COLUMNS):
+        # Buscar uma página do ranking de uma vaga (maior score primeiro), só com as colunas pedidas
+        indexed = [column for column in columns if column in TABLES['analysis']]
+        # Campos fora das colunas indexadas são extraídos do JSON em um único objeto
+        extracted = ", ".join(f"'{column}', json_extract(data, '$.{column}')" for column in columns if column not in indexed)
+        rows = self.query(
+            f"SELECT {', '.join(indexed + [f'json_object({extracted})'])} FROM analysis WHERE job_id = ? "
+            "ORDER BY score DESC, rowid LIMIT ? OFFSET ?",
+            (job_id, limit, offset),
+        )
+        page = []
+        for row in rows:
+            document = dict(zip(indexed, row), **json.loads(row[-1]))
+            page.append({column: document.get(column) for column in columns})
+        return page
+
+    def normalize_texts(self, texts):
+        # Normalizar textos como o format_cv (lemas, sem acentos), com cache por texto
+        cached = {text: self.term_cache.get(text) for text in dict.fromkeys(texts)}
+        missing = [text for text, normalized in cached.items() if normalized is None]
+        if missing:
+            with self.normalize_lock:
+                if self.normalizer is None:
+                    from helper import format_cvs
+                    self.normalizer = format_cvs
+                normalized = dict(zip(missing, self.normalizer(missing)))
+            if len(self.term_cache) + len(missing) > TERM_CACHE_SIZE:
+                self.term_cache.clear()
+            self.term_cache.update(normalized)
+            cached.update(normalized)
+        return [cached[text] for text in texts]
+
+    def index_rows(self, documents):
+        # Linhas (termo, campo, posição do documento na lista) do índice invertido
+        values = [
+            (position, field, str(value))
+            for position, document in enumerate(documents)
+            for field in SEARCH_FIELDS
+            for value in (document.get(field) or [])
+            if value
+        ]
+        normalized = self.normalize_texts([value for _, _, value in values])
+        return list({
+            (term, field, position)
+            for (position, field, _), text in zip(values, normalized)
+            for term in text.split()
+        })
+
+    def rebuild_index(self, batch_size=1000):
+        # Recriar o índice invertido a partir das análises gravadas (ex.: bancos anteriores ao índice
+        # ou migrados do TinyDB). Cada lote é normalizado antes de abrir a sua transação, para que o
+        # spaCy não rode com o banco travado
+        total = 0
+        last_rowid = 0
+        while rows := self.query(
+            "SELECT rowid, data FROM analysis WHERE rowid > ? ORDER BY rowid LIMIT ?", (last_rowid, batch_size)
+        ):
+            terms = self.index_rows([json.loads(row[1]) for row in rows])
+            with self.transaction() as cursor:
+                cursor.executemany("DELETE FROM analysis_terms WHERE doc = ?", [(row[0],) for row in rows])
+                # Análises substituídas ou removidas desde a leitura (o rowid muda no REPLACE) ficam de fora
+                cursor.executemany(
+                    "INSERT OR IGNORE INTO analysis_terms (term, field, doc) "
+                    "SELECT ?, ?, rowid FROM analysis WHERE rowid = ?",
+                    [(term, field, rows[position][0]) for term, field, position in terms],
+                )
+            total += len(rows)
+            last_rowid = rows[-1][0]
+        with self.transaction() as cursor:
+            # Termos de análises que não existem mais
+            cursor.execute("DELETE FROM analysis_terms WHERE doc NOT IN (SELECT rowid FROM analysis)")
+            cursor.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('search_index', 1)")
+        logging.info(f"Índice de busca recriado para {total} análises.")
+        return total
+
+    def ensure_index(self):
+        # Bancos criados antes do índice: indexar as análises existentes uma única vez
+        if not self.query("SELECT 1 FROM meta WHERE key = 'search_index'"):
+            self.rebuild_index()
+
+    def _term_select(self, text, fields):
+        # SELECT dos rowids das análises que contêm o termo: todos os seus lemas, nos campos pedidos
+        tokens = self.normalize_texts([text])[0].split()
+        if not tokens:
+            return None, []
+        field_filter = ", ".join("?" for _ in fields)
+        select = " INTERSECT ".join(
+            f"SELECT doc FROM analysis_terms WHERE term = ? AND field IN ({field_filter})" for _ in tokens
+        )
+        return f"SELECT doc FROM ({select})", [param for token in tokens for param in (token, *fields)]
+
+    def _terms_select(self, texts, fields, operator):
+        # Combinar os SELECTs de vários termos com INTERSECT ou UNION
+        selects = [self._term_select(text, fields) for text in texts]
+        selects = [(select, params) for select, params in selects if select]
+        if not selects:
+            return None, []
+        select = f" {operator} ".join(select for select, _ in selects)
+        return f"SELECT doc FROM ({select})", [param for _, params in selects for param in params]
+
+    def search(self, must=(), should=(), exclude=(), fields=SEARCH_FIELDS, job_id=None,
+               min_score=None, facets=(), limit=50, offset=0, facet_limit=10):
+        """
+        Busca análises pelo índice invertido, em todas as vagas ou em uma só.
+
+        must: termos obrigatórios; should: pelo menos um deles; exclude: nenhum deles.
+        Cada termo é normalizado como o format_cv ("Inglês" -> "ingles"), e termos
+        com várias palavras exigem todas elas. `fields` restringe os campos
+        pesquisados e `facets` pede a contagem dos termos mais frequentes de
+        cada campo (ou por vaga, com "job_id") entre os resultados.
+
+            database.search(must=["Direito", "inglês"], min_score=7, facets=["languages"])
+
+        Um termo obrigatório que não sobrevive à normalização (ex.: só stop words)
+        não pode ser satisfeito, e a busca volta vazia; o mesmo vale para `should`
+        quando nenhum dos seus termos sobrevive.
+
+        Retorna {"total", "results" (maior score primeiro), "facets"}.
+        """
+        fields = tuple(fields)
+        unknown = (set(fields) - set(SEARCH_FIELDS)) | (set(facets) - set(SEARCH_FACETS))
+        if unknown:
+            raise ValueError(f"Campos de busca inválidos: {sorted(unknown)}")
+        must_tokens = [text.split() for text in self.normalize_texts(list(must))]
+        should_tokens = [text.split() for text in self.normalize_texts(list(should))]
+        if not all(must_tokens) or (should_tokens and not any(should_tokens)):
+            return {"total": 0, "results": [], "facets": {facet: [] for facet in facets}}
+        self.ensure_index()
+
+        conditions, params = [], []
+        for texts, operator, negate in ((must, "INTERSECT", False), (should, "UNION", False), (exclude, "UNION", True)):
+            select, select_params = self._terms_select(texts, fields, operator)
+            if select:
+                conditions.append(f"rowid {'NOT IN' if negate else 'IN'} ({select})")
+                params += select_params
+        if job_id is not None:
+            conditions.append("job_id = ?")
+            params.append(job_id)
+        if min_score is not None:
+            conditions.append("score >= ?")
+            params.append(min_score)
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+
+        with self.lock:
+            # Os rowids encontrados vão para uma tabela temporária, reaproveitada
+            # pela contagem, pela página e pelas facetas
+            cursor = self.connection.cursor()
+            cursor.execute("CREATE TEMP TABLE IF NOT EXISTS search_hits (doc INTEGER PRIMARY KEY)")
+            cursor.execute("DELETE FROM search_hits")
+            cursor.execute(f"INSERT INTO search_hits SELECT rowid FROM analysis{where}", params)
+            total = cursor.execute("SELECT COUNT(*) FROM search_hits").fetchone()[0]
+            rows = cursor.execute(
+                "SELECT analysis.job_id, analysis.data FROM search_hits "
+                "CROSS JOIN analysis ON analysis.rowid = search_hits.doc "
+                "ORDER BY analysis.score DESC, analysis.rowid LIMIT ? OFFSET ?",
+                (limit, offset),
+            ).fetchall()
+            facet_counts = {}
+            for facet in facets:
+                if facet == "job_id":
+                    sql = (
+                        "SELECT analysis.job_id, COUNT(*) FROM search_hits "
+                        "CROSS JOIN analysis ON analysis.rowid = search_hits.doc "
+                        "GROUP BY analysis.job_id ORDER BY 2 DESC, 1 LIMIT ?"
+                    )
+                    facet_params = (facet_limit,)
+                else:
+                    sql = (
+                        "SELECT analysis_terms.term, COUNT(*) FROM search_hits "
+                        "CROSS JOIN analysis_terms ON analysis_terms.doc = search_hits.doc AND analysis_terms.field = ? "
+                        "GROUP BY analysis_terms.term ORDER BY 2 DESC, 1 LIMIT ?"
+                    )
+                    facet_params = (facet, facet_limit)
+                facet_counts[facet] = [tuple(row) for row in cursor.execute(sql, facet_params).fetchall()]
+            cursor.execute("DELETE FROM search_hits")
+
+        results = []
+        for row_job_id, data in rows:
+            document = json.loads(data)
+            results.append(dict({column: document.get(column) for column in ANALYSIS_PAGE_COLUMNS}, job_id=row_job_id))
+        return {"total": total, "results": results, "facets": facet_counts}
 
     def get_resums_by_job_id(self, job_id):
         # Buscar todos os resumos de currículos associados a um ID de vaga específico
-        resum = Query()
-        result = self.resums.search(resum.job_id == job_id)
-        return result
-    
+        return self.resums.find(job_id=job_id)
+
     def get_resum_by_file(self, file):
         # Buscar um resumo de currículo específico pelo caminho do arquivo
-        resum = Query()
-        result = self.resums.search(resum.file == file)
-        return result[0] if result else None
+        return self.resums.find_one(file=file)
+
+    def load_fingerprints(self):
+        # Carregar todos os fingerprints (sha256, job_id, prompt_version) já processados
+        rows = self.query("SELECT sha256, job_id, prompt_version FROM fingerprints")
+        return {tuple(row) for row in rows}
+
+    def get_fingerprint(self, sha256, job_id, prompt_version):
+        # Buscar o fingerprint de um currículo (conteúdo) já processado para a vaga
+        return self.fingerprints.find_one(sha256=sha256, job_id=job_id, prompt_version=prompt_version)
+
+    def get_cv_artifact(self, sha256):
+        # Buscar o texto, o texto formatado e o resumo já gerados para o conteúdo do PDF
+        return self.cv_artifacts.find_one(sha256=sha256)
+
+    def get_resums_without_fingerprint(self):
+        # Resumos gravados antes dos fingerprints existirem
+        rows = self.query(
+            "SELECT resums.data FROM resums LEFT JOIN fingerprints "
+            "ON fingerprints.resum_id = resums.id WHERE fingerprints.resum_id IS NULL"
+        )
+        return [json.loads(row[0]) for row in rows]
+
+    def delete_analysis_by_file(self, file):
+        # Remover resumos, análises e fingerprints de um arquivo de currículo (em todas as vagas)
+        with self.transaction():
+            for resum in self.resums.find(file=file):
+                self.analysis.remove(resum_id=resum['id'])
+                self.fingerprints.remove(resum_id=resum['id'])
+            self.resums.remove(file=file)
+
+    def rename_file(self, file, new_file):
+        # Apontar os resumos de um currículo para o novo caminho (análises e fingerprints seguem valendo)
+        with self.transaction():
+            resums = self.resums.find(file=file)
+            for resum in resums:
+                resum['file'] = new_file
+            self.resums.insert_multiple(resums, replace=True)
 
     def delete_all_resums_by_job_id(self, job_id):
         # Remover todos os resumos de currículos associados a um ID de vaga específico
-        resum = Query()
-        self.resums.remove(resum.job_id == job_id)
+        # (e os fingerprints, para que os currículos voltem a ser analisados)
+        with self.transaction():
+            self.resums.remove(job_id=job_id)
+            self.fingerprints.remove(job_id=job_id)
 
     def delete_all_analysis_by_job_id(self, job_id):
         # Remover todas as análises associadas a um ID de vaga específico
-        analysis = Query()
-        self.analysis.remove(analysis.job_id == job_id)
+        self.analysis.remove(job_id=job_id)
 
     def delete_all_files_by_job_id(self, job_id):
-        # Remover todas as análises associadas a um ID de vaga específico
-        file = Query()
-        self.analysis.remove(file.job_id == job_id)
\ No newline at end of file
+        # Remover todos os arquivos associados a um ID de vaga específico
+        self.files.remove(job_id=job_id)
+
+    def clear_all_data(self):
+        # Remover resumos, análises e arquivos (as vagas e os cv_artifacts, que não dependem
+        # de nenhuma análise, são mantidos)
+        with self.transaction():
+            for table in (self.resums, self.analysis, self.files, self.fingerprints):
+                table.truncate()
+            # Banco vazio: o índice de busca está completo por definição
+            self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('search_index', 1)")
+
+    def close(self):
+        self.connection.close()
+
+
+if __name__ == "__main__":
+    # Migração manual: python database.py [db.json] [db.sqlite3]
+    import sys
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    json_path = sys.argv[1] if len(sys.argv) > 1 else 'db.json'
+    sqlite_path = sys.argv[2] if len(sys.argv) > 2 else 'db.sqlite3'
+    database = AnalyzeDatabase(sqlite_path, legacy_json_path=None)
+    database.migrate_from_tinydb(json_path)
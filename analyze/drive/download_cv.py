@@ -1,52 +1,360 @@
 import os
+import re
+import json
+import time
+import hashlib
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
-from google.oauth2.credentials import Credentials
+from googleapiclient.errors import HttpError
 from .authenticate import authenticate_drive  # Importando a função de autenticação
 
 # Configuração de logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# Função para baixar arquivos
-def download_files(token_path, credentials_path, folder_id, download_path):
-    try:
-        logging.info(f"Iniciando o download de arquivos da pasta ID: {folder_id}")
+# Configurações da sincronização
+DOWNLOAD_WORKERS = int(os.getenv("DRIVE_DOWNLOAD_WORKERS", 8))  # Downloads simultâneos
+CHUNK_SIZE = int(os.getenv("DRIVE_CHUNK_SIZE", 4 * 1024 * 1024))  # Tamanho de cada parte do download
+MANIFEST_NAME = ".drive_manifest.json"  # Estado local da sincronização, dentro da pasta de download
+LIST_FIELDS = "nextPageToken, files(id, name, md5Checksum, modifiedTime, size, mimeType)"
+CHANGE_FIELDS = (
+    "nextPageToken, newStartPageToken, "
+    "changes(fileId, removed, file(id, name, md5Checksum, modifiedTime, size, mimeType, parents, trashed))"
+)
 
-        # Autenticar e construir o serviço
-        creds = authenticate_drive(token_path=token_path, credentials_path=credentials_path)
-        service = build('drive', 'v3', credentials=creds)
 
-        # Listar arquivos
+def list_folder_files(service, folder_id):
+    """Lista todos os arquivos da pasta, percorrendo todas as páginas do resultado."""
+    files = []
+    page_token = None
+    while True:
         results = service.files().list(
-            q=f"'{folder_id}' in parents", fields="files(id, name)"
+            q=f"'{folder_id}' in parents and trashed = false",
+            fields=LIST_FIELDS,
+            pageSize=1000,
+            pageToken=page_token,
         ).execute()
-        files = results.get('files', [])
-
-        if not files:
-            logging.warning("Nenhum arquivo encontrado na pasta especificada.")
-            return []
-
-        downloaded_files = []
-        for file in files:
-            file_id = file['id']
-            file_name = file['name']
-            logging.info(f"Baixando arquivo: {file_name} (ID: {file_id})")
-            request = service.files().get_media(fileId=file_id)
-            file_path = os.path.join(download_path, file_name) # caminho do arquivo corrigido
-            os.makedirs(download_path, exist_ok=True)
+        files.extend(results.get('files', []))
+        page_token = results.get('nextPageToken')
+        if not page_token:
+            return files
+
+
+def load_manifest(download_path):
+    manifest_path = os.path.join(download_path, MANIFEST_NAME)
+    if os.path.exists(manifest_path):
+        try:
+            with open(manifest_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            logging.warning(f"Manifesto de sincronização inválido, ignorando: {manifest_path}")
+    return {"files": {}}
+
+
+def save_manifest(download_path, manifest):
+    manifest_path = os.path.join(download_path, MANIFEST_NAME)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+
+def local_md5(file_path):
+    digest = hashlib.md5()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def manifest_entry(file, file_path):
+    return {
+        'name': file['name'],
+        'md5Checksum': file.get('md5Checksum'),
+        'modifiedTime': file.get('modifiedTime'),
+        'size': os.path.getsize(file_path),
+    }
+
+
+def is_up_to_date(file, file_path, manifest):
+    """Verifica se a cópia local corresponde ao arquivo do Drive."""
+    if not os.path.exists(file_path):
+        return False
+    entry = manifest["files"].get(file['id'])
+    # Caminho rápido: mesmo checksum já registrado e mesmo tamanho em disco, sem reler o arquivo
+    if entry and entry.get('md5Checksum') == file.get('md5Checksum') \
+            and entry.get('modifiedTime') == file.get('modifiedTime') \
+            and entry.get('size') == os.path.getsize(file_path):
+        return True
+    if file.get('md5Checksum'):
+        return local_md5(file_path) == file['md5Checksum']
+    return False
+
+
+def fetch_range(request, start, end, num_retries=3):
+    """
+    Baixa os bytes [start, end] da mídia com um cabeçalho Range. Erros
+    temporários (5xx, 429, conexão) são repetidos com backoff exponencial.
+    Retorna (status, cabeçalhos, conteúdo).
+    """
+    headers = dict(request.headers, range=f"bytes={start}-{end}")
+    for attempt in range(num_retries + 1):
+        try:
+            response, content = request.http.request(request.uri, method="GET", headers=headers)
+        except OSError:
+            if attempt == num_retries:
+                raise
+            time.sleep(2 ** attempt)
+            continue
+        if response.status in (200, 206, 416):
+            return response.status, response, content
+        if (response.status >= 500 or response.status == 429) and attempt < num_retries:
+            time.sleep(2 ** attempt)
+            continue
+        raise HttpError(response, content, uri=request.uri)
+
+
+def download_file(service, file, file_path, chunk_size=CHUNK_SIZE):
+    """
+    Baixa um arquivo em partes para um .part, retomando de onde parou se já
+    existir. Retorna o conteúdo baixado.
+    """
+    part_path = file_path + ".part"
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    expected_size = int(file['size']) if file.get('size') else None
+
+    if expected_size is None or offset < expected_size:
+        request = service.files().get_media(fileId=file['id'])
+        with open(part_path, 'ab') as f:
+            # Retomar o download interrompido: cada parte pede o Range seguinte aos bytes já gravados
+            while expected_size is None or offset < expected_size:
+                status, headers, content = fetch_range(request, offset, offset + chunk_size - 1)
+                if status == 416:
+                    # Nada além do que já está no .part
+                    break
+                if status == 200:
+                    # O servidor ignorou o Range e enviou o arquivo inteiro
+                    f.truncate(0)
+                    f.write(content)
+                    break
+                f.write(content)
+                offset += len(content)
+                match = re.search(r"/(\d+)$", headers.get('content-range', ''))
+                if match:
+                    expected_size = int(match.group(1))
+                if not content:
+                    break
+                logging.debug(f"{file['name']}: {offset} de {expected_size or '?'} bytes.")
+
+    with open(part_path, 'rb') as f:
+        data = f.read()
+    if file.get('md5Checksum') and hashlib.md5(data).hexdigest() != file['md5Checksum']:
+        # Parte parcial de uma versão anterior do arquivo; recomeçar do zero na próxima vez
+        os.remove(part_path)
+        raise IOError(f"Checksum inválido para {file['name']}")
+    os.replace(part_path, file_path)
+    return data
+
+
+def download_pending(service_factory, files, download_path, manifest, workers=DOWNLOAD_WORKERS, on_file=None):
+    """
+    Baixa em paralelo os arquivos cuja cópia local não confere (md5Checksum/modifiedTime)
+    e atualiza o manifesto. `service_factory` cria um serviço do Drive; cada thread
+    usa o seu, pois o cliente HTTP não é thread-safe. `on_file(file_path, data)` é
+    chamado assim que cada arquivo termina, com o conteúdo em memória.
+    Os arquivos que falharem ficam em manifest["failed"] (ID -> metadados), para
+    que a próxima sincronização incremental tente de novo. Retorna os arquivos baixados.
+    """
+    manifest_lock = threading.Lock()
+    local = threading.local()
+    failed = manifest.setdefault("failed", {})
+
+    pending = []
+    for file in files:
+        if file.get('mimeType', '').startswith('application/vnd.google-apps'):
+            logging.info(f"Ignorando documento nativo do Google: {file['name']}")
+            continue
+        file_path = os.path.join(download_path, file['name'])
+        if is_up_to_date(file, file_path, manifest):
+            # Registrar cópias antigas sem manifesto (para que exclusões futuras sejam propagadas)
+            # e os metadados novos de arquivos renomeados
+            manifest["files"][file['id']] = manifest_entry(file, file_path)
+            failed.pop(file['id'], None)
+            continue
+        pending.append((file, file_path))
+    logging.info(f"{len(files)} arquivos verificados, {len(pending)} para baixar.")
+
+    def worker(file, file_path):
+        if not hasattr(local, 'service'):
+            local.service = service_factory()
+        logging.info(f"Baixando arquivo: {file['name']} (ID: {file['id']})")
+        data = download_file(local.service, file, file_path)
+        with manifest_lock:
+            manifest["files"][file['id']] = manifest_entry(file, file_path)
+            failed.pop(file['id'], None)
+        if on_file is not None:
+            on_file(file_path, data)
+        return file_path
+
+    downloaded_files = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {executor.submit(worker, file, file_path): file for file, file_path in pending}
+        for future in as_completed(futures):
+            file = futures[future]
             try:
-              with open(file_path, 'wb') as f:
-                  downloader = MediaIoBaseDownload(f, request)
-                  done = False
-                  while not done:
-                      status, done = downloader.next_chunk()
-                      logging.info(f"Download {int(status.progress() * 100)}% concluído.")
-              downloaded_files.append(file_path)
-            except Exception as e:
-                 logging.error(f"Erro ao baixar arquivo {file_name} (ID: {file_id})", exc_info=True)
-        logging.info(f"Download de arquivos concluído. Arquivos baixados em: {download_path}")
-        return downloaded_files
+                downloaded_files.append(future.result())
+            except Exception:
+                logging.error(f"Erro ao baixar arquivo {file['name']} (ID: {file['id']})", exc_info=True)
+                with manifest_lock:
+                    failed[file['id']] = file
+    return downloaded_files
+
+
+def sync_folder(service_factory, folder_id, download_path, workers=DOWNLOAD_WORKERS, on_file=None):
+    """
+    Sincronização completa: lista todas as páginas da pasta e baixa apenas os
+    arquivos novos ou alterados. Retorna a lista de arquivos baixados.
+    """
+    os.makedirs(download_path, exist_ok=True)
+    files = list_folder_files(service_factory(), folder_id)
+    if not files:
+        logging.warning("Nenhum arquivo encontrado na pasta especificada.")
+        return []
+
+    manifest = load_manifest(download_path)
+    downloaded_files = download_pending(service_factory, files, download_path, manifest, workers, on_file)
+    save_manifest(download_path, manifest)
+    logging.info(f"Sincronização concluída. {len(downloaded_files)} arquivos baixados em: {download_path}")
+    return downloaded_files
+
+
+def remove_local_file(file_id, download_path, manifest, database=None):
+    """Apaga a cópia local de um arquivo removido do Drive e as análises ligadas a ela."""
+    entry = manifest["files"].pop(file_id, None)
+    if not entry:
+        return None
+    file_path = os.path.join(download_path, entry['name'])
+    if os.path.exists(file_path):
+        os.remove(file_path)
+    if database is not None:
+        database.delete_analysis_by_file(file_path)
+    logging.info(f"Arquivo removido do Drive, cópia local apagada: {entry['name']}")
+    return file_path
+
+
+def rename_local_file(file_id, name, download_path, manifest, database=None):
+    """
+    Move a cópia local de um arquivo renomeado no Drive para o novo nome e
+    atualiza o manifesto e os resumos no banco, mantendo as análises.
+    """
+    entry = manifest["files"][file_id]
+    old_path = os.path.join(download_path, entry['name'])
+    new_path = os.path.join(download_path, name)
+    if os.path.exists(old_path):
+        os.replace(old_path, new_path)
+    entry['name'] = name
+    if database is not None:
+        database.rename_file(old_path, new_path)
+    logging.info(f"Arquivo renomeado no Drive: {os.path.basename(old_path)} -> {name}")
+    return old_path, new_path
+
+
+def sync_changes(service_factory, folder_id, download_path, database=None, workers=DOWNLOAD_WORKERS, on_file=None):
+    """
+    Sincronização incremental pelo feed de alterações do Drive. Na primeira
+    execução faz a sincronização completa e guarda o cursor `startPageToken`
+    no manifesto; nas seguintes busca apenas as alterações desde o cursor:
+    baixa arquivos novos/alterados, move os renomeados (sem reprocessá-los) e
+    propaga exclusões (lixeira, remoção ou saída da pasta) para a pasta local e
+    para o banco. Downloads que falharam nas execuções anteriores
+    (manifest["failed"]) são tentados de novo, já que o cursor avança sem eles.
+    Retorna {"downloaded": [...], "removed": [...], "renamed": [(antigo, novo), ...]}.
+    """
+    os.makedirs(download_path, exist_ok=True)
+    service = service_factory()
+    manifest = load_manifest(download_path)
+    page_token = manifest.get("page_token")
+
+    if not page_token:
+        # Obter o cursor antes da listagem completa para não perder alterações feitas durante ela
+        start_token = service.changes().getStartPageToken().execute()['startPageToken']
+        downloaded_files = sync_folder(service_factory, folder_id, download_path, workers, on_file)
+        manifest = load_manifest(download_path)
+        manifest["page_token"] = start_token
+        save_manifest(download_path, manifest)
+        return {"downloaded": downloaded_files, "removed": [], "renamed": []}
+
+    # Falhas anteriores entram de novo; uma alteração mais recente no feed substitui os metadados
+    changed = dict(manifest.get("failed", {}))
+    removed_ids = set()
+    renamed = {}
+    while page_token:
+        response = service.changes().list(
+            pageToken=page_token,
+            fields=CHANGE_FIELDS,
+            pageSize=1000,
+            includeRemoved=True,
+        ).execute()
+        for change in response.get('changes', []):
+            file_id = change.get('fileId')
+            file = change.get('file') or {}
+            in_folder = folder_id in file.get('parents', [])
+            if change.get('removed') or file.get('trashed') or not in_folder:
+                # Só interessa a exclusão de arquivos que estão na cópia local
+                changed.pop(file_id, None)
+                manifest.get("failed", {}).pop(file_id, None)
+                renamed.pop(file_id, None)
+                if file_id in manifest["files"]:
+                    removed_ids.add(file_id)
+                continue
+            removed_ids.discard(file_id)
+            entry = manifest["files"].get(file_id)
+            if entry and entry['name'] != file.get('name'):
+                # Renomeado no Drive: a cópia local é movida, sem baixar nem analisar de novo
+                renamed[file_id] = file['name']
+            changed[file_id] = file
+        page_token = response.get('nextPageToken')
+        if response.get('newStartPageToken'):
+            manifest["page_token"] = response['newStartPageToken']
+
+    removed_files = [
+        path for path in (
+            remove_local_file(file_id, download_path, manifest, database) for file_id in removed_ids
+        ) if path
+    ]
+    renamed_files = [
+        rename_local_file(file_id, name, download_path, manifest, database)
+        for file_id, name in renamed.items() if file_id in manifest["files"]
+    ]
+    downloaded_files = download_pending(
+        service_factory, list(changed.values()), download_path, manifest, workers, on_file
+    )
+    save_manifest(download_path, manifest)
+    logging.info(
+        f"Sincronização incremental concluída: {len(downloaded_files)} baixados, "
+        f"{len(renamed_files)} renomeados, {len(removed_files)} removidos."
+    )
+    return {"downloaded": downloaded_files, "removed": removed_files, "renamed": renamed_files}
+
+
+# Função para baixar arquivos
+def download_files(token_path, credentials_path, folder_id, download_path, workers=DOWNLOAD_WORKERS, database=None, on_file=None,
+                   service_factory=None):
+    try:
+        logging.info(f"Iniciando o download de arquivos da pasta ID: {folder_id}")
+
+        if service_factory is None:
+            # Autenticar e construir um serviço por thread
+            creds = authenticate_drive(token_path=token_path, credentials_path=credentials_path)
+
+            def service_factory():
+                return build('drive', 'v3', credentials=creds, cache_discovery=False)
+
+        result = sync_changes(
+            service_factory, folder_id, download_path, database=database, workers=workers, on_file=on_file
+        )
+        return result["downloaded"]
     except Exception as e:
         logging.error("Erro ao executar a função download_files", exc_info=True)
         return []
@@ -69,4 +377,4 @@ if __name__ == "__main__":
         logging.warning("Nenhum arquivo foi baixado.")
 
     except Exception as e:
-       logging.critical(f"Erro crítico ao baixar os arquivos {e}", exc_info=True)
\ No newline at end of file
+       logging.critical(f"Erro crítico ao baixar os arquivos {e}", exc_info=True)
@@ -0,0 +1,209 @@
+import re
+import time
+import uuid
+import hashlib
+import threading
+from datetime import datetime, timezone
+
+
+class FakeDrive:
+    """
+    Google Drive em memória com o subconjunto da API v3 usado por download_cv
+    (files.list, files.get_media, changes.getStartPageToken e changes.list).
+    Permite testar e medir a sincronização sem rede nem credenciais:
+
+        drive = FakeDrive()
+        drive.add_file("pasta", "cv.pdf", b"...")
+        sync_changes(drive.service, "pasta", "/tmp/curriculos")
+
+    `latency` (segundos) é aplicada a cada requisição para simular a rede.
+    """
+
+    def __init__(self, page_size=100, latency=0.0):
+        self.page_size = page_size
+        self.latency = latency
+        self.files = {}
+        self.changes = []  # log de alterações: o cursor é a posição neste log
+        self.lock = threading.Lock()
+
+    # Manipulação dos arquivos (lado "servidor")
+
+    def add_file(self, folder_id, name, content, file_id=None):
+        file_id = file_id or uuid.uuid4().hex
+        with self.lock:
+            self.files[file_id] = {
+                'id': file_id,
+                'name': name,
+                'parents': [folder_id],
+                'mimeType': 'application/pdf',
+                'trashed': False,
+                'content': content,
+            }
+            self._touch(file_id)
+        return file_id
+
+    def update_file(self, file_id, content=None, name=None):
+        with self.lock:
+            if content is not None:
+                self.files[file_id]['content'] = content
+            if name is not None:
+                self.files[file_id]['name'] = name
+            self._touch(file_id)
+
+    def trash_file(self, file_id):
+        with self.lock:
+            self.files[file_id]['trashed'] = True
+            self._touch(file_id)
+
+    def delete_file(self, file_id):
+        with self.lock:
+            del self.files[file_id]
+            self.changes.append({'fileId': file_id, 'removed': True})
+
+    def _touch(self, file_id):
+        self.files[file_id]['modifiedTime'] = datetime.now(timezone.utc).isoformat()
+        self.changes.append({'fileId': file_id, 'removed': False})
+
+    def metadata(self, file_id):
+        file = self.files[file_id]
+        content = file['content']
+        return {
+            'id': file['id'],
+            'name': file['name'],
+            'parents': list(file['parents']),
+            'mimeType': file['mimeType'],
+            'trashed': file['trashed'],
+            'modifiedTime': file['modifiedTime'],
+            'size': str(len(content)),
+            'md5Checksum': hashlib.md5(content).hexdigest(),
+        }
+
+    # API (lado "cliente")
+
+    def service(self):
+        """Fábrica de serviços, no formato esperado por sync_folder/sync_changes."""
+        return FakeService(self)
+
+    def wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+
+class FakeRequest:
+    def __init__(self, drive, handler):
+        self.drive = drive
+        self.handler = handler
+
+    def execute(self):
+        self.drive.wait()
+        with self.drive.lock:
+            return self.handler()
+
+
+class FakeResponse(dict):
+    """Resposta HTTP no formato do httplib2 (dict de cabeçalhos + status)."""
+
+    def __init__(self, status, headers):
+        super().__init__(headers)
+        self.status = status
+        self.reason = "OK" if status < 400 else "Error"
+
+
+class FakeHttp:
+    """Cliente HTTP usado pelo MediaIoBaseDownload; responde a requisições com Range."""
+
+    def __init__(self, drive):
+        self.drive = drive
+
+    def request(self, uri, method="GET", headers=None, **kwargs):
+        self.drive.wait()
+        file_id = uri.rsplit('/', 1)[-1].split('?')[0]
+        with self.drive.lock:
+            file = self.drive.files.get(file_id)
+            content = file['content'] if file else None
+        if content is None:
+            return FakeResponse(404, {}), b"Not Found"
+        total = len(content)
+        match = re.match(r"bytes=(\d+)-(\d+)", (headers or {}).get('range', ''))
+        if not match:
+            return FakeResponse(200, {'content-length': str(total)}), content
+        start, end = int(match.group(1)), min(int(match.group(2)), total - 1)
+        if start >= total:
+            return FakeResponse(416, {'content-range': f"bytes */{total}"}), b""
+        return FakeResponse(206, {'content-range': f"bytes {start}-{end}/{total}"}), content[start:end + 1]
+
+
+class FakeMediaRequest:
+    def __init__(self, drive, file_id):
+        self.http = FakeHttp(drive)
+        self.uri = f"https://fake-drive.local/drive/v3/files/{file_id}?alt=media"
+        self.headers = {}
+
+
+class FakeFiles:
+    def __init__(self, drive):
+        self.drive = drive
+
+    def list(self, q="", fields=None, pageSize=None, pageToken=None, **kwargs):
+        def handler():
+            match = re.search(r"'([^']+)' in parents", q)
+            folder_id = match.group(1) if match else None
+            include_trashed = "trashed = false" not in q
+            ids = sorted(
+                file_id for file_id, file in self.drive.files.items()
+                if (folder_id is None or folder_id in file['parents'])
+                and (include_trashed or not file['trashed'])
+            )
+            size = min(pageSize or self.drive.page_size, self.drive.page_size)
+            start = int(pageToken or 0)
+            response = {'files': [self.drive.metadata(file_id) for file_id in ids[start:start + size]]}
+            if start + size < len(ids):
+                response['nextPageToken'] = str(start + size)
+            return response
+
+        return FakeRequest(self.drive, handler)
+
+    def get_media(self, fileId, **kwargs):
+        return FakeMediaRequest(self.drive, fileId)
+
+
+class FakeChanges:
+    def __init__(self, drive):
+        self.drive = drive
+
+    def getStartPageToken(self, **kwargs):
+        return FakeRequest(self.drive, lambda: {'startPageToken': str(len(self.drive.changes))})
+
+    def list(self, pageToken, pageSize=None, includeRemoved=True, **kwargs):
+        def handler():
+            start = int(pageToken)
+            size = min(pageSize or self.drive.page_size, self.drive.page_size)
+            changes = []
+            for change in self.drive.changes[start:start + size]:
+                change = dict(change)
+                if not change['removed'] and change['fileId'] in self.drive.files:
+                    change['file'] = self.drive.metadata(change['fileId'])
+                elif not change['removed']:
+                    change['removed'] = True
+                if change['removed'] and not includeRemoved:
+                    continue
+                changes.append(change)
+            response = {'changes': changes}
+            if start + size < len(self.drive.changes):
+                response['nextPageToken'] = str(start + size)
+            else:
+                response['newStartPageToken'] = str(len(self.drive.changes))
+            return response
+
+        return FakeRequest(self.drive, handler)
+
+
+class FakeService:
+    def __init__(self, drive):
+        self.drive = drive
+
+    def files(self):
+        return FakeFiles(self.drive)
+
+    def changes(self):
+        return FakeChanges(self.drive)
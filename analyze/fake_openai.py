@@ -0,0 +1,320 @@
+import re
+import json
+import time
+import uuid
+import email
+import random
+import logging
+import argparse
+import threading
+from email.policy import HTTP
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Servidor local que imita o subconjunto da API da OpenAI usado pelo OpenAIClient
+# (chat completions, files e batches). Permite testar e medir o pipeline sem rede
+# nem custo:
+#
+#   server = FakeOpenAIServer().start()
+#   os.environ["OPENAI_BASE_URL"] = server.base_url   # lido pelo cliente da OpenAI
+#   ...
+#   server.stop()
+#
+# Ou em outro terminal: python fake_openai.py --port 8765
+
+
+class FakeHTTPServer(ThreadingHTTPServer):
+    # Fila de conexões maior que o padrão (5): o pipeline abre dezenas de chamadas simultâneas
+    request_queue_size = 256
+    daemon_threads = True
+
+
+def estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+
+def fake_content(body):
+    """Resposta plausível para cada prompt do OpenAIClient, reconhecido pelas instruções."""
+    messages = body.get("messages") or []
+    prompt = "\n".join(str(message.get("content", "")) for message in messages)
+    cv = str(messages[-1].get("content", "")) if messages else ""
+    words = re.findall(r"[a-zà-ú]{4,}", cv.lower())[:8] or ["candidato"]
+
+    if (body.get("response_format") or {}).get("type") == "json_schema":
+        return json.dumps({
+            "name": "Candidato Exemplo",
+            "experience": ["Experiência em " + " ".join(words[:3])],
+            "skills": [word.capitalize() for word in words[:4]],
+            "education": ["Graduação em Administração"],
+            "languages": ["Português", "Inglês"],
+            "opnion": "# Pontos de Alinhamento\nPerfil compatível.\n# Pontos de Desalinhamento\nNenhum relevante.",
+            "scores": {
+                "experience": round(random.uniform(4, 10), 1),
+                "technical_skills": round(random.uniform(4, 10), 1),
+                "education": round(random.uniform(4, 10), 1),
+                "languages": round(random.uniform(4, 10), 1),
+                "strengths": round(random.uniform(4, 10), 1),
+                "weaknesses": round(random.uniform(0, 5), 1),
+            },
+        }, ensure_ascii=False)
+    if "Pontuação Final" in prompt:
+        return f"Pontuação Final: {random.uniform(3, 10):.1f}"
+    if "Resumo de Currículo" in prompt:
+        return (
+            "```markdown\n## Nome Completo\nCandidato Exemplo\n\n"
+            f"## Experiência\nExperiência em {' '.join(words[:3])}\n\n"
+            f"## Habilidades\n{', '.join(word.capitalize() for word in words[:4])}\n\n"
+            "## Educação\nGraduação em Administração\n\n## Idiomas\nPortuguês, Inglês\n```"
+        )
+    return "# Pontos de Alinhamento\nPerfil compatível.\n\n# Pontos de Desalinhamento\nNenhum relevante."
+
+
+def malformed_content(body):
+    """Resposta que o OpenAIClient não consegue interpretar (JSON cortado ou sem a nota)."""
+    if (body.get("response_format") or {}).get("type") == "json_schema":
+        return fake_content(body)[:40]
+    return "Não foi possível avaliar o currículo com as informações disponíveis."
+
+
+def chat_completion(body, malformed=False):
+    """Objeto chat.completion no formato da API."""
+    content = malformed_content(body) if malformed else fake_content(body)
+    prompt_tokens = sum(estimate_tokens(str(message.get("content", ""))) for message in body.get("messages") or [])
+    completion_tokens = estimate_tokens(content)
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "fake"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": 0},
+        },
+    }
+
+
+class FakeOpenAIServer:
+    """
+    API da OpenAI em memória. `batch_delay` (segundos) é o tempo que um lote
+    fica "in_progress" antes de ser concluído.
+
+    Para simular a API real nos benchmarks, cada chat completion demora
+    `latency` segundos (± `latency_jitter`), uma fração `rate_limit_rate` das
+    chamadas recebe 429 com retry-after de `retry_after` segundos e uma fração
+    `malformed_rate` recebe uma resposta que não pode ser interpretada.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, batch_delay=0.0, latency=0.0, latency_jitter=0.0,
+                 rate_limit_rate=0.0, malformed_rate=0.0, retry_after=0.05):
+        self.files = {}
+        self.batches = {}
+        self.batch_delay = batch_delay
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.rate_limit_rate = rate_limit_rate
+        self.malformed_rate = malformed_rate
+        self.retry_after = retry_after
+        # Contagem das chamadas de chat atendidas, recusadas (429) e malformadas
+        self.stats = {"requests": 0, "rate_limited": 0, "malformed": 0}
+        self.lock = threading.Lock()
+        self.httpd = FakeHTTPServer((host, port), self.handler_class())
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="fake-openai", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.stop()
+
+    def count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    def respond_chat(self, body):
+        """Retorna (status, payload, cabeçalhos) de uma chamada de chat, aplicando latência e falhas simuladas."""
+        self.count("requests")
+        if self.latency or self.latency_jitter:
+            time.sleep(max(0.0, random.uniform(self.latency - self.latency_jitter, self.latency + self.latency_jitter)))
+        if random.random() < self.rate_limit_rate:
+            self.count("rate_limited")
+            error = {
+                "message": f"Rate limit reached for requests. Please try again in {self.retry_after * 1000:.0f}ms.",
+                "type": "requests",
+                "code": "rate_limit_exceeded",
+            }
+            return 429, {"error": error}, {"retry-after-ms": str(int(self.retry_after * 1000))}
+        malformed = random.random() < self.malformed_rate
+        if malformed:
+            self.count("malformed")
+        return 200, chat_completion(body, malformed), {}
+
+    # Arquivos e lotes
+
+    def add_file(self, content, filename, purpose):
+        file_id = f"file-{uuid.uuid4().hex}"
+        with self.lock:
+            self.files[file_id] = {
+                "id": file_id,
+                "object": "file",
+                "bytes": len(content),
+                "created_at": int(time.time()),
+                "filename": filename,
+                "purpose": purpose,
+                "status": "processed",
+                "content": content,
+            }
+        return self.file_object(file_id)
+
+    def file_object(self, file_id):
+        return {key: value for key, value in self.files[file_id].items() if key != "content"}
+
+    def create_batch(self, body):
+        batch_id = f"batch_{uuid.uuid4().hex}"
+        batch = {
+            "id": batch_id,
+            "object": "batch",
+            "endpoint": body["endpoint"],
+            "input_file_id": body["input_file_id"],
+            "completion_window": body.get("completion_window", "24h"),
+            "metadata": body.get("metadata"),
+            "status": "in_progress",
+            "output_file_id": None,
+            "error_file_id": None,
+            "created_at": int(time.time()),
+            "request_counts": {"total": 0, "completed": 0, "failed": 0},
+        }
+        with self.lock:
+            self.batches[batch_id] = batch
+        return batch
+
+    def batch_object(self, batch_id):
+        batch = self.batches[batch_id]
+        if batch["status"] == "in_progress" and time.time() - batch["created_at"] >= self.batch_delay:
+            self.complete_batch(batch)
+        return batch
+
+    def complete_batch(self, batch):
+        # Processar todas as requisições do arquivo de entrada de uma vez
+        lines = self.files[batch["input_file_id"]]["content"].decode("utf-8").splitlines()
+        output = []
+        for line in filter(str.strip, lines):
+            request = json.loads(line)
+            output.append(json.dumps({
+                "id": f"batch_req_{uuid.uuid4().hex}",
+                "custom_id": request["custom_id"],
+                "response": {
+                    "status_code": 200,
+                    "request_id": uuid.uuid4().hex,
+                    "body": chat_completion(request["body"]),
+                },
+                "error": None,
+            }, ensure_ascii=False))
+        output_file = self.add_file("\n".join(output).encode("utf-8"), f"{batch['id']}_output.jsonl", "batch_output")
+        batch.update({
+            "status": "completed",
+            "output_file_id": output_file["id"],
+            "completed_at": int(time.time()),
+            "request_counts": {"total": len(output), "completed": len(output), "failed": 0},
+        })
+
+    def handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                logging.debug("fake_openai: " + format % args)
+
+            def send_json(self, payload, status=200, headers=None):
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def read_body(self):
+                return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+            def do_POST(self):
+                path = self.path.split("?")[0]
+                if path.endswith("/chat/completions"):
+                    status, payload, headers = server.respond_chat(json.loads(self.read_body()))
+                    return self.send_json(payload, status, headers)
+                if path.endswith("/files"):
+                    # multipart/form-data com os campos "file" e "purpose"
+                    raw = f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + self.read_body()
+                    message = email.message_from_bytes(raw, policy=HTTP)
+                    fields = {part.get_param("name", header="content-disposition"): part for part in message.iter_parts()}
+                    file_part = fields["file"]
+                    return self.send_json(server.add_file(
+                        file_part.get_payload(decode=True),
+                        file_part.get_filename() or "upload.jsonl",
+                        fields["purpose"].get_content().strip(),
+                    ))
+                if path.endswith("/batches"):
+                    return self.send_json(server.create_batch(json.loads(self.read_body())))
+                self.send_json({"error": {"message": f"Rota não suportada: {path}"}}, status=404)
+
+            def do_GET(self):
+                path = self.path.split("?")[0]
+                match = re.search(r"/files/([^/]+)/content$", path)
+                if match and match.group(1) in server.files:
+                    data = server.files[match.group(1)]["content"]
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/octet-stream")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    return self.wfile.write(data)
+                match = re.search(r"/files/([^/]+)$", path)
+                if match and match.group(1) in server.files:
+                    return self.send_json(server.file_object(match.group(1)))
+                match = re.search(r"/batches/([^/]+)$", path)
+                if match and match.group(1) in server.batches:
+                    return self.send_json(server.batch_object(match.group(1)))
+                self.send_json({"error": {"message": f"Não encontrado: {path}"}}, status=404)
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor local que imita a API da OpenAI.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--batch-delay", type=float, default=0.0, help="Segundos até um lote ser concluído.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Segundos de espera por chamada de chat.")
+    parser.add_argument("--latency-jitter", type=float, default=0.0, help="Variação (±) da latência, em segundos.")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fração das chamadas que recebem 429.")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="Fração das respostas malformadas.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    server = FakeOpenAIServer(
+        args.host, args.port, args.batch_delay, latency=args.latency, latency_jitter=args.latency_jitter,
+        rate_limit_rate=args.rate_limit_rate, malformed_rate=args.malformed_rate,
+    )
+    print(f"API falsa da OpenAI em {server.base_url} (use OPENAI_BASE_URL={server.base_url})")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
@@ -1,24 +1,40 @@
 import re
 import uuid
 import os
+import hashlib
 import fitz
 import logging
-from io import StringIO
+from functools import lru_cache
 from models.analysis import Analysis
-import spacy
-from spacy.lang.pt.stop_words import STOP_WORDS
 from unidecode import unidecode
-from nltk.tokenize import word_tokenize
+from metrics import timed
 
 # Configuração de logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Limites de leitura dos PDFs: o texto de cada currículo vai para os prompts do LLM,
+# então o orçamento (em tokens, ~4 caracteres por token, ou em caracteres) limita o custo por CV
+CV_MAX_TOKENS = int(os.getenv("CV_MAX_TOKENS", 4000))
+CV_MAX_CHARS = int(os.getenv("CV_MAX_CHARS", CV_MAX_TOKENS * 4))
+CV_MAX_PAGES = int(os.getenv("CV_MAX_PAGES", 10))
+MIN_PAGE_CHARS = 20  # Páginas com menos texto que isso são tratadas como só imagem
+HEADER_FOOTER_LINES = 2  # Linhas do topo/rodapé comparadas entre as páginas
+
 # Carregar o modelo do spaCy para português
-try:
-    nlp = spacy.load("pt_core_news_sm")
-except OSError:
-   logging.warning("Modelo do spaCy não encontrado, baixando...")
-   spacy.cli.download("pt_core_news_sm")
-   nlp = spacy.load("pt_core_news_sm")
+# Parser e NER não são usados na normalização (lemas e stop words) e ficam desativados
+NLP_DISABLED_COMPONENTS = ["parser", "ner"]
+
+@lru_cache(maxsize=None)
+def get_nlp():
+    """Carrega o modelo pt_core_news_sm no primeiro uso (um por processo), baixando-o se necessário."""
+    import spacy
+
+    try:
+        return spacy.load("pt_core_news_sm", disable=NLP_DISABLED_COMPONENTS)
+    except OSError:
+       logging.warning("Modelo do spaCy não encontrado, baixando...")
+       spacy.cli.download("pt_core_news_sm")
+       return spacy.load("pt_core_news_sm", disable=NLP_DISABLED_COMPONENTS)
 
 def get_pdf_paths(folder_path):
     """Lista todos os arquivos PDF em um dado diretório."""
@@ -34,37 +50,115 @@ def get_pdf_paths(folder_path):
          logging.error(f"Erro ao listar arquivos PDF em {folder_path}: {e}", exc_info=True)
     return pdf_paths
 
-def read_uploaded_file(file_path):
-  """Lê e extrai o texto de um arquivo PDF."""
-  text = ""
+def file_sha256(file_path, chunk_size=1024 * 1024, data=None):
+    """Calcula o SHA-256 do conteúdo de um arquivo (fingerprint do currículo)."""
+    if data is not None:
+        # Conteúdo já em memória (ex.: recém-baixado do Drive)
+        return hashlib.sha256(data).hexdigest()
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def open_pdf(file_path, data=None):
+  """Abre um PDF do disco ou, se `data` for informado, direto dos bytes em memória."""
+  if data is not None:
+      return fitz.open(stream=data, filetype="pdf")
+  return fitz.open(file_path)
+
+def iter_pdf_pages(file_path, max_pages=CV_MAX_PAGES, data=None):
+  """Gera o texto das páginas de um PDF sob demanda, pulando páginas só com imagens."""
+  with open_pdf(file_path, data) as pdf:
+      for index, page in enumerate(pdf):
+          if max_pages and index >= max_pages:
+              logging.info(f"{file_path}: limite de {max_pages} páginas atingido.")
+              break
+          text = page.get_text()
+          if len(text.strip()) < MIN_PAGE_CHARS:
+              # Página escaneada ou decorativa: não há texto útil para o LLM
+              if page.get_images():
+                  logging.info(f"{file_path}: página {index + 1} contém apenas imagens, ignorando.")
+              continue
+          yield text
+
+def _edge_line_key(line):
+  # Números de página ("Página 2 de 5") não impedem reconhecer o cabeçalho/rodapé
+  return re.sub(r"\d+", "#", line.strip().lower())
+
+def strip_repeated_edges(pages, edge_lines=HEADER_FOOTER_LINES):
+  """Remove cabeçalhos e rodapés que se repetem nas bordas de páginas anteriores."""
+  seen = set()
+  for text in pages:
+      lines = text.splitlines()
+      filled = [i for i, line in enumerate(lines) if line.strip()]
+      edges = set(filled[:edge_lines] + filled[-edge_lines:])
+      keys = {i: _edge_line_key(lines[i]) for i in edges}
+      yield "\n".join(
+          line for i, line in enumerate(lines)
+          if i not in edges or keys[i] not in seen
+      ) + "\n"
+      seen.update(keys.values())
+
+@timed("stage_seconds", stage="pdf_read")
+def read_uploaded_file(file_path, max_chars=CV_MAX_CHARS, max_pages=CV_MAX_PAGES, data=None):
+  """Lê e extrai o texto de um arquivo PDF, parando ao atingir o orçamento de caracteres."""
+  parts = []
+  total = 0
   try:
-     with fitz.open(file_path) as pdf:
-         for page in pdf:
-             text += page.get_text()
+     for text in strip_repeated_edges(iter_pdf_pages(file_path, max_pages, data)):
+         if max_chars and total + len(text) > max_chars:
+             # Cortar no último fim de linha dentro do orçamento e parar de ler o PDF
+             remaining = text[:max_chars - total]
+             cut = remaining.rfind("\n")
+             parts.append(remaining[:cut] if cut > 0 else remaining)
+             logging.info(f"{file_path}: texto truncado em {max_chars} caracteres.")
+             break
+         parts.append(text)
+         total += len(text)
   except Exception as e:
       logging.error(f"Erro ao ler o arquivo PDF {file_path}: {e}", exc_info=True)
       return ""
-  return text
+  return "".join(parts)
 
+@timed("stage_seconds", stage="format_cv")
 def format_cv(text):
     """Remove stop words, pontuações, etc, e coloca o texto em caixa baixa."""
     try:
         if not text:
             logging.warning("O texto do currículo está vazio.")
             return ""
-        doc = nlp(text)
-        tokens = [
-            token.lemma_.lower()
-            for token in doc
-            if token.is_alpha and not token.is_stop
-        ]
-        formatted_text = " ".join(tokens)
-        formatted_text = unidecode(formatted_text) # remove acentos
-        return formatted_text
+        return normalize_doc(get_nlp()(text))
     except Exception as e:
         logging.error(f"Erro ao formatar texto do currículo: {e}", exc_info=True)
         return ""
 
+def normalize_doc(doc):
+    """Converte um Doc do spaCy em lemas minúsculos, sem stop words e sem acentos."""
+    tokens = [
+        token.lemma_.lower()
+        for token in doc
+        if token.is_alpha and not token.is_stop
+    ]
+    formatted_text = " ".join(tokens)
+    formatted_text = unidecode(formatted_text) # remove acentos
+    return formatted_text
+
+@timed("stage_seconds", stage="format_cvs")
+def format_cvs(texts, nlp_model=None, batch_size=16):
+    """Versão em lote do format_cv, usando nlp.pipe."""
+    nlp_model = nlp_model or get_nlp()
+    formatted = [""] * len(texts)
+    indexes = [i for i, text in enumerate(texts) if text]
+    try:
+        docs = nlp_model.pipe((texts[i] for i in indexes), batch_size=batch_size)
+        for i, doc in zip(indexes, docs):
+            formatted[i] = normalize_doc(doc)
+    except Exception as e:
+        logging.error(f"Erro ao formatar textos dos currículos: {e}", exc_info=True)
+        return [format_cv(text) for text in texts]
+    return formatted
+
 def extract_data_analysis(resum_cv, original_cv, job_id, resum_id, score) -> Analysis:
     secoes_dict = {
         "id": str(uuid.uuid4()),
@@ -137,4 +231,17 @@ def extract_data_analysis(resum_cv, original_cv, job_id, resum_id, score) -> Ana
             else:
                 secoes_dict[key] = []
 
-    return Analysis(**secoes_dict)
\ No newline at end of file
+    return Analysis(**secoes_dict)
+
+def analysis_from_evaluation(evaluation, job_id, resum_id) -> Analysis:
+    """Monta a Analysis a partir da resposta estruturada (CVEvaluation) do LLM."""
+    return Analysis(
+        id=str(uuid.uuid4()),
+        job_id=job_id,
+        resum_id=resum_id,
+        name=evaluation.name.strip() or "Nome não encontrado",
+        skills=[item.strip() for item in evaluation.skills if item.strip()],
+        education=[item.strip() for item in evaluation.education if item.strip()],
+        languages=[item.strip() for item in evaluation.languages if item.strip()],
+        score=evaluation.scores.final_score(),
+    )
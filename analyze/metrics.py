@@ -0,0 +1,280 @@
+import os
+import json
+import time
+import bisect
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+
+# Métricas do pipeline em memória (por processo): histogramas de latência por etapa,
+# contadores de tokens, tentativas e currículos, e custo estimado por currículo.
+# Exportáveis em texto do Prometheus (to_prometheus) ou JSON (to_json).
+
+# Limites dos buckets de latência, em segundos
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+# Limites dos buckets de custo por currículo, em dólares
+COST_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+
+# Preço por milhão de tokens (entrada, saída) em dólares; tokens de entrada em cache custam metade.
+# MODEL_PRICES='{"gpt-4o-mini": [0.15, 0.6]}' sobrescreve ou acrescenta modelos.
+MODEL_PRICES = {
+    "gpt-3.5-turbo": (0.5, 1.5),
+    "gpt-4o-mini": (0.15, 0.6),
+    "gpt-4o": (2.5, 10.0),
+}
+MODEL_PRICES.update({model: tuple(prices) for model, prices in json.loads(os.getenv("MODEL_PRICES", "{}")).items()})
+CACHED_INPUT_DISCOUNT = 0.5
+# Requisições da Batch API custam metade do preço normal
+BATCH_DISCOUNT = 0.5
+
+METRIC_PREFIX = "cv_analysis_"
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # o último é o bucket +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        # Estimativa por interpolação linear dentro do bucket, como o histogram_quantile do Prometheus
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            if cumulative + count >= rank and count:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                if index == len(self.buckets):
+                    return lower
+                return lower + (self.buckets[index] - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other["counts"])]
+        self.count += other["count"]
+        self.sum += other["sum"]
+
+    def state(self):
+        return {"buckets": list(self.buckets), "counts": list(self.counts), "count": self.count, "sum": self.sum}
+
+
+class MetricsRegistry:
+    """
+    Registro de contadores e histogramas com rótulos, seguro entre threads.
+    Cada série é identificada pelo nome e pelos rótulos (dict).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    @staticmethod
+    def key(name, labels):
+        return name, tuple(sorted((labels or {}).items()))
+
+    def inc(self, name, value=1, **labels):
+        key = self.key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        key = self.key(name, labels)
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram(buckets)
+            self.histograms[key].observe(value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def drain(self):
+        """Retorna o estado serializável e zera o registro (usado para trazer as métricas dos workers)."""
+        with self.lock:
+            state = {
+                "counters": [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+                "histograms": [[name, list(labels), histogram.state()] for (name, labels), histogram in self.histograms.items()],
+            }
+            self.counters, self.histograms = {}, {}
+        return state
+
+    def merge(self, state):
+        """Soma ao registro um estado obtido com drain() em outro processo."""
+        with self.lock:
+            for name, labels, value in state["counters"]:
+                key = (name, tuple(tuple(label) for label in labels))
+                self.counters[key] = self.counters.get(key, 0) + value
+            for name, labels, histogram_state in state["histograms"]:
+                key = (name, tuple(tuple(label) for label in labels))
+                if key not in self.histograms:
+                    self.histograms[key] = Histogram(histogram_state["buckets"])
+                self.histograms[key].merge(histogram_state)
+
+    def reset(self):
+        with self.lock:
+            self.counters, self.histograms = {}, {}
+
+    def counter_total(self, name, **labels):
+        # Soma das séries do contador que têm os rótulos informados
+        with self.lock:
+            return sum(
+                value for (counter_name, counter_labels), value in self.counters.items()
+                if counter_name == name and set(labels.items()) <= set(counter_labels)
+            )
+
+    def to_json(self):
+        """Métricas em dict: contadores e histogramas com contagem, soma, p50 e p95."""
+        with self.lock:
+            return {
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(self.counters.items())
+                ],
+                "histograms": [
+                    {
+                        "name": name,
+                        "labels": dict(labels),
+                        "count": histogram.count,
+                        "sum": histogram.sum,
+                        "p50": histogram.quantile(0.5),
+                        "p95": histogram.quantile(0.95),
+                    }
+                    for (name, labels), histogram in sorted(self.histograms.items())
+                ],
+            }
+
+    def to_prometheus(self):
+        """Métricas no formato de texto de exposição do Prometheus."""
+        def format_labels(labels, extra=()):
+            pairs = [f'{key}="{value}"' for key, value in (*labels, *extra)]
+            return "{" + ",".join(pairs) + "}" if pairs else ""
+
+        lines = []
+        with self.lock:
+            declared = set()
+            for (name, labels), value in sorted(self.counters.items()):
+                metric = METRIC_PREFIX + name
+                if metric not in declared:
+                    lines.append(f"# TYPE {metric} counter")
+                    declared.add(metric)
+                lines.append(f"{metric}{format_labels(labels)} {value}")
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                metric = METRIC_PREFIX + name
+                if metric not in declared:
+                    lines.append(f"# TYPE {metric} histogram")
+                    declared.add(metric)
+                cumulative = 0
+                for bound, count in zip((*histogram.buckets, "+Inf"), histogram.counts):
+                    cumulative += count
+                    lines.append(f"{metric}_bucket{format_labels(labels, [('le', bound)])} {cumulative}")
+                lines.append(f"{metric}_sum{format_labels(labels)} {histogram.sum}")
+                lines.append(f"{metric}_count{format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """Resumo para exibição: latência por etapa, tokens e custo."""
+        data = self.to_json()
+        stages = [
+            {
+                "etapa": histogram["name"] + "".join(f" {value}" for value in histogram["labels"].values()),
+                "n": histogram["count"],
+                "p50 (s)": round(histogram["p50"], 3),
+                "p95 (s)": round(histogram["p95"], 3),
+                "total (s)": round(histogram["sum"], 1),
+            }
+            for histogram in data["histograms"]
+            if histogram["name"].endswith("_seconds")
+        ]
+        cvs = self.counter_total("cvs_total", status="success")
+        cost = self.counter_total("llm_cost_usd_total")
+        return {
+            "stages": stages,
+            "cvs": cvs,
+            "prompt_tokens": self.counter_total("llm_tokens_total", type="prompt"),
+            "cached_tokens": self.counter_total("llm_tokens_total", type="cached"),
+            "completion_tokens": self.counter_total("llm_tokens_total", type="completion"),
+            "retries": self.counter_total("llm_retries_total"),
+            "cost_usd": cost,
+            "cost_per_cv_usd": cost / cvs if cvs else 0.0,
+        }
+
+    def write(self, path):
+        """Grava as métricas em `path`: texto do Prometheus para .prom/.txt, JSON nos demais casos."""
+        with open(path, "w", encoding="utf-8") as f:
+            if path.endswith((".prom", ".txt")):
+                f.write(self.to_prometheus())
+            else:
+                json.dump(self.to_json(), f, ensure_ascii=False, indent=2)
+
+
+# Registro global do processo
+registry = MetricsRegistry()
+
+# Custo acumulado do currículo em processamento (compartilhado pelas chamadas do gather)
+current_cv_cost = contextvars.ContextVar("current_cv_cost", default=None)
+
+
+def timed(name, **labels):
+    """Decorador que registra a duração da função no histograma `name`."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with registry.timer(name, **labels):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def request_cost(model_id, prompt_tokens, completion_tokens, cached_tokens=0, batch=False):
+    """Custo estimado em dólares de uma chamada, pela tabela MODEL_PRICES."""
+    prices = MODEL_PRICES.get(model_id)
+    if prices is None:
+        # Modelos com data no nome (ex.: gpt-4o-mini-2024-07-18) usam o preço do modelo base
+        prices = next((value for model, value in MODEL_PRICES.items() if model_id.startswith(model)), (0.0, 0.0))
+    input_price, output_price = prices
+    uncached = prompt_tokens - cached_tokens
+    cost = (
+        uncached * input_price
+        + cached_tokens * input_price * CACHED_INPUT_DISCOUNT
+        + completion_tokens * output_price
+    ) / 1_000_000
+    return cost * BATCH_DISCOUNT if batch else cost
+
+
+def record_llm_usage(model_id, prompt, prompt_tokens, completion_tokens, cached_tokens=0, batch=False):
+    """Registra tokens e custo de uma chamada e soma o custo ao currículo em processamento."""
+    registry.inc("llm_tokens_total", prompt_tokens, model=model_id, prompt=prompt, type="prompt")
+    registry.inc("llm_tokens_total", cached_tokens, model=model_id, prompt=prompt, type="cached")
+    registry.inc("llm_tokens_total", completion_tokens, model=model_id, prompt=prompt, type="completion")
+    cost = request_cost(model_id, prompt_tokens, completion_tokens, cached_tokens, batch)
+    registry.inc("llm_cost_usd_total", cost, model=model_id)
+    accumulator = current_cv_cost.get()
+    if accumulator is not None:
+        accumulator[0] += cost
+    return cost
+
+
+@contextmanager
+def track_cv_cost():
+    """Acumula o custo das chamadas feitas dentro do bloco; o total fica em `cost[0]`."""
+    cost = [0.0]
+    token = current_cv_cost.set(cost)
+    try:
+        yield cost
+    finally:
+        current_cv_cost.reset(token)
+        registry.observe("cv_cost_usd", cost[0], buckets=COST_BUCKETS)
@@ -0,0 +1,11 @@
+from pydantic import BaseModel
+from typing import Optional
+
+
+class CVArtifact(BaseModel):
+    """Dados de um currículo que não dependem da vaga, indexados pelo SHA-256 do PDF."""
+    sha256: str
+    text: str  # texto extraído do PDF
+    formatted_text: str  # saída do format_cv
+    summary: Optional[str] = None  # resumo em Markdown do resume_cv
+    summary_version: Optional[str] = None  # versão dos prompts e modelo que geraram o resumo
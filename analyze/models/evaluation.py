@@ -0,0 +1,58 @@
+from pydantic import BaseModel, ConfigDict
+from typing import List
+
+# Pesos dos critérios de pontuação (os mesmos do prompt do generate_score)
+SCORE_WEIGHTS = {
+    "experience": 0.30,
+    "technical_skills": 0.25,
+    "education": 0.10,
+    "languages": 0.10,
+    "strengths": 0.15,
+}
+WEAKNESSES_MAX_DISCOUNT = 0.10
+
+
+class CVScores(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    experience: float
+    technical_skills: float
+    education: float
+    languages: float
+    strengths: float
+    weaknesses: float
+
+    def final_score(self) -> float:
+        # Notas de 0 a 10; a média ponderada é normalizada para 10 e os pontos fracos descontam até 10%
+        def clamp(value):
+            return min(max(value, 0.0), 10.0)
+
+        weighted = sum(clamp(getattr(self, key)) * weight for key, weight in SCORE_WEIGHTS.items())
+        score = weighted / sum(SCORE_WEIGHTS.values())
+        score -= clamp(self.weaknesses) * WEAKNESSES_MAX_DISCOUNT
+        return round(clamp(score), 1)
+
+
+class CVEvaluation(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    name: str
+    experience: List[str]
+    skills: List[str]
+    education: List[str]
+    languages: List[str]
+    opnion: str
+    scores: CVScores
+
+    def to_markdown(self) -> str:
+        # Mesmo formato de seções gerado pelo resume_cv
+        def section(title, items):
+            return f"## {title}\n" + "\n".join(f"- {item}" for item in items) + "\n"
+
+        return "\n".join([
+            f"## Nome Completo\n{self.name}\n",
+            section("Experiência", self.experience),
+            section("Habilidades", self.skills),
+            section("Educação", self.education),
+            section("Idiomas", self.languages),
+        ])
@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+from typing import Optional
 
 
 class Resum(BaseModel):
@@ -6,4 +7,5 @@ class Resum(BaseModel):
     job_id: str
     content: str
     opnion: str
-    file: str
\ No newline at end of file
+    file: str
+    file_hash: Optional[str] = None  # SHA-256 do conteúdo do PDF
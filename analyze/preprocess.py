@@ -0,0 +1,96 @@
+import os
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from helper import read_uploaded_file, format_cvs
+from metrics import registry as metrics
+
+# Configurações da etapa de CPU (leitura dos PDFs + normalização com spaCy)
+PREPROCESS_WORKERS = int(os.getenv("PREPROCESS_WORKERS", os.cpu_count() or 1))
+PREPROCESS_CHUNK_SIZE = int(os.getenv("PREPROCESS_CHUNK_SIZE", 8))
+
+
+def preprocess_chunk(items):
+    """
+    Lê e normaliza um lote de currículos dentro de um worker. Cada processo do
+    pool usa o seu próprio modelo do spaCy, e o lote inteiro passa por um único
+    nlp.pipe.
+
+    items: lista de (path, sha256, data), onde `data` são os bytes do PDF já em
+    memória ou None para ler do disco. Retorna ([(path, content, formatted_content, sha256)], métricas),
+    onde `métricas` são as medições feitas no worker (a somar ao registro do processo
+    principal com metrics.merge) ou None quando o lote rodou no próprio processo.
+    """
+    contents = [read_uploaded_file(path, data=data) for path, _, data in items]
+    formatted = format_cvs(contents)
+    results = [
+        (path, content, formatted_content, sha256)
+        for (path, sha256, _), content, formatted_content in zip(items, contents, formatted)
+    ]
+    in_worker = multiprocessing.parent_process() is not None
+    return results, metrics.drain() if in_worker else None
+
+
+class Preprocessor:
+    """
+    Executa a etapa de CPU em um pool de processos, à frente da etapa de rede.
+    Os resultados são colocados em uma asyncio.Queue consumida pelos workers do LLM.
+    Com `workers=0` a etapa roda em uma thread do processo atual.
+    """
+
+    def __init__(self, workers=PREPROCESS_WORKERS, chunk_size=PREPROCESS_CHUNK_SIZE):
+        self.workers = workers
+        self.chunk_size = max(1, chunk_size)
+
+    async def feed(self, items, queue, on_failure=None):
+        """
+        Processa `items` (async iterável de (path, sha256, data)) e envia os resultados para `queue`.
+        Cada lote vai para a fila assim que termina, sem esperar pelos próximos itens da
+        fonte (que, no streaming do Drive, chegam conforme os downloads terminam).
+        Se um lote inteiro falhar no pool, `on_failure(path, sha256, erro)` é chamado para cada currículo do lote.
+        """
+        loop = asyncio.get_running_loop()
+        executor = ProcessPoolExecutor(max_workers=self.workers) if self.workers > 0 else None
+        # No máximo dois lotes por worker em andamento, para limitar a memória
+        slots = asyncio.Semaphore(max(1, self.workers) * 2)
+        in_flight = set()
+
+        async def forward(chunk):
+            try:
+                try:
+                    results, worker_metrics = await loop.run_in_executor(executor, preprocess_chunk, chunk)
+                except Exception as e:
+                    logging.error(f"Erro ao pré-processar lote de {len(chunk)} currículos: {e}", exc_info=True)
+                    if on_failure is not None:
+                        for path, sha256, _ in chunk:
+                            on_failure(path, sha256, e)
+                    return
+                if worker_metrics:
+                    metrics.merge(worker_metrics)
+                for result in results:
+                    await queue.put(result)
+            finally:
+                slots.release()
+
+        async def submit(chunk):
+            await slots.acquire()
+            task = asyncio.create_task(forward(chunk))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+
+        try:
+            chunk = []
+            async for item in items:
+                chunk.append(item)
+                if len(chunk) >= self.chunk_size:
+                    await submit(chunk)
+                    chunk = []
+            if chunk:
+                await submit(chunk)
+            await asyncio.gather(*in_flight)
+        finally:
+            for task in in_flight:
+                task.cancel()
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,91 @@
+import os
+import logging
+from collections import Counter
+import numpy as np
+from helper import format_cv
+
+# Triagem local antes do LLM: ranking BM25 do texto normalizado (format_cv) de
+# cada currículo contra os campos da vaga. Só os melhores seguem para a OpenAI.
+PRESCREEN_TOP_K = int(os.getenv("PRESCREEN_TOP_K", 0))  # 0 = sem limite de quantidade
+# Nota mínima relativa ao melhor currículo do lote (0 a 1); 0 = sem corte
+PRESCREEN_THRESHOLD = float(os.getenv("PRESCREEN_THRESHOLD", 0))
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Peso de cada campo da vaga na consulta
+JOB_FIELD_WEIGHTS = {
+    "main_activities": 1.0,
+    "prerequisites": 1.5,
+    "differentials": 0.5,
+}
+
+
+def job_query(job):
+    """Termos normalizados da vaga com o peso de cada um (soma dos pesos dos campos em que aparecem)."""
+    weights = Counter()
+    for field, weight in JOB_FIELD_WEIGHTS.items():
+        for term in set(format_cv(job.get(field) or "").split()):
+            weights[term] += weight
+    return weights
+
+
+def bm25_scores(documents, query, k1=BM25_K1, b=BM25_B):
+    """
+    Nota BM25 de cada documento (texto já normalizado) para a consulta
+    {termo: peso}. Só os termos da consulta entram na matriz, de modo que o
+    custo é proporcional a currículos x termos da vaga.
+    """
+    terms = list(query)
+    if not documents or not terms:
+        return np.zeros(len(documents))
+    index = {term: i for i, term in enumerate(terms)}
+    frequencies = np.zeros((len(documents), len(terms)), dtype=np.float32)
+    lengths = np.zeros(len(documents), dtype=np.float32)
+    for row, document in enumerate(documents):
+        tokens = document.split()
+        lengths[row] = len(tokens)
+        for term, count in Counter(token for token in tokens if token in index).items():
+            frequencies[row, index[term]] = count
+
+    # IDF com suavização (sempre positivo), calculado sobre o próprio lote
+    document_frequency = (frequencies > 0).sum(axis=0)
+    idf = np.log1p((len(documents) - document_frequency + 0.5) / (document_frequency + 0.5))
+    average_length = lengths.mean() or 1.0
+    norm = k1 * (1 - b + b * lengths / average_length)
+    saturated = frequencies * (k1 + 1) / (frequencies + norm[:, None])
+    weights = np.array([query[term] for term in terms], dtype=np.float32)
+    return saturated @ (idf * weights)
+
+
+def select_candidates(scores, top_k=0, threshold=0.0):
+    """Máscara dos currículos aprovados: os `top_k` melhores e/ou com nota >= threshold x melhor nota."""
+    selected = np.ones(len(scores), dtype=bool)
+    if len(scores) == 0:
+        return selected
+    if threshold > 0:
+        selected &= scores >= threshold * scores.max()
+    if 0 < top_k < len(scores):
+        # Ordenação estável: em caso de empate, vale a ordem de chegada
+        ranking = np.argsort(-scores, kind="stable")
+        in_top_k = np.zeros(len(scores), dtype=bool)
+        in_top_k[ranking[:top_k]] = True
+        selected &= in_top_k
+    return selected
+
+
+def prescreen(job, items, top_k=PRESCREEN_TOP_K, threshold=PRESCREEN_THRESHOLD):
+    """
+    Separa os currículos pré-processados (path, content, formatted_content, sha256)
+    em aprovados e descartados. Retorna (aprovados, [(item, nota), ...] descartados),
+    com os aprovados em ordem decrescente de nota.
+    """
+    scores = bm25_scores([item[2] for item in items], job_query(job))
+    selected = select_candidates(scores, top_k=top_k, threshold=threshold)
+    order = np.argsort(-scores, kind="stable")
+    approved = [items[i] for i in order if selected[i]]
+    filtered = [(items[i], float(scores[i])) for i in order if not selected[i]]
+    logging.info(
+        f"Triagem: {len(approved)} de {len(items)} currículos seguem para o LLM "
+        f"(top_k={top_k}, threshold={threshold})."
+    )
+    return approved, filtered
@@ -0,0 +1,176 @@
+import re
+import time
+import math
+import asyncio
+import logging
+import threading
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken é opcional; sem ele usamos uma estimativa por caracteres
+    tiktoken = None
+
+# Tokens reservados para a resposta quando não sabemos o tamanho do output
+DEFAULT_COMPLETION_TOKENS = 512
+
+
+def estimate_tokens(text, model_id="gpt-3.5-turbo"):
+    """Estima a quantidade de tokens de um texto antes de enviá-lo à API."""
+    if not text:
+        return 0
+    if tiktoken is not None:
+        try:
+            return len(tiktoken.encoding_for_model(model_id).encode(text))
+        except KeyError:
+            pass
+    # Aproximação usada pela OpenAI: ~4 caracteres por token
+    return math.ceil(len(text) / 4)
+
+
+def parse_duration(value):
+    """Converte durações como '1s', '6m0s', '120ms' ou '0.5' para segundos."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    total = 0.0
+    matches = re.findall(r"([\d.]+)(ms|h|m|s)", value)
+    if not matches:
+        return None
+    for number, unit in matches:
+        number = float(number)
+        if unit == "ms":
+            total += number / 1000
+        elif unit == "s":
+            total += number
+        elif unit == "m":
+            total += number * 60
+        elif unit == "h":
+            total += number * 3600
+    return total
+
+
+def parse_retry_after(headers=None, message=""):
+    """Extrai o tempo de espera de um erro 429 (cabeçalhos ou mensagem)."""
+    if headers:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        retry_after = parse_duration(headers.get("retry-after"))
+        if retry_after is not None:
+            return retry_after
+    match = re.search(r"Please try again in ([\d.]+(?:ms|s|m))", message or "")
+    if match:
+        return parse_duration(match.group(1))
+    return None
+
+
+class TokenBucket:
+    """Balde de tokens com reposição contínua e reservas que podem ficar negativas."""
+
+    def __init__(self, capacity, period=60.0):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / period
+        self.period = period
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def reserve(self, amount, now):
+        """Reserva `amount` e retorna quantos segundos o chamador deve esperar."""
+        self._refill(now)
+        self.tokens -= amount
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+    def refund(self, amount, now):
+        self._refill(now)
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+    def set_capacity(self, capacity):
+        if capacity and capacity != self.capacity:
+            self.capacity = float(capacity)
+            self.rate = self.capacity / self.period
+
+    def sync_remaining(self, remaining, reset_seconds, now):
+        """Alinha o saldo local ao informado pelo servidor, quando ele for menor."""
+        self._refill(now)
+        if remaining < self.tokens:
+            self.tokens = float(remaining)
+        if reset_seconds and remaining <= 0:
+            # O servidor só libera a cota após o reset; não deixar o saldo subir antes
+            self.tokens = min(self.tokens, -reset_seconds * self.rate)
+
+
+class RateLimiter:
+    """
+    Limitador de requisições por minuto (RPM) e tokens por minuto (TPM) no lado
+    do cliente. As chamadas reservam cota antes de ir à API; os cabeçalhos
+    x-ratelimit-* das respostas e os erros 429 ajustam o saldo local.
+    """
+
+    def __init__(self, rpm, tpm):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def reserve(self, tokens):
+        with self.lock:
+            now = time.monotonic()
+            # Uma requisição maior que a cota inteira nunca seria liberada
+            tokens = min(tokens, self.tokens.capacity)
+            wait = max(self.requests.reserve(1, now), self.tokens.reserve(tokens, now))
+            return max(wait, self.paused_until - now)
+
+    def acquire(self, tokens):
+        """Bloqueia a thread atual até haver cota para a requisição."""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            logging.debug(f"Rate limiter: aguardando {wait:.2f}s")
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens):
+        """Versão assíncrona do acquire; não bloqueia o event loop."""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            logging.debug(f"Rate limiter: aguardando {wait:.2f}s")
+            await asyncio.sleep(wait)
+
+    def record_usage(self, reserved_tokens, used_tokens):
+        """Corrige o saldo de tokens com o consumo real informado em response.usage."""
+        if used_tokens is None:
+            return
+        with self.lock:
+            now = time.monotonic()
+            difference = reserved_tokens - used_tokens
+            if difference > 0:
+                self.tokens.refund(difference, now)
+            elif difference < 0:
+                self.tokens.reserve(-difference, now)
+
+    def update_from_headers(self, headers):
+        """Ajusta os baldes a partir dos cabeçalhos x-ratelimit-* da OpenAI."""
+        if not headers:
+            return
+        with self.lock:
+            now = time.monotonic()
+            for bucket, kind in ((self.requests, "requests"), (self.tokens, "tokens")):
+                limit = headers.get(f"x-ratelimit-limit-{kind}")
+                remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+                if limit:
+                    bucket.set_capacity(float(limit))
+                if remaining is not None:
+                    reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+                    bucket.sync_remaining(float(remaining), reset, now)
+
+    def penalize(self, seconds):
+        """Pausa todas as chamadas após um 429, em vez de cada uma dormir sozinha."""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
@@ -0,0 +1,32 @@
+import os
+from functools import lru_cache
+
+# Recursos pesados (banco, clientes da OpenAI) criados sob demanda, uma vez por processo.
+# Os imports ficam dentro das funções para não pesar na inicialização de quem só importa o módulo.
+
+DEFAULT_MODEL = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+# Modelo do modo combinado; structured outputs exige suporte a JSON schema
+STRUCTURED_MODEL = os.getenv("OPENAI_STRUCTURED_MODEL", "gpt-4o-mini")
+# Arquivo do banco SQLite (o benchmark usa um banco próprio, fora do de produção)
+DATABASE_PATH = os.getenv("DATABASE_PATH", "db.sqlite3")
+
+
+@lru_cache(maxsize=None)
+def get_database():
+    """Retorna a instância compartilhada do AnalyzeDatabase."""
+    from database import AnalyzeDatabase
+    return AnalyzeDatabase(DATABASE_PATH)
+
+
+@lru_cache(maxsize=None)
+def get_ai(model_id=DEFAULT_MODEL):
+    """Retorna o OpenAIClient compartilhado do modelo informado."""
+    from ai import OpenAIClient
+    return OpenAIClient(model_id=model_id)
+
+
+@lru_cache(maxsize=None)
+def get_runner():
+    """Retorna o AnalysisRunner compartilhado (análises em segundo plano)."""
+    from runner import AnalysisRunner
+    return AnalysisRunner()
@@ -0,0 +1,149 @@
+import os
+import time
+import random
+import logging
+import threading
+from openai import (
+    APIConnectionError,
+    APIStatusError,
+    APITimeoutError,
+    RateLimitError,
+)
+from metrics import registry as metrics
+
+# Política única de novas tentativas das chamadas ao LLM
+RETRY_MAX_ATTEMPTS = int(os.getenv("LLM_RETRY_MAX_ATTEMPTS", 6))
+RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", 1))  # segundos
+RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", 60))  # teto de cada espera
+# Tempo máximo de uma chamada, somando todas as tentativas e esperas
+LLM_CALL_DEADLINE = float(os.getenv("LLM_CALL_DEADLINE", 180))
+# Tempo máximo de uma requisição HTTP isolada
+LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", 60))
+# Espera quando o 429 não informa o tempo
+DEFAULT_RATE_LIMIT_WAIT = 5
+
+# Circuit breaker: falhas seguidas do provedor (5xx, timeouts, conexão) que pausam
+# todas as chamadas e por quanto tempo, antes de uma chamada de teste
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("LLM_CIRCUIT_FAILURE_THRESHOLD", 5))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("LLM_CIRCUIT_RESET_TIMEOUT", 30))
+# Intervalo em que as chamadas aguardam o resultado da chamada de teste
+CIRCUIT_PROBE_WAIT = 1.0
+
+
+def classify_error(error):
+    """
+    Tipo do erro para a política de novas tentativas: "rate_limit", "server_error",
+    "timeout" ou "connection"; None para erros que não adianta repetir (ex.: 400, 401).
+    """
+    if isinstance(error, RateLimitError):
+        # Cota da conta esgotada não volta esperando alguns segundos
+        return None if getattr(error, "code", None) == "insufficient_quota" else "rate_limit"
+    if isinstance(error, APITimeoutError):
+        return "timeout"
+    if isinstance(error, APIConnectionError):
+        return "connection"
+    if isinstance(error, APIStatusError):
+        if error.status_code >= 500:
+            return "server_error"
+        if error.status_code in (408, 409):
+            return "timeout" if error.status_code == 408 else "server_error"
+    return None
+
+
+class RetryPolicy:
+    """
+    Backoff exponencial com jitter total (espera sorteada entre 0 e
+    base * 2^tentativa, limitada a `max_delay`) e prazo por chamada: nenhuma
+    chamada passa de `deadline` segundos, somando tentativas e esperas.
+    """
+
+    def __init__(self, max_attempts=RETRY_MAX_ATTEMPTS, base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY,
+                 deadline=LLM_CALL_DEADLINE, request_timeout=LLM_REQUEST_TIMEOUT):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.request_timeout = request_timeout
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def delay(self, kind, attempt, retry_after=None):
+        """Espera antes da próxima tentativa; num 429 respeita o tempo pedido pela API, com jitter por cima."""
+        if kind == "rate_limit":
+            wait = retry_after if retry_after is not None else DEFAULT_RATE_LIMIT_WAIT
+            return min(self.max_delay, wait + random.uniform(0, self.base_delay))
+        return self.backoff(attempt)
+
+    def remaining(self, started):
+        return self.deadline - (time.monotonic() - started)
+
+    def allows(self, attempt, started, delay):
+        """True se ainda cabe mais uma tentativa depois de esperar `delay` segundos."""
+        return attempt + 1 < self.max_attempts and delay < self.remaining(started)
+
+    def timeout(self, started):
+        """Timeout da próxima requisição HTTP: o menor entre o limite por requisição e o que resta do prazo."""
+        return max(1.0, min(self.request_timeout, self.remaining(started)))
+
+
+class CircuitBreaker:
+    """
+    Pausa todas as chamadas de um modelo quando o provedor parece fora do ar.
+
+    Depois de `failure_threshold` falhas seguidas do provedor o circuito abre:
+    durante `reset_timeout` segundos nenhuma chamada sai (wait_time() diz
+    quanto esperar). Em seguida uma única chamada de teste é liberada; se ela
+    funcionar o circuito fecha, se falhar ele abre de novo. Assim o pipeline
+    pausa uma vez, em vez de cada currículo esgotar as próprias tentativas.
+    """
+
+    def __init__(self, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_timeout=CIRCUIT_RESET_TIMEOUT, name=""):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.name = name
+        self.state = "closed"
+        self.failures = 0
+        self.opened_until = 0.0
+        self.probe_in_flight = False
+        self.probe_started = 0.0
+        self.lock = threading.Lock()
+
+    def wait_time(self):
+        """Segundos a esperar antes de chamar a API (0 = pode chamar agora)."""
+        with self.lock:
+            if self.state == "closed":
+                return 0.0
+            now = time.monotonic()
+            if self.state == "open":
+                if now < self.opened_until:
+                    return self.opened_until - now
+                self.state = "half_open"
+                self.probe_in_flight = False
+            # Uma chamada de teste cancelada não pode prender o circuito para sempre
+            if self.probe_in_flight and now - self.probe_started < self.reset_timeout:
+                return CIRCUIT_PROBE_WAIT
+            self.probe_in_flight = True
+            self.probe_started = now
+            return 0.0
+
+    def record_success(self):
+        with self.lock:
+            if self.state != "closed":
+                logging.info(f"Circuito {self.name} fechado: provedor respondendo novamente.")
+            self.state = "closed"
+            self.failures = 0
+            self.probe_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == "half_open" or (self.state == "closed" and self.failures >= self.failure_threshold):
+                self.state = "open"
+                self.opened_until = time.monotonic() + self.reset_timeout
+                self.probe_in_flight = False
+                metrics.inc("llm_circuit_open_total", model=self.name)
+                logging.warning(
+                    f"Circuito {self.name} aberto após {self.failures} falhas seguidas do provedor; "
+                    f"pausando as chamadas por {self.reset_timeout:.0f}s."
+                )
@@ -0,0 +1,194 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+import threading
+
+# Execuções de análise que podem rodar ao mesmo tempo (uma por vaga)
+RUNNER_MAX_RUNS = int(os.getenv("RUNNER_MAX_RUNS", 4))
+# Execuções concluídas mantidas em memória para consulta
+RUNNER_HISTORY = int(os.getenv("RUNNER_HISTORY", 50))
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class AnalysisRun:
+    """Estado de uma execução de análise, atualizado pelo runner a cada currículo."""
+
+    def __init__(self, job_name, drive=None):
+        self.id = uuid.uuid4().hex
+        self.job_name = job_name
+        # Parâmetros de analise.stream_async quando a execução também baixa do Drive
+        self.drive = drive
+        self.status = "queued"
+        self.total = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.skipped = 0
+        self.filtered = 0
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+
+    @property
+    def processed(self):
+        return self.succeeded + self.failed + self.skipped + self.filtered
+
+    @property
+    def active(self):
+        return self.status in ACTIVE_STATUSES
+
+    def record(self, result):
+        # Contabilizar o resultado de um currículo
+        status = (result or {}).get("status")
+        if status == "success":
+            self.succeeded += 1
+        elif status == "skipped":
+            self.skipped += 1
+        elif status == "filtered":
+            self.filtered += 1
+        else:
+            self.failed += 1
+        # Currículos que chegam durante a execução (ex.: streaming do Drive)
+        self.total = max(self.total, self.processed)
+
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def throughput(self):
+        # Currículos analisados por minuto (os pulados e os da triagem não passam pelo LLM e não contam)
+        elapsed = self.elapsed()
+        analyzed = self.succeeded + self.failed
+        return analyzed / elapsed * 60 if elapsed > 0 else 0.0
+
+    def eta(self):
+        # Segundos restantes estimados pelo ritmo atual, ou None se ainda não há ritmo
+        rate = self.throughput()
+        if not self.active or rate <= 0:
+            return None
+        return (self.total - self.processed) / rate * 60
+
+    def progress(self):
+        if self.total:
+            return min(1.0, self.processed / self.total)
+        return 1.0 if not self.active else 0.0
+
+    def snapshot(self):
+        """Cópia do estado em dict, segura para exibir em outra thread."""
+        return {
+            "id": self.id,
+            "job_name": self.job_name,
+            "status": self.status,
+            "total": self.total,
+            "processed": self.processed,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "filtered": self.filtered,
+            "progress": self.progress(),
+            "throughput": self.throughput(),
+            "eta": self.eta(),
+            "elapsed": self.elapsed(),
+            "error": self.error,
+        }
+
+
+class AnalysisRunner:
+    """
+    Executa análises em segundo plano, fora da thread que atende a interface.
+    Todas as execuções compartilham um único event loop em uma thread dedicada,
+    de modo que os clientes da OpenAI e o rate limiter são reaproveitados entre
+    elas. Execuções de vagas diferentes rodam ao mesmo tempo; pedir de novo uma
+    vaga que já está em andamento devolve a execução existente.
+
+        runner = AnalysisRunner()
+        run_id = runner.submit("Vaga de Assessor Legislativo")
+        runner.status(run_id)   # {"status": "running", "processed": 12, ...}
+        runner.cancel(run_id)
+
+    Com `drive={"token_path": ..., "credentials_path": ..., "folder_id": ...}`,
+    a execução sincroniza a pasta do Drive e analisa cada currículo assim que
+    o seu download termina (analise.stream_async).
+    """
+
+    def __init__(self, max_runs=RUNNER_MAX_RUNS, history=RUNNER_HISTORY):
+        self.runs = {}
+        self.history = history
+        self.lock = threading.Lock()
+        self.loop = asyncio.new_event_loop()
+        self.semaphore = asyncio.Semaphore(max(1, max_runs))
+        self.thread = threading.Thread(target=self.loop.run_forever, name="analysis-runner", daemon=True)
+        self.thread.start()
+
+    def submit(self, job_name, drive=None):
+        """Agenda a análise da vaga e retorna o ID da execução."""
+        with self.lock:
+            for run in self.runs.values():
+                if run.job_name == job_name and run.active:
+                    return run.id
+            run = AnalysisRun(job_name, drive)
+            self.runs[run.id] = run
+            self.prune()
+        run.future = asyncio.run_coroutine_threadsafe(self.execute(run), self.loop)
+        logging.info(f"Análise da vaga '{job_name}' agendada (execução {run.id}).")
+        return run.id
+
+    def status(self, run_id):
+        """Retorna o estado atual da execução (dict) ou None se ela não existir."""
+        run = self.runs.get(run_id)
+        return run.snapshot() if run else None
+
+    def list_runs(self, active_only=False):
+        with self.lock:
+            runs = list(self.runs.values())
+        return [run.snapshot() for run in runs if run.active or not active_only]
+
+    def cancel(self, run_id):
+        """Cancela a execução; os currículos já concluídos continuam gravados no banco."""
+        run = self.runs.get(run_id)
+        if run is None or not run.active:
+            return False
+        self.loop.call_soon_threadsafe(run.future.cancel)
+        return True
+
+    def prune(self):
+        # Descartar as execuções concluídas mais antigas além do histórico
+        finished = sorted((run for run in self.runs.values() if not run.active), key=lambda run: run.created_at)
+        for run in finished[:max(0, len(finished) - self.history)]:
+            del self.runs[run.id]
+
+    async def execute(self, run):
+        # Imports sob demanda: spaCy, PyMuPDF e OpenAI só são carregados na primeira análise
+        from analise import main_async, stream_async, CV_DIR
+        from helper import get_pdf_paths
+        from resources import get_database
+
+        try:
+            async with self.semaphore:
+                run.status = "running"
+                run.started_at = time.time()
+                job = await asyncio.to_thread(get_database().get_job_by_name, run.job_name)
+                if not job:
+                    raise ValueError(f"Job '{run.job_name}' não encontrado.")
+                # No streaming do Drive, o total cresce conforme os downloads terminam
+                download_path = (run.drive or {}).get("download_path") or CV_DIR
+                run.total = len(await asyncio.to_thread(get_pdf_paths, download_path))
+                if run.drive:
+                    await stream_async(job, on_result=run.record, **run.drive)
+                else:
+                    await main_async(job, on_result=run.record)
+                run.status = "done"
+        except asyncio.CancelledError:
+            run.status = "cancelled"
+            logging.warning(f"Análise da vaga '{run.job_name}' cancelada após {run.processed} currículos.")
+        except Exception as e:
+            run.status = "failed"
+            run.error = str(e)
+            logging.error(f"Erro na análise da vaga '{run.job_name}': {e}", exc_info=True)
+        finally:
+            run.finished_at = time.time()
@@ -0,0 +1,107 @@
+import shutil
+import asyncio
+import threading
+import pytest
+
+# Pipeline do main_async de ponta a ponta contra a API falsa (fixtures server e client no conftest.py)
+pytest.importorskip("openai")
+
+import analise
+import preprocess
+
+JOB = {
+    "id": "vaga-teste",
+    "name": "Vaga de Teste",
+    "main_activities": "Elaboração de pareceres.",
+    "prerequisites": "Graduação em Direito.",
+    "differentials": "Inglês avançado.",
+}
+
+
+@pytest.fixture
+def pipeline(database, client, monkeypatch):
+    monkeypatch.setattr(analise, "get_database", lambda: database)
+    monkeypatch.setattr(analise, "get_ai", lambda model_id=None: client)
+
+    def run(cv_paths):
+        return asyncio.run(analise.main_async(
+            JOB, concurrency=2, preprocess_workers=0, source=analise.folder_source(cv_paths),
+            preprocess_chunk_size=1, prescreen_top_k=0, prescreen_threshold=0,
+        ))
+
+    return run
+
+
+def statuses(results):
+    return sorted((result["status"], result["path"]) for result in results)
+
+
+def test_fingerprints_skip_processed_cvs_and_copies(pipeline, server, database, make_pdf, tmp_path):
+    ana = make_pdf("ana.pdf", "Ana Souza\nAdvogada. Graduação em Direito.")
+    bruno = make_pdf("bruno.pdf", "Bruno Lima\nAnalista administrativo.")
+    copy = str(tmp_path / "ana-copia.pdf")
+    shutil.copy(ana, copy)
+
+    first = pipeline([ana, bruno, copy])
+    # A cópia tem o mesmo conteúdo: é pulada já na fila, sem chamar o LLM
+    assert statuses(first) == [("skipped", copy), ("success", ana), ("success", bruno)]
+    requests = server.stats["requests"]
+    assert len(database.fingerprints) == 2
+
+    second = pipeline([ana, bruno, copy])
+    assert statuses(second) == [("skipped", copy), ("skipped", ana), ("skipped", bruno)]
+    assert server.stats["requests"] == requests
+
+
+def test_failed_preprocessing_chunk_reports_each_cv(pipeline, make_pdf, monkeypatch):
+    good = make_pdf("bom.pdf", "Ana Souza\nAdvogada. Graduação em Direito.")
+    bad = make_pdf("ruim.pdf", "Bruno Lima\nAnalista administrativo.")
+    preprocess_chunk = preprocess.preprocess_chunk
+
+    def flaky(items):
+        if any(path == bad for path, _, _ in items):
+            raise RuntimeError("worker do pool morreu")
+        return preprocess_chunk(items)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(preprocess, "preprocess_chunk", flaky)
+        results = pipeline([good, bad])
+    assert statuses(results) == [("failed", bad), ("success", good)]
+    assert "worker do pool morreu" in next(result["error"] for result in results if result["path"] == bad)
+
+    # Sem fingerprint: a próxima execução analisa o currículo que falhou
+    assert statuses(pipeline([good, bad])) == [("skipped", good), ("success", bad)]
+
+
+def test_stream_async_analyzes_each_cv_as_its_download_finishes(database, client, make_pdf, tmp_path, monkeypatch):
+    pytest.importorskip("googleapiclient")
+    from drive import download_cv
+    from drive.fake_drive import FakeDrive
+
+    monkeypatch.setattr(analise, "get_database", lambda: database)
+    monkeypatch.setattr(analise, "get_ai", lambda model_id=None: client)
+    drive = FakeDrive()
+    for name, text in (("ana.pdf", "Ana Souza\nAdvogada. Graduação em Direito."),
+                       ("bruno.pdf", "Bruno Lima\nAnalista administrativo.")):
+        with open(make_pdf(name, text), "rb") as f:
+            drive.add_file("pasta", name, f.read())
+
+    analyzed = threading.Event()
+    download_file = download_cv.download_file
+
+    def slow(service, file, file_path, chunk_size=download_cv.CHUNK_SIZE):
+        # bruno.pdf só termina de baixar depois que algum currículo já foi analisado
+        if file["name"] == "bruno.pdf" and not analyzed.wait(timeout=10):
+            raise IOError("nenhum currículo analisado antes do fim dos downloads")
+        return download_file(service, file, file_path, chunk_size)
+
+    monkeypatch.setattr(download_cv, "download_file", slow)
+    download_path = tmp_path / "curriculos"
+    results = asyncio.run(analise.stream_async(
+        JOB, None, None, "pasta", str(download_path), concurrency=1, preprocess_workers=0,
+        on_result=lambda result: analyzed.set(), service_factory=drive.service,
+    ))
+
+    assert statuses(results) == [
+        ("success", str(download_path / "ana.pdf")), ("success", str(download_path / "bruno.pdf")),
+    ]
@@ -0,0 +1,68 @@
+from types import SimpleNamespace
+import cache as cache_module
+from cache import ResponseCache, make_cache_key
+
+
+def test_cache_key_depends_on_model_version_and_prompt():
+    messages = [{"role": "user", "content": "Olá"}]
+    key = make_cache_key("gpt-teste", "v1", messages)
+    assert key == make_cache_key("gpt-teste", "v1", [{"content": "Olá", "role": "user"}])
+    assert key != make_cache_key("gpt-outro", "v1", messages)
+    assert key != make_cache_key("gpt-teste", "v2", messages)
+
+
+def test_get_set_and_persistence(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = ResponseCache(path=path)
+    assert cache.get("chave") is None
+    cache.set("chave", "resposta")
+    cache.set("nula", None)
+    assert cache.get("chave") == "resposta"
+    assert cache.get("nula") is None
+    # Outra instância (ex.: próxima execução) lê o mesmo arquivo e o tamanho total
+    reopened = ResponseCache(path=path)
+    assert reopened.get("chave") == "resposta"
+    assert reopened.total_bytes == len("resposta")
+
+
+def test_expired_entries_are_not_returned(tmp_path, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(cache_module, "time", SimpleNamespace(time=lambda: clock[0]))
+    cache = ResponseCache(path=str(tmp_path / "cache.sqlite3"), ttl=60)
+    cache.set("chave", "resposta")
+    clock[0] += 59
+    assert cache.get("chave") == "resposta"
+    clock[0] += 2
+    assert cache.get("chave") is None
+    assert cache.total_bytes == 0
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(cache_module, "time", SimpleNamespace(time=lambda: clock[0]))
+    cache = ResponseCache(path=str(tmp_path / "cache.sqlite3"), max_bytes=30, ttl=0)
+    for key in ("a", "b", "c"):
+        cache.set(key, "x" * 10)
+        clock[0] += 1
+    # "a" foi lida por último: "b" passa a ser a menos usada
+    assert cache.get("a") is not None
+    clock[0] += 1
+    cache.set("d", "x" * 10)
+
+    # Passou do limite: remove as menos usadas até 90% (27 bytes), e não só o necessário para caber
+    assert [cache.get(key) is not None for key in ("a", "b", "c", "d")] == [True, False, False, True]
+    assert cache.total_bytes == 20
+
+    # Abaixo da marca de baixa, a próxima gravação não remove nada
+    cache.set("e", "x" * 5)
+    assert cache.total_bytes == 25
+
+
+def test_replacing_an_entry_keeps_the_size_accounting(tmp_path):
+    cache = ResponseCache(path=str(tmp_path / "cache.sqlite3"))
+    cache.set("chave", "x" * 10)
+    cache.set("chave", "x" * 4)
+    assert cache.total_bytes == 4
+    cache.clear()
+    assert cache.total_bytes == 0
+    assert cache.get("chave") is None
@@ -0,0 +1,176 @@
+import json
+import pytest
+from database import AnalyzeDatabase
+
+
+def lowercase(texts):
+    return [text.lower() for text in texts]
+
+
+def analysis(id, job_id="vaga", score=5.0, skills=(), education=(), languages=()):
+    return {
+        "id": id, "job_id": job_id, "resum_id": f"resumo-{id}", "name": f"Candidato {id}", "score": score,
+        "skills": list(skills), "education": list(education), "languages": list(languages),
+    }
+
+
+def test_unit_of_work_flushes_by_size_and_on_exit(database):
+    with database.unit_of_work(flush_size=2, flush_interval=3600) as unit_of_work:
+        unit_of_work.add((database.analysis, analysis("a")), (database.files, {"file_id": "f-a", "job_id": "vaga"}))
+        assert len(database.analysis) == 0
+        unit_of_work.add((database.analysis, analysis("b")))
+        # Segundo currículo completa o lote: os dois vão em uma transação
+        assert len(database.analysis) == 2
+        assert len(database.files) == 1
+        unit_of_work.add((database.analysis, analysis("c")))
+        assert len(database.analysis) == 2
+    assert len(database.analysis) == 3
+
+
+def test_unit_of_work_applies_replacements_in_the_same_batch(database):
+    database.analysis.insert(analysis("antiga", skills=["Cobol"]))
+    with database.unit_of_work() as unit_of_work:
+        unit_of_work.add((database.analysis, analysis("nova", skills=["Python"])),
+                         replaces=[(database.analysis, {"id": "antiga"})])
+    assert [document["id"] for document in database.analysis.all()] == ["nova"]
+    assert database.search(must=["cobol"])["total"] == 0
+    assert database.search(must=["python"])["total"] == 1
+
+
+def test_unit_of_work_keeps_rows_when_the_flush_fails(database, monkeypatch):
+    unit_of_work = database.unit_of_work(flush_size=10)
+    unit_of_work.add((database.analysis, analysis("a")))
+
+    def broken(documents, replace=False, prepared=None):
+        raise RuntimeError("disco cheio")
+
+    monkeypatch.setattr(database.files, "insert_multiple", broken)
+    unit_of_work.add((database.files, {"file_id": "f-a", "job_id": "vaga"}))
+    with pytest.raises(RuntimeError):
+        unit_of_work.flush()
+    # Transação desfeita e registros de volta ao buffer
+    assert len(database.analysis) == 0
+    assert unit_of_work.pending_units == 2
+
+    monkeypatch.undo()
+    assert unit_of_work.flush() == 2
+    assert len(database.analysis) == 1
+    assert len(database.files) == 1
+
+
+def test_unit_of_work_normalizes_terms_before_the_flush(database, monkeypatch):
+    unit_of_work = database.unit_of_work(flush_size=10)
+    unit_of_work.add((database.analysis, analysis("a", skills=["Python"])))
+
+    def no_normalization(texts):
+        raise AssertionError("normalização dentro da transação")
+
+    # O flush só grava: os termos já foram calculados no add
+    monkeypatch.setattr(database, "normalize_texts", no_normalization)
+    unit_of_work.flush()
+    monkeypatch.undo()
+    assert database.search(must=["python"])["total"] == 1
+
+
+def test_search_must_should_exclude_and_facets(database):
+    database.analysis.insert_multiple([
+        analysis("a", score=9, skills=["Python", "SQL"], languages=["Inglês avançado"]),
+        analysis("b", score=7, skills=["Python"], education=["Direito"]),
+        analysis("c", score=8, job_id="outra", skills=["Java", "SQL"], languages=["Inglês básico"]),
+    ])
+
+    found = database.search(must=["python"])
+    assert [result["id"] for result in found["results"]] == ["a", "b"]
+    assert database.search(should=["java", "direito"])["total"] == 2
+    assert [result["id"] for result in database.search(must=["sql"], exclude=["java"])["results"]] == ["a"]
+    # Termo com várias palavras: todas precisam aparecer
+    assert [result["id"] for result in database.search(must=["inglês avançado"])["results"]] == ["a"]
+    assert database.search(must=["sql"], job_id="outra")["total"] == 1
+    assert database.search(must=["sql"], min_score=8.5)["total"] == 1
+    assert database.search(must=["python"], fields=["languages"])["total"] == 0
+
+    facets = database.search(must=["sql"], facets=["skills", "job_id"])["facets"]
+    assert facets["skills"] == [("sql", 2), ("java", 1), ("python", 1)]
+    assert facets["job_id"] == [("outra", 1), ("vaga", 1)]
+
+    with pytest.raises(ValueError):
+        database.search(must=["python"], fields=["name"])
+
+
+def test_term_without_tokens_does_not_widen_the_search(database, monkeypatch):
+    # Normalizador que descarta stop words e símbolos, como o format_cv
+    monkeypatch.setattr(database, "normalizer", lambda texts: [
+        " ".join(word for word in text.lower().split() if word not in ("de", "c++")) for text in texts
+    ])
+    database.analysis.insert_multiple([analysis("a", skills=["Python"]), analysis("b", skills=["Java"])])
+
+    # Termo obrigatório que vira vazio não pode ser satisfeito: nenhum resultado, e não todos
+    assert database.search(must=["python", "de"], facets=["skills"]) == {
+        "total": 0, "results": [], "facets": {"skills": []},
+    }
+    assert database.search(must=["C++"])["total"] == 0
+    assert database.search(should=["de", "c++"])["total"] == 0
+    # Entre vários `should`, o vazio só é ignorado; em `exclude`, não exclui nada
+    assert database.search(should=["de", "java"])["total"] == 1
+    assert database.search(exclude=["de"])["total"] == 2
+
+
+def test_rebuild_index_matches_incremental_index(database, monkeypatch):
+    database.analysis.insert_multiple([analysis("a", skills=["Python"]), analysis("b", skills=["Python", "Go"])])
+    before = database.search(must=["python"], facets=["skills"])
+    normalizer = database.normalizer
+
+    def outside_transaction(texts):
+        assert not database.connection.in_transaction, "normalização dentro da transação"
+        return normalizer(texts)
+
+    # Cache vazio: cada lote passa de novo pelo normalizador, antes de abrir a transação
+    monkeypatch.setattr(database, "normalizer", outside_transaction)
+    database.term_cache.clear()
+    assert database.rebuild_index(batch_size=1) == 2
+    assert database.search(must=["python"], facets=["skills"]) == before
+
+
+def test_tinydb_migration_is_recorded_and_retried(tmp_path):
+    db_path = str(tmp_path / "db.sqlite3")
+    json_path = tmp_path / "db.json"
+    json_path.write_text('{"jobs": {"1": {"id": "vaga", "name": "Vaga"}', encoding="utf-8")
+
+    # db.json corrompido: o banco abre, sem registrar a migração
+    database = AnalyzeDatabase(db_path, str(json_path), normalizer=lowercase)
+    assert not database.is_migrated()
+    database.connection.close()
+
+    json_path.write_text(json.dumps({
+        "jobs": {"1": {"id": "vaga", "name": "Vaga"}},
+        "analysis": {"1": analysis("a", skills=["Python"])},
+    }), encoding="utf-8")
+    database = AnalyzeDatabase(db_path, str(json_path), normalizer=lowercase)
+    assert database.is_migrated()
+    assert database.get_job_by_id("vaga") == {"id": "vaga", "name": "Vaga"}
+    assert database.search(must=["python"])["total"] == 1
+    database.jobs.truncate()
+    database.analysis.truncate()
+    database.connection.close()
+
+    # Banco vazio, mas a migração está registrada no meta: o db.json não é importado de novo
+    database = AnalyzeDatabase(db_path, str(json_path), normalizer=lowercase)
+    assert database.get_job_by_id("vaga") is None
+    database.connection.close()
+
+
+def test_tinydb_migration_leaves_the_index_to_the_first_search(tmp_path):
+    json_path = tmp_path / "db.json"
+    json_path.write_text(json.dumps({"analysis": {"1": analysis("a", skills=["Python"])}}), encoding="utf-8")
+
+    def no_normalization(texts):
+        raise AssertionError("spaCy carregado na migração")
+
+    # A migração só copia os documentos: sem o modelo do spaCy ela continua funcionando
+    database = AnalyzeDatabase(str(tmp_path / "db.sqlite3"), str(json_path), normalizer=no_normalization)
+    assert database.is_migrated()
+    assert len(database.analysis) == 1
+
+    database.normalizer = lowercase
+    assert database.search(must=["python"])["total"] == 1
+    database.connection.close()
@@ -0,0 +1,173 @@
+import os
+import pytest
+
+# Sincronização com o Drive contra o FakeDrive (drive/fake_drive.py), sem rede nem credenciais
+pytest.importorskip("googleapiclient")
+
+from drive import download_cv
+from drive.fake_drive import FakeDrive
+
+FOLDER = "pasta"
+
+
+def pdf_bytes(index, size=2000):
+    return bytes((index + position) % 256 for position in range(size))
+
+
+@pytest.fixture
+def drive():
+    # Páginas pequenas: a listagem e o feed de alterações precisam percorrer várias
+    return FakeDrive(page_size=3)
+
+
+def local_files(path):
+    return sorted(name for name in os.listdir(path) if not name.startswith("."))
+
+
+def test_sync_folder_downloads_all_pages_and_skips_unchanged(drive, tmp_path):
+    for index in range(7):
+        drive.add_file(FOLDER, f"cv{index}.pdf", pdf_bytes(index))
+    drive.add_file("outra-pasta", "fora.pdf", b"x" * 100)
+
+    downloaded = download_cv.sync_folder(drive.service, FOLDER, str(tmp_path), workers=2)
+
+    assert len(downloaded) == 7
+    assert local_files(tmp_path) == [f"cv{index}.pdf" for index in range(7)]
+    assert (tmp_path / "cv3.pdf").read_bytes() == pdf_bytes(3)
+    # Segunda execução: tudo confere com o manifesto, nada é baixado
+    assert download_cv.sync_folder(drive.service, FOLDER, str(tmp_path), workers=2) == []
+
+
+def test_download_file_resumes_partial_download(drive, tmp_path, monkeypatch):
+    content = pdf_bytes(1, size=10_000)
+    file = drive.metadata(drive.add_file(FOLDER, "grande.pdf", content))
+    file_path = str(tmp_path / "grande.pdf")
+    # Download interrompido: os primeiros 3000 bytes já estão no .part
+    (tmp_path / "grande.pdf.part").write_bytes(content[:3000])
+
+    requested = []
+    fetch_range = download_cv.fetch_range
+
+    def recording_fetch_range(request, start, end, num_retries=3):
+        requested.append(start)
+        return fetch_range(request, start, end, num_retries)
+
+    monkeypatch.setattr(download_cv, "fetch_range", recording_fetch_range)
+    data = download_cv.download_file(drive.service(), file, file_path, chunk_size=4096)
+
+    assert data == content
+    assert (tmp_path / "grande.pdf").read_bytes() == content
+    assert not (tmp_path / "grande.pdf.part").exists()
+    # Só os bytes que faltavam foram pedidos
+    assert requested == [3000, 3000 + 4096]
+
+
+def test_download_file_discards_stale_part(drive, tmp_path):
+    content = pdf_bytes(2, size=5000)
+    file = drive.metadata(drive.add_file(FOLDER, "cv.pdf", content))
+    # .part de uma versão anterior do arquivo: o checksum não confere
+    (tmp_path / "cv.pdf.part").write_bytes(b"\0" * 1000)
+
+    with pytest.raises(IOError):
+        download_cv.download_file(drive.service(), file, str(tmp_path / "cv.pdf"))
+    assert not (tmp_path / "cv.pdf.part").exists()
+    # A próxima tentativa recomeça do zero
+    assert download_cv.download_file(drive.service(), file, str(tmp_path / "cv.pdf")) == content
+
+
+def test_sync_changes_propagates_updates_renames_and_removals(drive, tmp_path):
+    ids = [drive.add_file(FOLDER, f"cv{index}.pdf", pdf_bytes(index)) for index in range(5)]
+    first = download_cv.sync_changes(drive.service, FOLDER, str(tmp_path))
+    assert len(first["downloaded"]) == 5
+
+    drive.update_file(ids[0], content=pdf_bytes(10))
+    drive.trash_file(ids[1])
+    drive.update_file(ids[2], name="renomeado.pdf")
+    drive.delete_file(ids[3])
+    drive.add_file(FOLDER, "novo.pdf", pdf_bytes(20))
+
+    second = download_cv.sync_changes(drive.service, FOLDER, str(tmp_path))
+
+    assert sorted(os.path.basename(path) for path in second["downloaded"]) == ["cv0.pdf", "novo.pdf"]
+    assert sorted(os.path.basename(path) for path in second["removed"]) == ["cv1.pdf", "cv3.pdf"]
+    assert second["renamed"] == [(str(tmp_path / "cv2.pdf"), str(tmp_path / "renomeado.pdf"))]
+    assert local_files(tmp_path) == ["cv0.pdf", "cv4.pdf", "novo.pdf", "renomeado.pdf"]
+    assert (tmp_path / "cv0.pdf").read_bytes() == pdf_bytes(10)
+    assert (tmp_path / "renomeado.pdf").read_bytes() == pdf_bytes(2)
+    # Sem alterações novas, nada muda
+    assert download_cv.sync_changes(drive.service, FOLDER, str(tmp_path)) == {
+        "downloaded": [], "removed": [], "renamed": [],
+    }
+
+
+def test_sync_changes_moves_renamed_file_and_keeps_its_analyses(drive, database, tmp_path, monkeypatch):
+    # O banco descartável também fica em tmp_path: a cópia local vai para uma subpasta
+    download_path = tmp_path / "curriculos"
+    file_id = drive.add_file(FOLDER, "cv.pdf", pdf_bytes(0))
+    download_cv.sync_changes(drive.service, FOLDER, str(download_path))
+    old_path, new_path = str(download_path / "cv.pdf"), str(download_path / "ana-souza.pdf")
+    database.resums.insert({"id": "resumo", "job_id": "vaga", "file": old_path})
+    database.analysis.insert({"id": "analise", "job_id": "vaga", "resum_id": "resumo", "score": 8.0})
+    database.fingerprints.insert({"sha256": "sha", "job_id": "vaga", "prompt_version": "v1", "resum_id": "resumo"})
+
+    def no_download(service, file, file_path, chunk_size=download_cv.CHUNK_SIZE):
+        raise AssertionError("arquivo renomeado baixado de novo")
+
+    monkeypatch.setattr(download_cv, "download_file", no_download)
+    drive.update_file(file_id, name="ana-souza.pdf")
+    result = download_cv.sync_changes(drive.service, FOLDER, str(download_path), database=database)
+
+    assert result == {"downloaded": [], "removed": [], "renamed": [(old_path, new_path)]}
+    assert local_files(download_path) == ["ana-souza.pdf"]
+    manifest = download_cv.load_manifest(str(download_path))
+    assert manifest["files"][file_id]["name"] == "ana-souza.pdf"
+    assert manifest["failed"] == {}
+    # Análises e fingerprints continuam valendo: nada é reprocessado
+    assert database.resums.find_one(id="resumo")["file"] == new_path
+    assert len(database.analysis) == 1
+    assert len(database.fingerprints) == 1
+
+
+def test_sync_changes_retries_failed_downloads(drive, tmp_path, monkeypatch):
+    drive.add_file(FOLDER, "cv0.pdf", pdf_bytes(0))
+    download_cv.sync_changes(drive.service, FOLDER, str(tmp_path))
+    drive.add_file(FOLDER, "novo.pdf", pdf_bytes(1))
+    drive.add_file(FOLDER, "outro.pdf", pdf_bytes(2))
+
+    download_file = download_cv.download_file
+
+    def flaky(service, file, file_path, chunk_size=download_cv.CHUNK_SIZE):
+        if file["name"] == "novo.pdf":
+            raise IOError("conexão interrompida")
+        return download_file(service, file, file_path, chunk_size)
+
+    monkeypatch.setattr(download_cv, "download_file", flaky)
+    second = download_cv.sync_changes(drive.service, FOLDER, str(tmp_path))
+    assert [os.path.basename(path) for path in second["downloaded"]] == ["outro.pdf"]
+    assert not (tmp_path / "novo.pdf").exists()
+
+    # O cursor avançou, mas a falha ficou no manifesto e é tentada de novo
+    monkeypatch.setattr(download_cv, "download_file", download_file)
+    third = download_cv.sync_changes(drive.service, FOLDER, str(tmp_path))
+    assert [os.path.basename(path) for path in third["downloaded"]] == ["novo.pdf"]
+    assert (tmp_path / "novo.pdf").read_bytes() == pdf_bytes(1)
+    assert download_cv.load_manifest(str(tmp_path))["failed"] == {}
+
+
+def test_sync_changes_drops_failed_download_removed_from_drive(drive, tmp_path, monkeypatch):
+    download_cv.sync_changes(drive.service, FOLDER, str(tmp_path))
+    file_id = drive.add_file(FOLDER, "novo.pdf", pdf_bytes(1))
+
+    def broken(service, file, file_path, chunk_size=download_cv.CHUNK_SIZE):
+        raise IOError("conexão interrompida")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(download_cv, "download_file", broken)
+        download_cv.sync_changes(drive.service, FOLDER, str(tmp_path))
+    drive.trash_file(file_id)
+
+    assert download_cv.sync_changes(drive.service, FOLDER, str(tmp_path)) == {
+        "downloaded": [], "removed": [], "renamed": [],
+    }
+    assert not (tmp_path / "novo.pdf").exists()
+    assert download_cv.load_manifest(str(tmp_path))["failed"] == {}
@@ -0,0 +1,117 @@
+import shutil
+import asyncio
+import pytest
+
+# Chamadas ao LLM contra a API falsa (fake_openai.py, ver as fixtures server e client no conftest.py):
+# novas tentativas e Batch API, sem rede nem custo
+pytest.importorskip("openai")
+
+import analise
+from helper import file_sha256
+
+JOB = {
+    "id": "vaga-teste",
+    "name": "Vaga de Teste",
+    "main_activities": "Elaboração de pareceres e acompanhamento do processo legislativo.",
+    "prerequisites": "Graduação em Direito.",
+    "differentials": "Inglês avançado.",
+}
+CV = "Ana Souza\nAdvogada na Câmara Municipal, elaboração de pareceres.\nGraduação em Direito.\nInglês avançado."
+
+
+def test_rate_limited_call_is_retried(server, client):
+    server.script = ["429", "429"]
+
+    score = client.generate_score(CV, JOB)
+
+    assert 3 <= score <= 10
+    assert server.stats["rate_limited"] == 2
+    assert server.stats["requests"] == 3
+
+
+def test_rate_limited_call_gives_up_after_max_attempts(server, client):
+    server.script = ["429"] * 10
+
+    assert client.generate_response("Olá", use_cache=False) is None
+    assert server.stats["requests"] == client.retry_policy.max_attempts
+
+
+def test_malformed_response_is_retried_without_cache(server, client):
+    server.script = ["malformed"]
+
+    score = client.generate_score(CV, JOB)
+
+    assert score is not None
+    assert server.stats["malformed"] == 1
+    assert server.stats["requests"] == 2
+    # A resposta válida ficou no cache: a mesma pergunta não chama a API de novo
+    assert client.generate_score(CV, JOB) == score
+    assert server.stats["requests"] == 2
+
+
+def test_malformed_evaluation_is_retried_async(server, client):
+    server.script = ["429", "malformed"]
+
+    evaluation = asyncio.run(client.evaluate_cv_async(CV, JOB))
+
+    assert evaluation is not None
+    assert evaluation.scores.final_score() >= 0
+    assert server.stats == {"requests": 3, "rate_limited": 1, "malformed": 1}
+
+
+def test_submit_and_ingest_batch(server, client, database, make_pdf, tmp_path, monkeypatch):
+    monkeypatch.setattr(analise, "get_database", lambda: database)
+    monkeypatch.setattr(analise, "get_ai", lambda model_id=None: client)
+    database.jobs.insert(dict(JOB))
+    cv_paths = [
+        make_pdf("ana.pdf", CV),
+        make_pdf("bruno.pdf", "Bruno Lima\nAnalista administrativo.\nGraduação em Administração Pública."),
+    ]
+    batch_dir = str(tmp_path / "batches")
+    results = []
+
+    batch_ids = analise.submit_batch(JOB, cv_paths, preprocess_workers=0, batch_dir=batch_dir,
+                                     on_result=results.append)
+    assert len(batch_ids) == 1
+    # Nenhuma chamada de chat: tudo vai no arquivo do lote
+    assert server.stats["requests"] == 0
+
+    results += analise.ingest_batch(batch_ids[0], batch_dir=batch_dir, poll_interval=0.01)
+
+    assert sorted((result["status"], result["path"]) for result in results) == [
+        ("success", path) for path in sorted(cv_paths)
+    ]
+    assert len(database.analysis.find(job_id=JOB["id"])) == 2
+    # Os currículos ingeridos ficam com fingerprint: um novo envio não gera outro lote
+    results.clear()
+    assert analise.submit_batch(JOB, cv_paths, preprocess_workers=0, batch_dir=batch_dir,
+                                on_result=results.append) == []
+    assert [result["status"] for result in results] == ["skipped", "skipped"]
+
+
+def test_submit_batch_skips_cvs_in_flight_and_copies(server, client, database, make_pdf, tmp_path, monkeypatch):
+    monkeypatch.setattr(analise, "get_database", lambda: database)
+    monkeypatch.setattr(analise, "get_ai", lambda model_id=None: client)
+    database.jobs.insert(dict(JOB))
+    ana = make_pdf("ana.pdf", CV)
+    copy = str(tmp_path / "ana-copia.pdf")
+    shutil.copy(ana, copy)
+    batch_dir = str(tmp_path / "batches")
+    results = []
+
+    # A cópia de ana.pdf vira uma única requisição no lote
+    batch_ids = analise.submit_batch(JOB, [ana, copy], preprocess_workers=0, batch_dir=batch_dir,
+                                     on_result=results.append)
+    assert [item["path"] for item in analise.load_batch_state(batch_ids[0], batch_dir)["items"]] == [ana]
+    assert results == [{"status": "skipped", "path": copy}]
+
+    # Nova rodada antes da ingestão: o currículo já está em um lote e não é enviado de novo
+    bruno = make_pdf("bruno.pdf", "Bruno Lima\nAnalista administrativo.")
+    second = analise.submit_batch(JOB, [ana, bruno], preprocess_workers=0, batch_dir=batch_dir)
+    assert [item["path"] for item in analise.load_batch_state(second[0], batch_dir)["items"]] == [bruno]
+    assert {state["batch_id"] for state in analise.pending_batches(batch_dir)} == set(batch_ids + second)
+
+    # Ingerido (em outra execução, pelo estado salvo), o lote deixa de estar pendente
+    analise.ingest_batch(batch_ids[0], batch_dir=batch_dir, poll_interval=0.01)
+    assert [state["batch_id"] for state in analise.pending_batches(batch_dir)] == second
+    assert database.get_fingerprint(file_sha256(ana), JOB["id"], analise.prompt_version)
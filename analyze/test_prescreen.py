@@ -0,0 +1,59 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import prescreen
+from prescreen import bm25_scores, select_candidates
+
+JOB = {
+    "main_activities": "pareceres legislativo",
+    "prerequisites": "direito",
+    "differentials": "ingles",
+}
+
+
+@pytest.fixture(autouse=True)
+def no_spacy(monkeypatch):
+    # A vaga já vem normalizada nos testes: basta caixa baixa
+    monkeypatch.setattr(prescreen, "format_cv", str.lower)
+
+
+def test_job_query_weights_terms_by_field():
+    query = prescreen.job_query(dict(JOB, differentials="ingles direito"))
+    assert query == {"pareceres": 1.0, "legislativo": 1.0, "direito": 2.0, "ingles": 0.5}
+
+
+def test_bm25_ranks_matching_documents_first():
+    documents = [
+        "cozinheiro restaurante",
+        "advogado direito pareceres legislativo ingles",
+        "estagiario direito",
+    ]
+    scores = bm25_scores(documents, prescreen.job_query(JOB))
+    assert list(np.argsort(-scores)) == [1, 2, 0]
+    assert scores[0] == 0
+
+
+def test_bm25_without_documents_or_query():
+    assert len(bm25_scores([], {"direito": 1.0})) == 0
+    assert list(bm25_scores(["direito"], {})) == [0]
+
+
+def test_select_candidates_by_top_k_and_threshold():
+    scores = np.array([1.0, 4.0, 2.0, 4.0, 0.5])
+    assert list(select_candidates(scores)) == [True] * 5
+    # Empate no corte: vale a ordem de chegada
+    assert list(select_candidates(scores, top_k=1)) == [False, True, False, False, False]
+    assert list(select_candidates(scores, threshold=0.5)) == [False, True, True, True, False]
+    assert list(select_candidates(scores, top_k=2, threshold=0.9)) == [False, True, False, True, False]
+
+
+def test_prescreen_splits_approved_and_filtered():
+    items = [
+        ("a.pdf", "texto", "cozinheiro restaurante", "sha-a"),
+        ("b.pdf", "texto", "advogado direito pareceres legislativo", "sha-b"),
+        ("c.pdf", "texto", "estagiario direito", "sha-c"),
+    ]
+    approved, filtered = prescreen.prescreen(JOB, items, top_k=2)
+    assert [item[0] for item in approved] == ["b.pdf", "c.pdf"]
+    assert [(item[0], score) for item, score in filtered] == [("a.pdf", 0.0)]
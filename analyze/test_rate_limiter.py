@@ -0,0 +1,85 @@
+import pytest
+from rate_limiter import TokenBucket, RateLimiter, parse_duration, parse_retry_after
+
+
+def test_parse_duration():
+    assert parse_duration("120ms") == pytest.approx(0.12)
+    assert parse_duration("6m0s") == 360
+    assert parse_duration("1h2m3s") == 3723
+    assert parse_duration("0.5") == 0.5
+    assert parse_duration("soon") is None
+    assert parse_duration(None) is None
+
+
+def test_parse_retry_after_prefers_headers_over_message():
+    assert parse_retry_after({"retry-after-ms": "250"}) == 0.25
+    assert parse_retry_after({"retry-after": "2"}, "Please try again in 9s.") == 2
+    assert parse_retry_after({}, "Rate limit reached. Please try again in 20ms.") == pytest.approx(0.02)
+    assert parse_retry_after(None, "Rate limit reached.") is None
+
+
+def test_token_bucket_waits_and_refills():
+    bucket = TokenBucket(60, period=60)  # 1 token por segundo
+    now = bucket.updated_at
+    assert bucket.reserve(60, now) == 0
+    # Saldo negativo: quem reservou além da cota espera a reposição
+    assert bucket.reserve(2, now) == pytest.approx(2)
+    assert bucket.reserve(1, now + 2) == pytest.approx(1)
+    # A reposição nunca passa da capacidade
+    assert bucket.reserve(1, now + 1000) == 0
+    assert bucket.tokens == 59
+
+
+def test_token_bucket_refund_and_server_sync():
+    bucket = TokenBucket(100, period=60)
+    now = bucket.updated_at
+    bucket.reserve(80, now)
+    bucket.refund(30, now)
+    assert bucket.tokens == pytest.approx(50)
+    # O servidor informa um saldo menor: o local desce, nunca sobe
+    bucket.sync_remaining(10, None, now)
+    assert bucket.tokens == pytest.approx(10)
+    bucket.sync_remaining(90, None, now)
+    assert bucket.tokens == pytest.approx(10)
+    # Cota zerada até o reset: o saldo fica negativo pelo tempo pedido
+    bucket.sync_remaining(0, 3, now)
+    assert bucket.reserve(0, now) == pytest.approx(3)
+
+
+def test_rate_limiter_reserves_requests_and_tokens():
+    limiter = RateLimiter(rpm=2, tpm=1000)
+    assert limiter.reserve(400) == 0
+    assert limiter.reserve(400) == 0
+    # Terceira requisição no mesmo minuto: espera pelo balde de requisições (30s por requisição)
+    assert limiter.reserve(10) == pytest.approx(30, rel=0.01)
+
+
+def test_rate_limiter_caps_oversized_requests():
+    limiter = RateLimiter(rpm=100, tpm=1000)
+    # Maior que a cota inteira: reserva só a capacidade, senão nunca seria liberada
+    assert limiter.reserve(5000) == 0
+    assert limiter.reserve(500) == pytest.approx(30, rel=0.01)
+
+
+def test_rate_limiter_usage_and_headers():
+    limiter = RateLimiter(rpm=100, tpm=1000)
+    limiter.reserve(600)
+    # Consumo real menor que o reservado: a diferença volta ao balde
+    limiter.record_usage(600, 100)
+    assert limiter.tokens.tokens == pytest.approx(900, abs=1)
+    limiter.update_from_headers({
+        "x-ratelimit-limit-tokens": "2000",
+        "x-ratelimit-remaining-tokens": "50",
+        "x-ratelimit-reset-tokens": "1s",
+    })
+    assert limiter.tokens.capacity == 2000
+    assert limiter.tokens.tokens == pytest.approx(50, abs=1)
+
+
+def test_rate_limiter_penalize_pauses_everyone():
+    limiter = RateLimiter(rpm=1000, tpm=100000)
+    limiter.penalize(5)
+    assert limiter.reserve(1) == pytest.approx(5, abs=0.1)
+    # Uma pausa menor não encurta a que já está em vigor
+    limiter.penalize(1)
+    assert limiter.reserve(1) == pytest.approx(5, abs=0.1)
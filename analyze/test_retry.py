@@ -0,0 +1,93 @@
+import pytest
+from types import SimpleNamespace
+
+pytest.importorskip("openai")
+
+import httpx
+import retry
+from openai import APIConnectionError, APIStatusError, RateLimitError
+from retry import RetryPolicy, CircuitBreaker, classify_error
+
+
+def status_error(error_class, status_code, code=None):
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(status_code, request=request)
+    body = {"code": code} if code else None
+    return error_class("erro", response=response, body=body)
+
+
+def test_classify_error():
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    assert classify_error(status_error(RateLimitError, 429)) == "rate_limit"
+    assert classify_error(status_error(RateLimitError, 429, code="insufficient_quota")) is None
+    assert classify_error(status_error(APIStatusError, 503)) == "server_error"
+    assert classify_error(status_error(APIStatusError, 408)) == "timeout"
+    assert classify_error(status_error(APIStatusError, 400)) is None
+    assert classify_error(APIConnectionError(request=request)) == "connection"
+    assert classify_error(ValueError("resposta inválida")) is None
+
+
+def test_backoff_is_capped_and_rate_limit_respects_retry_after():
+    policy = RetryPolicy(base_delay=1, max_delay=5)
+    assert all(0 <= policy.backoff(attempt) <= 5 for attempt in range(10))
+    assert 2 <= policy.delay("rate_limit", 0, retry_after=2) <= 3
+    # Sem retry-after, o 429 espera o padrão
+    assert policy.delay("rate_limit", 0) == 5
+
+
+def test_attempts_and_deadline(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(retry, "time", SimpleNamespace(monotonic=lambda: clock[0]))
+    policy = RetryPolicy(max_attempts=3, deadline=10, request_timeout=8)
+    started = clock[0]
+    assert policy.allows(0, started, 1)
+    assert not policy.allows(2, started, 1)
+    assert policy.timeout(started) == 8
+    clock[0] += 7
+    # Faltam 3s do prazo: a espera não cabe e o timeout da requisição encolhe
+    assert not policy.allows(0, started, 5)
+    assert policy.timeout(started) == pytest.approx(3)
+
+
+def test_circuit_breaker_opens_probes_and_closes(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(retry, "time", SimpleNamespace(monotonic=lambda: clock[0]))
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30, name="teste")
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.wait_time() == 0
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.wait_time() == pytest.approx(30)
+
+    clock[0] += 30
+    # Fim da pausa: uma única chamada de teste sai, as demais aguardam o resultado dela
+    assert breaker.wait_time() == 0
+    assert breaker.wait_time() == retry.CIRCUIT_PROBE_WAIT
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.wait_time() == 0
+
+
+def test_circuit_breaker_reopens_when_probe_fails(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(retry, "time", SimpleNamespace(monotonic=lambda: clock[0]))
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    breaker.record_failure()
+    clock[0] += 10
+    assert breaker.wait_time() == 0
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.wait_time() == pytest.approx(10)
+
+
+def test_circuit_breaker_frees_a_lost_probe(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(retry, "time", SimpleNamespace(monotonic=lambda: clock[0]))
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    breaker.record_failure()
+    clock[0] += 10
+    assert breaker.wait_time() == 0
+    # A chamada de teste foi cancelada sem registrar resultado: depois do reset_timeout outra é liberada
+    clock[0] += 10
+    assert breaker.wait_time() == 0
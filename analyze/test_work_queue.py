@@ -0,0 +1,208 @@
+import asyncio
+import sqlite3
+import pytest
+from types import SimpleNamespace
+import work_queue
+from work_queue import WorkQueue
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(work_queue, "time", SimpleNamespace(time=lambda: clock.now))
+    return clock
+
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    queue = WorkQueue(str(tmp_path / "fila.sqlite3"), lease_seconds=60, max_attempts=2, retry_delay=10)
+    yield queue
+    queue.close()
+
+
+def test_enqueue_ignores_tasks_already_in_the_queue(queue):
+    assert queue.enqueue([("a.pdf", "sha-a"), ("b.pdf", "sha-b")], "vaga", "v1") == 2
+    # Mesmo conteúdo com outro nome: continua sendo a mesma tarefa
+    assert queue.enqueue([("a.pdf", "sha-a"), ("copia-b.pdf", "sha-b"), ("c.pdf", "sha-c")], "vaga", "v1") == 1
+    assert queue.enqueue([("a.pdf", "sha-a")], "outra", "v1") == 1
+    assert queue.counts("vaga") == {"pending": 3, "leased": 0, "done": 0, "dead": 0}
+
+
+def test_new_prompt_version_creates_new_tasks(queue):
+    queue.enqueue([("a.pdf", "sha-a")], "vaga", "v1")
+    task = queue.claim("w1", "vaga", "v1")[0]
+    queue.complete([task["id"]], "w1")
+    assert queue.enqueue([("a.pdf", "sha-a")], "vaga", "v1") == 0
+
+    # Prompts ou modo alterados: o currículo já concluído volta a ser analisado na versão nova
+    assert queue.enqueue([("a.pdf", "sha-a")], "vaga", "v2") == 1
+    assert queue.claim("w1", "vaga", "v1") == []
+    assert queue.claim("w1", "vaga", "v2")[0]["prompt_version"] == "v2"
+    assert queue.counts("vaga", "v1") == {"pending": 0, "leased": 0, "done": 1, "dead": 0}
+    assert queue.counts("vaga", "v2") == {"pending": 0, "leased": 1, "done": 0, "dead": 0}
+
+
+def test_queue_created_with_the_stage_column_is_migrated(tmp_path):
+    path = str(tmp_path / "fila.sqlite3")
+    connection = sqlite3.connect(path)
+    connection.execute(
+        "CREATE TABLE tasks (id INTEGER PRIMARY KEY, path TEXT NOT NULL, sha256 TEXT NOT NULL, job_id TEXT NOT NULL, "
+        "stage TEXT NOT NULL, state TEXT NOT NULL DEFAULT 'pending', attempts INTEGER NOT NULL DEFAULT 0, "
+        "max_attempts INTEGER NOT NULL, lease_owner TEXT, lease_until REAL, available_at REAL NOT NULL DEFAULT 0, "
+        "last_error TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+    )
+    connection.execute("CREATE UNIQUE INDEX idx_tasks_sha256_job_id_stage ON tasks (sha256, job_id, stage)")
+    connection.execute(
+        "INSERT INTO tasks (path, sha256, job_id, stage, state, max_attempts, created_at, updated_at) "
+        "VALUES ('a.pdf', 'sha-a', 'vaga', 'analyze', 'done', 3, 0, 0)"
+    )
+    connection.commit()
+    connection.close()
+
+    queue = WorkQueue(path)
+    # A tarefa antiga fica sem versão: a mesma análise entra de novo na versão atual
+    assert queue.enqueue([("a.pdf", "sha-a")], "vaga", "v1") == 1
+    assert queue.claim("w1", "vaga", "v1")[0]["path"] == "a.pdf"
+    queue.close()
+
+
+def test_claimed_task_is_not_delivered_twice(queue):
+    queue.enqueue([("a.pdf", "sha-a"), ("b.pdf", "sha-b")], "vaga", "v1")
+    first = queue.claim("w1", "vaga", "v1")
+    second = queue.claim("w2", "vaga", "v1")
+    assert [task["path"] for task in first + second] == ["a.pdf", "b.pdf"]
+    assert first[0]["attempts"] == 1
+    assert queue.claim("w3", "vaga", "v1") == []
+
+    queue.complete([first[0]["id"]], "w1")
+    # Só quem tem o lease conclui a tarefa
+    queue.complete([second[0]["id"]], "w1")
+    assert queue.counts("vaga") == {"pending": 0, "leased": 1, "done": 1, "dead": 0}
+
+
+def test_failed_task_waits_and_then_goes_to_dead_letters(queue, clock):
+    queue.enqueue([("a.pdf", "sha-a")], "vaga", "v1")
+    task = queue.claim("w1", "vaga", "v1")[0]
+    queue.fail(task, "w1", "erro 1")
+    # Espera antes da nova tentativa
+    assert queue.claim("w1", "vaga", "v1") == []
+    assert queue.next_due("vaga", "v1") == clock.now + 10
+
+    clock.now += 10
+    task = queue.claim("w1", "vaga", "v1")[0]
+    assert task["attempts"] == 2
+    queue.fail(task, "w1", "erro 2")
+    assert queue.counts("vaga")["dead"] == 1
+    assert queue.next_due("vaga", "v1") is None
+    assert [(task["path"], task["last_error"]) for task in queue.dead_letters("vaga")] == [("a.pdf", "erro 2")]
+
+    assert queue.retry_dead("vaga") == 1
+    assert queue.claim("w1", "vaga", "v1")[0]["attempts"] == 1
+
+
+def test_expired_lease_is_taken_over(queue, clock):
+    queue.enqueue([("a.pdf", "sha-a")], "vaga", "v1")
+    queue.claim("w1", "vaga", "v1")
+    clock.now += 30
+    queue.heartbeat("w1")
+    # Lease renovado: ainda vale 60s a partir do heartbeat
+    clock.now += 45
+    assert queue.claim("w2", "vaga", "v1") == []
+    clock.now += 20
+    task = queue.claim("w2", "vaga", "v1")[0]
+    assert task["lease_owner"] == "w2"
+    assert task["attempts"] == 2
+    # O worker antigo não conclui mais a tarefa
+    queue.complete([task["id"]], "w1")
+    assert queue.counts("vaga")["leased"] == 1
+
+
+def test_lease_expired_on_the_last_attempt_goes_to_dead_letters(queue, clock):
+    queue.enqueue([("a.pdf", "sha-a")], "vaga", "v1")
+    queue.claim("w1", "vaga", "v1")
+    clock.now += 61
+    queue.claim("w2", "vaga", "v1")
+    clock.now += 61
+    # Dois workers caíram com o currículo: ele não derruba um terceiro
+    assert queue.claim("w3", "vaga", "v1") == []
+    assert queue.dead_letters("vaga")[0]["last_error"] == "Lease expirado na última tentativa."
+
+
+def test_release_returns_tasks_without_counting_the_attempt(queue):
+    queue.enqueue([("a.pdf", "sha-a")], "vaga", "v1")
+    queue.claim("w1", "vaga", "v1")
+    queue.release("w1")
+    task = queue.claim("w2", "vaga", "v1")[0]
+    assert task["attempts"] == 1
+
+
+@pytest.fixture
+def worker(database, client, server, monkeypatch):
+    # run_worker contra a API falsa, com o banco descartável
+    import analise
+    import resources
+
+    monkeypatch.setattr(resources, "get_database", lambda: database)
+    monkeypatch.setattr(analise, "get_database", lambda: database)
+    monkeypatch.setattr(analise, "get_ai", lambda model_id=None: client)
+    database.jobs.insert({"id": "vaga", "name": "Vaga"})
+    return database.get_job_by_id("vaga")
+
+
+def test_run_worker_emits_final_results(worker, make_pdf, tmp_path):
+    import analise
+    from helper import file_sha256
+
+    queue_path = str(tmp_path / "fila.sqlite3")
+    paths = [make_pdf("ana.pdf", "Ana Souza\nAdvogada. Graduação em Direito."), make_pdf("vazio.pdf", "")]
+    queue = WorkQueue(queue_path, max_attempts=1)
+    queue.enqueue([(path, file_sha256(path)) for path in paths], "vaga", analise.prompt_version)
+    queue.close()
+    results = []
+
+    counts = asyncio.run(work_queue.run_worker(worker, queue_path, concurrency=2, poll_interval=0.1,
+                                                       on_result=results.append, preprocess_workers=0))
+
+    assert counts == {"pending": 0, "leased": 0, "done": 1, "dead": 1}
+    assert sorted((result["status"], result["path"]) for result in results) == [
+        ("failed", paths[1]), ("success", paths[0]),
+    ]
+
+
+def test_keeper_survives_heartbeat_errors(worker, server, make_pdf, tmp_path, monkeypatch):
+    import analise
+    from helper import file_sha256
+
+    # Chamadas lentas: o keeper roda várias vezes enquanto o currículo é analisado
+    server.latency = 0.2
+    monkeypatch.setattr(analise, "flush_interval", 0.05)
+    heartbeat = WorkQueue.heartbeat
+    calls = []
+
+    def flaky_heartbeat(self, owner):
+        calls.append(owner)
+        if len(calls) == 1:
+            raise sqlite3.OperationalError("database is locked")
+        return heartbeat(self, owner)
+
+    monkeypatch.setattr(WorkQueue, "heartbeat", flaky_heartbeat)
+    queue_path = str(tmp_path / "fila.sqlite3")
+    path = make_pdf("ana.pdf", "Ana Souza\nAdvogada. Graduação em Direito.")
+    queue = WorkQueue(queue_path)
+    queue.enqueue([(path, file_sha256(path))], "vaga", analise.prompt_version)
+    queue.close()
+
+    counts = asyncio.run(work_queue.run_worker(worker, queue_path, concurrency=1, poll_interval=0.1,
+                                                       preprocess_workers=0))
+
+    assert counts["done"] == 1
+    assert len(calls) >= 2
+
+
+def test_worker_process_exits_when_job_is_missing(database, tmp_path, monkeypatch):
+    import resources
+
+    monkeypatch.setattr(resources, "get_database", lambda: database)
+    with pytest.raises(SystemExit) as exit:
+        work_queue.worker_process("inexistente", str(tmp_path / "fila.sqlite3"), 1)
+    assert exit.value.code == 1
@@ -0,0 +1,545 @@
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import asyncio
+import logging
+import sqlite3
+import argparse
+import threading
+import multiprocessing
+from contextlib import contextmanager
+
+# Fila persistente de tarefas de análise (currículo, vaga, versão dos prompts) em SQLite.
+# Sobrevive à queda do processo: cada tarefa tem estado, tentativas e um lease
+# com prazo; tarefas de um worker que morreu voltam para a fila quando o lease
+# vence, e as que falham vezes demais vão para a fila de mortos ("dead").
+#
+#   python work_queue.py enqueue --job "Vaga de Assessor Legislativo" --source ./drive/curriculos
+#   python work_queue.py work --job "Vaga de Assessor Legislativo" --processes 4
+#   python work_queue.py status
+#   python work_queue.py retry-dead --job "Vaga de Assessor Legislativo"
+
+WORK_QUEUE_PATH = os.getenv("WORK_QUEUE_PATH", "work_queue.sqlite3")
+# Segundos que uma tarefa fica reservada para um worker sem renovação
+WORK_QUEUE_LEASE = float(os.getenv("WORK_QUEUE_LEASE", 300))
+# Tentativas antes de a tarefa ir para a fila de mortos
+WORK_QUEUE_MAX_ATTEMPTS = int(os.getenv("WORK_QUEUE_MAX_ATTEMPTS", 3))
+# Espera (segundos) antes de uma tarefa que falhou voltar a ser entregue, dobrada a cada tentativa
+WORK_QUEUE_RETRY_DELAY = float(os.getenv("WORK_QUEUE_RETRY_DELAY", 30))
+
+TASK_STATES = ("pending", "leased", "done", "dead")
+
+TASK_COLUMNS = (
+    "id", "path", "sha256", "job_id", "prompt_version", "state", "attempts", "max_attempts",
+    "lease_owner", "lease_until", "available_at", "last_error", "created_at", "updated_at",
+)
+
+
+class WorkQueue:
+    """
+    Fila de tarefas em SQLite (modo WAL), segura para vários processos: a
+    reserva de tarefas (claim) acontece em uma transação IMMEDIATE, de modo
+    que dois workers nunca recebem a mesma tarefa enquanto o lease é válido.
+
+    Estados: pending -> leased -> done, ou de volta a pending (falha com
+    tentativas restantes ou lease vencido) até `max_attempts`, e então dead.
+    A tentativa é contada na reserva: um currículo que derruba o worker também
+    acaba na fila de mortos, em vez de derrubar todos os workers seguintes.
+
+    Cada tarefa é um currículo (sha256) para uma vaga e uma versão dos prompts
+    (analise.prompt_version): depois de uma mudança de prompt ou de modo, os
+    currículos já concluídos viram tarefas novas, como nos fingerprints.
+    """
+
+    def __init__(self, file_path=WORK_QUEUE_PATH, lease_seconds=WORK_QUEUE_LEASE,
+                 max_attempts=WORK_QUEUE_MAX_ATTEMPTS, retry_delay=WORK_QUEUE_RETRY_DELAY):
+        self.file_path = file_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.lock = threading.RLock()
+        # timeout: espera pelo lock de escrita de outros processos antes de desistir
+        self.connection = sqlite3.connect(file_path, check_same_thread=False, isolation_level=None, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.create_schema()
+
+    def create_schema(self):
+        with self.lock:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS tasks ("
+                "id INTEGER PRIMARY KEY, path TEXT NOT NULL, sha256 TEXT NOT NULL, job_id TEXT NOT NULL, "
+                "prompt_version TEXT NOT NULL, state TEXT NOT NULL DEFAULT 'pending', "
+                "attempts INTEGER NOT NULL DEFAULT 0, max_attempts INTEGER NOT NULL, lease_owner TEXT, "
+                "lease_until REAL, available_at REAL NOT NULL DEFAULT 0, last_error TEXT, "
+                "created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            columns = [row[1] for row in self.connection.execute("PRAGMA table_info(tasks)")]
+            if "prompt_version" not in columns:
+                # Filas criadas com a chave (sha256, job_id, stage): as tarefas antigas ficam sem versão
+                # e não são mais entregues; enfileirar de novo cria as tarefas da versão atual
+                self.connection.execute("DROP INDEX IF EXISTS idx_tasks_sha256_job_id_stage")
+                self.connection.execute("DROP INDEX IF EXISTS idx_tasks_claim")
+                self.connection.execute("ALTER TABLE tasks ADD COLUMN prompt_version TEXT NOT NULL DEFAULT ''")
+            if "stage" in columns:
+                self.connection.execute("ALTER TABLE tasks DROP COLUMN stage")
+            # O mesmo conteúdo de PDF é uma única tarefa por vaga e versão dos prompts
+            self.connection.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS idx_tasks_sha256_job_id_prompt_version "
+                "ON tasks (sha256, job_id, prompt_version)"
+            )
+            # Caminho do claim: próximas tarefas disponíveis da vaga na versão atual
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS idx_tasks_claim ON tasks (job_id, prompt_version, state, available_at)"
+            )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS idx_tasks_lease_owner ON tasks (lease_owner)")
+
+    @contextmanager
+    def transaction(self):
+        # BEGIN IMMEDIATE: reserva o lock de escrita já no início, evitando que dois processos leiam a mesma tarefa livre
+        with self.lock:
+            cursor = self.connection.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                yield cursor
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+            cursor.execute("COMMIT")
+
+    @staticmethod
+    def to_dict(row):
+        return dict(zip(TASK_COLUMNS, row))
+
+    def enqueue(self, items, job_id, prompt_version):
+        """
+        Adiciona as tarefas [(path, sha256)] da vaga. Tarefas já existentes
+        (mesmo conteúdo, vaga e versão dos prompts) são mantidas como estão,
+        então enfileirar de novo a mesma pasta só acrescenta os currículos novos.
+        """
+        now = time.time()
+        with self.transaction() as cursor:
+            before = self.connection.total_changes
+            cursor.executemany(
+                "INSERT OR IGNORE INTO tasks (path, sha256, job_id, prompt_version, max_attempts, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(str(path), sha256, job_id, prompt_version, self.max_attempts, now, now) for path, sha256 in items],
+            )
+            return self.connection.total_changes - before
+
+    def claim(self, owner, job_id, prompt_version, limit=1):
+        """
+        Reserva até `limit` tarefas disponíveis da vaga e versão dos prompts para `owner`: pendentes (cujo
+        prazo de nova tentativa já passou) ou reservadas por um worker cujo
+        lease venceu. Tarefas que esgotaram as tentativas vão para "dead".
+        """
+        now = time.time()
+        with self.transaction() as cursor:
+            # Leases vencidos na última tentativa: o worker caiu com a tarefa, que não volta mais
+            cursor.execute(
+                "UPDATE tasks SET state = 'dead', lease_owner = NULL, updated_at = ?, "
+                "last_error = COALESCE(last_error, 'Lease expirado na última tentativa.') "
+                "WHERE job_id = ? AND prompt_version = ? AND state = 'leased' AND lease_until < ? "
+                "AND attempts >= max_attempts",
+                (now, job_id, prompt_version, now),
+            )
+            rows = cursor.execute(
+                f"SELECT {', '.join(TASK_COLUMNS)} FROM tasks "
+                "WHERE job_id = ? AND prompt_version = ? AND ("
+                "(state = 'pending' AND available_at <= ?) OR (state = 'leased' AND lease_until < ?)"
+                ") ORDER BY available_at, id LIMIT ?",
+                (job_id, prompt_version, now, now, limit),
+            ).fetchall()
+            tasks = [self.to_dict(row) for row in rows]
+            for task in tasks:
+                if task["state"] == "leased":
+                    logging.warning(f"Lease de {task['lease_owner']} vencido; tarefa {task['id']} ({task['path']}) retomada.")
+            cursor.executemany(
+                "UPDATE tasks SET state = 'leased', lease_owner = ?, lease_until = ?, attempts = attempts + 1, "
+                "updated_at = ? WHERE id = ?",
+                [(owner, now + self.lease_seconds, now, task["id"]) for task in tasks],
+            )
+        for task in tasks:
+            task.update(state="leased", lease_owner=owner, attempts=task["attempts"] + 1)
+        return tasks
+
+    def next_due(self, job_id, prompt_version):
+        """
+        Momento (time.time) em que a próxima tarefa ainda não concluída poderá
+        ser reservada: fim da espera de uma pendente ou do lease de uma em
+        andamento. None quando não resta nada por fazer.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT MIN(CASE state WHEN 'pending' THEN available_at ELSE lease_until END) FROM tasks "
+                "WHERE job_id = ? AND prompt_version = ? AND state IN ('pending', 'leased')",
+                (job_id, prompt_version),
+            ).fetchone()
+        return row[0]
+
+    def heartbeat(self, owner):
+        """Renova o lease de todas as tarefas em andamento do worker."""
+        now = time.time()
+        with self.transaction() as cursor:
+            cursor.execute(
+                "UPDATE tasks SET lease_until = ?, updated_at = ? WHERE lease_owner = ? AND state = 'leased'",
+                (now + self.lease_seconds, now, owner),
+            )
+
+    def complete(self, task_ids, owner):
+        """Marca as tarefas como concluídas. Só vale para tarefas ainda reservadas por `owner`."""
+        now = time.time()
+        with self.transaction() as cursor:
+            cursor.executemany(
+                "UPDATE tasks SET state = 'done', lease_owner = NULL, lease_until = NULL, last_error = NULL, "
+                "updated_at = ? WHERE id = ? AND lease_owner = ? AND state = 'leased'",
+                [(now, task_id, owner) for task_id in task_ids],
+            )
+
+    def fail(self, task, owner, error):
+        """Registra a falha: a tarefa volta para a fila com espera crescente ou, sem tentativas, vai para "dead"."""
+        now = time.time()
+        dead = task["attempts"] >= task["max_attempts"]
+        available_at = now + self.retry_delay * 2 ** (task["attempts"] - 1)
+        with self.transaction() as cursor:
+            cursor.execute(
+                "UPDATE tasks SET state = ?, lease_owner = NULL, lease_until = NULL, available_at = ?, "
+                "last_error = ?, updated_at = ? WHERE id = ? AND lease_owner = ? AND state = 'leased'",
+                ("dead" if dead else "pending", available_at, str(error), now, task["id"], owner),
+            )
+        if dead:
+            logging.error(f"Tarefa {task['id']} ({task['path']}) na fila de mortos após {task['attempts']} tentativas: {error}")
+
+    def release(self, owner):
+        """Devolve à fila, sem contar a tentativa, as tarefas reservadas pelo worker (ex.: parada pedida)."""
+        now = time.time()
+        with self.transaction() as cursor:
+            cursor.execute(
+                "UPDATE tasks SET state = 'pending', lease_owner = NULL, lease_until = NULL, "
+                "attempts = MAX(attempts - 1, 0), updated_at = ? WHERE lease_owner = ? AND state = 'leased'",
+                (now, owner),
+            )
+
+    @staticmethod
+    def where(job_id=None, prompt_version=None):
+        # Filtros opcionais por vaga e versão dos prompts: (condições SQL, parâmetros)
+        filters = {"job_id": job_id, "prompt_version": prompt_version}
+        filters = {column: value for column, value in filters.items() if value is not None}
+        return [f"{column} = ?" for column in filters], list(filters.values())
+
+    def counts(self, job_id=None, prompt_version=None):
+        """Quantidade de tarefas por estado, de uma vaga (e versão dos prompts) ou de todas."""
+        conditions, params = self.where(job_id, prompt_version)
+        sql = "SELECT state, COUNT(*) FROM tasks"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        with self.lock:
+            rows = self.connection.execute(sql + " GROUP BY state", params).fetchall()
+        counts = dict.fromkeys(TASK_STATES, 0)
+        counts.update(rows)
+        return counts
+
+    def dead_letters(self, job_id=None, prompt_version=None):
+        """Tarefas na fila de mortos, com o último erro de cada uma."""
+        conditions, params = self.where(job_id, prompt_version)
+        sql = f"SELECT {', '.join(TASK_COLUMNS)} FROM tasks WHERE " + " AND ".join(["state = 'dead'"] + conditions)
+        with self.lock:
+            return [self.to_dict(row) for row in self.connection.execute(sql + " ORDER BY id", params)]
+
+    def retry_dead(self, job_id=None, prompt_version=None):
+        """Devolve as tarefas mortas à fila com as tentativas zeradas. Retorna quantas voltaram."""
+        conditions, params = self.where(job_id, prompt_version)
+        sql = (
+            "UPDATE tasks SET state = 'pending', attempts = 0, available_at = 0, updated_at = ? WHERE "
+            + " AND ".join(["state = 'dead'"] + conditions)
+        )
+        params = [time.time()] + params
+        with self.transaction() as cursor:
+            return cursor.execute(sql, params).rowcount
+
+    def close(self):
+        self.connection.close()
+
+
+def worker_id():
+    """Identificador do worker nos leases: máquina, processo e um sufixo aleatório."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+def enqueue_folder(queue, job, source, prompt_version):
+    """Enfileira os PDFs da pasta para a vaga. Retorna quantas tarefas novas foram criadas."""
+    from helper import get_pdf_paths, file_sha256
+
+    items = [(path, file_sha256(path)) for path in sorted(get_pdf_paths(source))]
+    added = queue.enqueue(items, job.get("id"), prompt_version)
+    logging.info(f"{added} tarefas novas para a vaga '{job.get('name')}' ({len(items)} currículos na pasta).")
+    return added
+
+
+async def run_worker(job, queue_path=WORK_QUEUE_PATH, concurrency=None, idle_exit=True, poll_interval=5.0,
+                     on_result=None, preprocess_workers=None):
+    """
+    Consome as tarefas da vaga até a fila esvaziar (ou para sempre com
+    `idle_exit=False`). Cada tarefa só é marcada como concluída depois que o
+    currículo foi gravado no banco: se o processo cair no meio, a tarefa volta
+    para a fila quando o lease vencer e o fingerprint evita análise repetida.
+    Como no main_async, a leitura dos PDFs e o spaCy rodam no pool de processos
+    do Preprocessor, à frente dos `concurrency` consumidores que chamam o LLM.
+    `on_result` recebe o resultado final de cada tarefa: sucesso, pulada ou
+    falha sem tentativas restantes (as demais falhas voltam para a fila).
+    """
+    import analise
+    from metrics import registry as metrics
+    from preprocess import Preprocessor, PREPROCESS_WORKERS
+    from resources import get_database
+
+    concurrency = max(1, concurrency or analise.concurrency)
+    preprocess_workers = PREPROCESS_WORKERS if preprocess_workers is None else preprocess_workers
+    queue = WorkQueue(queue_path)
+    owner = worker_id()
+    database = get_database()
+    fingerprints = await asyncio.to_thread(analise.load_fingerprints)
+    # Concluídas cujo currículo ainda pode estar no buffer do unit_of_work
+    written = []
+    idle = asyncio.Event()
+    # Currículos lidos, a caminho dos consumidores, e a tarefa reservada de cada um (por sha256)
+    ready = asyncio.Queue(maxsize=concurrency * 2)
+    reserved = {}
+    # Falhas do pool de pré-processamento sendo registradas na fila
+    failures = set()
+
+    async def finish(task, result):
+        # Registrar o resultado da tarefa; só os finais vão para o on_result
+        if result["status"] in ("success", "skipped"):
+            fingerprints.add((task["sha256"], job.get("id"), analise.prompt_version))
+            written.append(task["id"])
+        else:
+            await asyncio.to_thread(queue.fail, task, owner, result.get("error"))
+            if task["attempts"] < task["max_attempts"]:
+                return
+        if on_result is not None:
+            on_result(result)
+
+    async def claimed(unit_of_work):
+        # Reservar as tarefas uma a uma; as que precisam ler o PDF seguem para o pool
+        while True:
+            tasks = await asyncio.to_thread(queue.claim, owner, job.get("id"), analise.prompt_version)
+            if not tasks:
+                if written:
+                    # Nada mais a reservar: concluir já as tarefas gravadas, sem esperar o keeper
+                    try:
+                        await checkpoint(unit_of_work)
+                    except Exception:
+                        logging.error(f"Worker {owner}: erro no checkpoint; o keeper tenta de novo.", exc_info=True)
+                # Sem tarefa livre agora: esperar as que estão em espera, em análise ou com outro worker
+                due = await asyncio.to_thread(queue.next_due, job.get("id"), analise.prompt_version)
+                if due is None and idle_exit:
+                    return
+                wait = poll_interval if due is None else due - time.time()
+                await asyncio.sleep(min(max(wait, 0.5), poll_interval))
+                continue
+            task = tasks[0]
+            if (task["sha256"], job.get("id"), analise.prompt_version) in fingerprints:
+                # Já gravado por uma execução anterior (ex.: o worker caiu depois da gravação)
+                await finish(task, {"status": "skipped", "path": task["path"]})
+                continue
+            reserved[task["sha256"]] = task
+            artifact = await asyncio.to_thread(database.get_cv_artifact, task["sha256"])
+            if artifact is not None:
+                # PDF já lido para outra vaga: pula a leitura e o spaCy
+                metrics.inc("cv_artifact_hits_total", kind="text")
+                await ready.put((task["path"], artifact["text"], artifact["formatted_text"], task["sha256"]))
+                continue
+            yield task["path"], task["sha256"], None
+
+    def preprocess_failed(path, sha256, error):
+        # Lote perdido no pool: a tarefa falha como qualquer outra (nova tentativa ou fila de mortos)
+        task = reserved.pop(sha256)
+        failure = asyncio.ensure_future(
+            finish(task, {"status": "failed", "path": path, "error": f"Erro ao ler o currículo: {error}"})
+        )
+        failures.add(failure)
+        failure.add_done_callback(failures.discard)
+
+    async def producer(unit_of_work):
+        try:
+            # Lotes de um currículo: o gerador só termina quando as tarefas em análise forem
+            # concluídas, então um lote incompleto nunca seria enviado ao pool
+            preprocessor = Preprocessor(workers=preprocess_workers, chunk_size=1)
+            await preprocessor.feed(claimed(unit_of_work), ready, preprocess_failed)
+            await asyncio.gather(*failures)
+        finally:
+            # Sinalizar o fim da fila para cada consumidor
+            for _ in range(concurrency):
+                await ready.put(None)
+
+    async def consumer(unit_of_work):
+        while (item := await ready.get()) is not None:
+            path, content, formatted_content, sha256 = item
+            task = reserved.pop(sha256)
+            try:
+                if not content:
+                    result = {"status": "failed", "path": path, "error": "PDF sem texto ou ilegível."}
+                else:
+                    result = await analise.analyze_cv_async(
+                        path, job, content, formatted_content, unit_of_work, sha256
+                    )
+            except Exception as e:
+                result = {"status": "failed", "path": path, "error": str(e)}
+            await finish(task, result)
+
+    async def checkpoint(unit_of_work):
+        # Gravar o lote pendente e só então marcar as tarefas como concluídas
+        done = written[:]
+        del written[:len(done)]
+        try:
+            await asyncio.to_thread(unit_of_work.flush)
+            if done:
+                await asyncio.to_thread(queue.complete, done, owner)
+        except Exception:
+            # As tarefas continuam pendentes de conclusão para o próximo checkpoint
+            written[:0] = done
+            raise
+
+    async def keeper(unit_of_work):
+        # Checkpoints periódicos e renovação dos leases enquanto há tarefas em andamento
+        while not idle.is_set():
+            await asyncio.sleep(min(analise.flush_interval, queue.lease_seconds / 3))
+            try:
+                await checkpoint(unit_of_work)
+                await asyncio.to_thread(queue.heartbeat, owner)
+            except Exception:
+                # Uma falha passageira (ex.: banco ocupado) não pode parar os checkpoints nem a renovação dos leases
+                logging.error(f"Worker {owner}: erro no checkpoint ou no heartbeat; nova tentativa no próximo ciclo.",
+                              exc_info=True)
+
+    logging.info(f"Worker {owner} consumindo a vaga '{job.get('name')}' ({concurrency} simultâneos).")
+    with database.unit_of_work(flush_size=analise.flush_size, flush_interval=analise.flush_interval) as unit_of_work:
+        keeper_task = asyncio.create_task(keeper(unit_of_work))
+        try:
+            await asyncio.gather(producer(unit_of_work), *(consumer(unit_of_work) for _ in range(concurrency)))
+        finally:
+            idle.set()
+            keeper_task.cancel()
+            try:
+                await checkpoint(unit_of_work)
+            finally:
+                # Tarefas interrompidas (cancelamento, Ctrl+C) voltam para a fila sem contar a tentativa
+                await asyncio.to_thread(queue.release, owner)
+    counts = queue.counts(job.get("id"), analise.prompt_version)
+    queue.close()
+    logging.info(f"Worker {owner} encerrado. Fila da vaga: {counts}")
+    return counts
+
+
+def worker_process(job_id, queue_path, concurrency, preprocess_workers=None):
+    # Ponto de entrada dos processos filhos: cada um abre o próprio banco, fila e clientes
+    from resources import get_database
+
+    job = get_database().get_job_by_id(job_id)
+    if job is None:
+        # Código de saída diferente de zero: o run_workers relata o worker com erro
+        logging.error(f"Vaga {job_id} não encontrada; worker encerrado.")
+        sys.exit(1)
+    try:
+        asyncio.run(run_worker(job, queue_path, concurrency, preprocess_workers=preprocess_workers))
+    except KeyboardInterrupt:
+        pass
+
+
+def run_workers(job, processes=1, queue_path=WORK_QUEUE_PATH, concurrency=None, preprocess_workers=None):
+    """
+    Roda `processes` workers em processos separados e aguarda todos terminarem.
+    Sem `preprocess_workers`, os processos do pool de leitura dos PDFs são
+    divididos entre os workers.
+    """
+    from preprocess import PREPROCESS_WORKERS
+
+    if processes <= 1:
+        return asyncio.run(run_worker(job, queue_path, concurrency, preprocess_workers=preprocess_workers))
+    if preprocess_workers is None:
+        preprocess_workers = max(1, PREPROCESS_WORKERS // processes)
+    context = multiprocessing.get_context("spawn")
+    workers = [
+        context.Process(
+            target=worker_process, args=(job.get("id"), queue_path, concurrency, preprocess_workers),
+            name=f"worker-{index}",
+        )
+        for index in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    with_errors = [worker.name for worker in workers if worker.exitcode]
+    if with_errors:
+        logging.error(f"Workers encerrados com erro: {with_errors}")
+    from analise import prompt_version
+
+    queue = WorkQueue(queue_path)
+    try:
+        return queue.counts(job.get("id"), prompt_version)
+    finally:
+        queue.close()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Fila persistente de análises de currículos.")
+    parser.add_argument("--queue", default=WORK_QUEUE_PATH, help="Arquivo SQLite da fila.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    enqueue = commands.add_parser("enqueue", help="Enfileira os PDFs de uma pasta para uma vaga.")
+    enqueue.add_argument("--job", required=True, help="Nome ou ID da vaga.")
+    enqueue.add_argument("--source", help="Pasta com os PDFs (padrão: drive/curriculos).")
+
+    work = commands.add_parser("work", help="Consome a fila da vaga até ela esvaziar.")
+    work.add_argument("--job", required=True, help="Nome ou ID da vaga.")
+    work.add_argument("--processes", type=int, default=1, help="Processos workers.")
+    work.add_argument("--concurrency", type=int, help="Currículos simultâneos no LLM por processo.")
+    work.add_argument(
+        "--preprocess-workers", type=int,
+        help="Processos para leitura dos PDFs por worker (0 = mesma thread; padrão: divididos entre os workers).",
+    )
+
+    status = commands.add_parser("status", help="Mostra as tarefas por estado e a fila de mortos.")
+    status.add_argument("--job", help="Nome ou ID da vaga (padrão: todas).")
+
+    retry = commands.add_parser("retry-dead", help="Devolve as tarefas mortas à fila.")
+    retry.add_argument("--job", help="Nome ou ID da vaga (padrão: todas).")
+    return parser
+
+
+def main(argv=None):
+    from cli import resolve_jobs
+    from resources import get_database
+
+    args = build_parser().parse_args(argv)
+    job = resolve_jobs(get_database(), [args.job])[0] if args.job else None
+    job_id = job.get("id") if job else None
+
+    if args.command == "enqueue":
+        from analise import CV_DIR, prompt_version
+
+        queue = WorkQueue(args.queue)
+        enqueue_folder(queue, job, args.source or CV_DIR, prompt_version)
+        print(json.dumps(queue.counts(job_id, prompt_version), ensure_ascii=False))
+    elif args.command == "work":
+        counts = run_workers(job, args.processes, args.queue, args.concurrency, args.preprocess_workers)
+        print(json.dumps(counts, ensure_ascii=False))
+    elif args.command == "status":
+        queue = WorkQueue(args.queue)
+        print(json.dumps(queue.counts(job_id), ensure_ascii=False))
+        for task in queue.dead_letters(job_id):
+            print(json.dumps({"path": task["path"], "attempts": task["attempts"], "error": task["last_error"]},
+                             ensure_ascii=False))
+    elif args.command == "retry-dead":
+        queue = WorkQueue(args.queue)
+        print(f"{queue.retry_dead(job_id)} tarefas devolvidas à fila.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())